@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from metrics import LatencyHistogram
+
+
+# Concurrency limit that can be changed while sessions are running. Lowering it never cancels
+# active sessions: new ones simply wait until enough of them have finished.
+class ResizableLimiter:
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters = deque()
+
+    async def acquire(self):
+        while self.active >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    self._wake()  # Woken just before being cancelled: pass the free slot on
+                raise
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def set_limit(self, limit):
+        self.limit = max(1, limit)
+        self._wake()
+
+    def _wake(self):
+        free = self.limit - self.active
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+# Closed-loop AIMD controller: every `interval` seconds it looks at the latency and errors of the
+# requests completed in that window. Within the SLO and with the limit actually in use, it adds
+# `increase` sessions; on an SLO breach it multiplies the limit by `decrease`. The highest
+# concurrency that kept a window within the SLO is the target's sustainable point.
+class AdaptiveController:
+    def __init__(self, limiter, metrics, slo_p99=2.0, slo_error_rate=0.01, interval=5.0, min_limit=1,
+                 max_limit=1000, increase=2, decrease=0.7, min_requests=20):
+        self.limiter = limiter
+        self.metrics = metrics  # PageMetrics the sessions record into
+        self.slo_p99 = slo_p99
+        self.slo_error_rate = slo_error_rate
+        self.interval = interval
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.min_requests = min_requests
+        self.timeline = []  # One sample per window
+        self.best = None    # Sample with the highest throughput within the SLO
+        self._previous = self._totals()
+        self._start = time.monotonic()
+        self._task = None
+
+    def _totals(self):
+        histogram = LatencyHistogram()
+        requests = errors = 0
+        for category in self.metrics.categories.values():
+            histogram.merge(category.total_time)
+            requests += category.requests
+            errors += category.errors
+        return histogram.counts, requests, errors
+
+    def _window(self):
+        counts, requests, errors = self._totals()
+        previous_counts, previous_requests, previous_errors = self._previous
+        self._previous = (counts, requests, errors)
+        window = LatencyHistogram()
+        window.counts = [now - before for now, before in zip(counts, previous_counts)]
+        window.count = sum(window.counts)
+        window.min, window.max = 0.0, float('inf')
+        return window, requests - previous_requests, errors - previous_errors
+
+    def step(self):
+        window, requests, errors = self._window()
+        p99 = window.percentile(99)
+        error_rate = errors / requests if requests else 0.0
+        limit = self.limiter.limit
+        within_slo = p99 <= self.slo_p99 and error_rate <= self.slo_error_rate
+
+        if requests < self.min_requests:
+            decision = 'hold'  # Too few completions to judge
+        elif not within_slo:
+            limit = max(self.min_limit, int(limit * self.decrease))
+            decision = 'decrease'
+        elif self.limiter.active >= self.limiter.limit * 0.9:
+            limit = min(self.max_limit, limit + self.increase)
+            decision = 'increase'
+        else:
+            decision = 'hold'  # Demand is below the limit, so a larger one would not be exercised
+
+        sample = {'time': time.monotonic() - self._start, 'limit': self.limiter.limit, 'active': self.limiter.active,
+                  'throughput': requests / self.interval, 'p99': p99, 'error_rate': error_rate, 'decision': decision}
+        self.timeline.append(sample)
+        if within_slo and requests >= self.min_requests and (self.best is None or
+                                                             sample['throughput'] > self.best['throughput']):
+            self.best = sample
+        if limit != self.limiter.limit:
+            logging.info(f"Adaptive concurrency: {self.limiter.limit} -> {limit} "
+                         f"(p99 {p99 * 1000:.0f} ms, errors {error_rate:.1%})")
+            self.limiter.set_limit(limit)
+        return sample
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.step()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {'best': self.best, 'final_limit': self.limiter.limit, 'timeline': self.timeline}
+
+    def report(self):
+        lines = [f"Adaptive concurrency (SLO p99 <= {self.slo_p99 * 1000:.0f} ms, errors <= {self.slo_error_rate:.1%})"]
+        if self.best:
+            lines.append(f"Highest sustainable: {self.best['limit']} concurrent sessions at "
+                         f"{self.best['throughput']:.1f} req/s (p99 {self.best['p99'] * 1000:.0f} ms, "
+                         f"errors {self.best['error_rate']:.1%})")
+        else:
+            lines.append("No window met the SLO")
+        lines.append(f"{'time':>8}{'limit':>7}{'active':>8}{'req/s':>9}{'p99 ms':>9}{'errors':>8}  decision")
+        for sample in self.timeline:
+            lines.append(f"{sample['time']:>8.0f}{sample['limit']:>7}{sample['active']:>8}{sample['throughput']:>9.1f}"
+                         f"{sample['p99'] * 1000:>9.0f}{sample['error_rate']:>8.1%}  {sample['decision']}")
+        return '\n'.join(lines)
@@ -1,23 +1,36 @@
+import argparse
 import asyncio
 import logging
 import random
+import signal
+import time
 from datetime import datetime
-import queue
-import aiohttp
-import ssl
+import numpy as np
+from http_engine import HttpEngine
+from http_cache import HttpCache, CacheStats
+from adaptive import ResizableLimiter, AdaptiveController
+from control import RunControl, ControlServer
+from event_recorder import EventRecorder
+from retry import RetryPolicy, CircuitOpenError
+from scheduler import ArrivalScheduler, make_rate_profile
+from log_pipeline import configure_logging, log_pipeline_report
+from metrics import PageMetrics, LoopLagMonitor
+from virtual_clock import VirtualClock
+from scenario import Scenario, Step
+from site_graph import SiteGraph
+from sharding import run_sharded, shard_report
 
 # Log file configuration
 log_file_path = 'simulation.log'
 
-# Set up logging configuration
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[logging.StreamHandler(), logging.FileHandler(log_file_path)])
+# Set up logging: records go through a bounded queue to a background writer thread
+# (when the queue is full new records are dropped rather than stalling the event loop)
+log_handler = configure_logging(log_file_path, max_queue=10000, policy='drop_newest')
 
-# Global variables for controlling the simulation
-is_running = True
-semaphore = None
-log_queue = queue.Queue()  # Queue for logging
+# Runtime control (control.py): pause, resume, drain, stop, concurrency N, rate FACTOR over this Unix
+# socket ('<socket>.<shard>' per worker process), e.g. `python control.py drain`. None disables it;
+# SIGINT/SIGTERM drain the run either way, a second one cancels the sessions still running.
+CONTROL_SOCKET = 'simulation.sock'
 
 # User agents
 USER_AGENTS = [
@@ -26,162 +39,342 @@ USER_AGENTS = [
     "Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1"
 ]
 
-# Pages to visit
-INSIGHT_PAGES = [
-    "https://www.exponentiel.ai/insights/openai-01-model-a-leap-into-the-future-of-ai-reasoning",
-    "https://www.exponentiel.ai/insights/what-is-generative-ai-everything-you-need-to-know",
-    "https://www.exponentiel.ai/insights/how-autonomous-agents-are-reshaping-business-strategies",
-    "https://www.exponentiel.ai/insights/how-does-generative-ai-works",
-    "https://www.exponentiel.ai/insights/preparing-for-artificial-general-intelligence",
-    "https://www.exponentiel.ai/insights/autonomous-ai-agents-cant-scale-without-responsible-ai",
-]
+# Pages, visit order and dwell times come from the scenario file, compiled once at startup
+SCENARIO_FILE = 'scenarios/exponentiel.toml'
+scenario = Scenario.load(SCENARIO_FILE)
 
-SERVICE_PAGES = [
-    "https://www.exponentiel.ai/service/generative-ai-consulting",
-    "https://www.exponentiel.ai/service/ai-software-development",
-    "https://www.exponentiel.ai/service/autonomous-ai-agents",
-    "https://www.exponentiel.ai/career",
-    "https://www.exponentiel.ai/contact-us",
-    "https://www.exponentiel.ai/insights"
-]
+# Optional crawled link graph (site_graph.py build): after a page, users follow one of its links with
+# LINK_FOLLOW_PROBABILITY. The file is memory-mapped, so worker processes share it.
+SITE_GRAPH_FILE = None
+LINK_FOLLOW_PROBABILITY = 0.7
+site_graph = SiteGraph(SITE_GRAPH_FILE) if SITE_GRAPH_FILE else None
+link_rng = np.random.default_rng()
 
-CONTACT_PAGE = "https://www.exponentiel.ai/contact"
-
-LINKEDIN_REFERRERS = [
-    "https://www.linkedin.com/",
-    "https://www.linkedin.com/feed/",
-    "https://www.linkedin.com/in/",
-    "https://www.linkedin.com/company/exponentiel-ai/",
-    "https://www.linkedin.com/posts/exponentiel-ai_openais-01-model-a-leap-into-the-future-activity-7240316582336360450-zmQK?utm_source=share&utm_medium=member_desktop",
-    "https://www.linkedin.com/posts/exponentiel-ai_artificialintelligence-agi-openai-activity-7196045842036731905-r4Pb?utm_source=share&utm_medium=member_desktop",
-    "https://www.linkedin.com/posts/exponentiel-ai_ai-agi-artificialintelligence-activity-7196796554781847552-RyYU?utm_source=share&utm_medium=member_mobile",
-    "https://www.linkedin.com/posts/exponentiel-ai_ai-openai-chatgpt4o-activity-7196436167993548801-DK_E?utm_source=share&utm_medium=member_desktop",
-    "https://www.linkedin.com/posts/redabourji_openai-artificialintelligence-ai-activity-7240732079477473280-RQsX?utm_source=share&utm_medium=member_desktop",
-    "https://www.linkedin.com/posts/redabourji_openais-o1-model-a-leap-into-the-future-activity-7240341353065283586-OBcy?utm_source=share&utm_medium=member_desktop",
-    "https://www.linkedin.com/posts/redabourji_heres-an-early-preview-of-elevenlabs-music-activity-7194578928479440896--_XP?utm_source=share&utm_medium=member_desktop"
-]
+# Shared HTTP engine settings (one connection pool and DNS cache for the whole run)
+PROXY = "socks5://localhost:9050"
+MAX_CONNECTIONS = 100
+MAX_CONNECTIONS_PER_HOST = 20
+DNS_CACHE_TTL = 300  # seconds
+WARM_UP_CONNECTIONS = True
+HTTP_CACHE = 'session'  # Browser cache per user ('session'), one cache for all users ('shared') or None
+HTTP_CACHE_BYTES = 50 * 1024 * 1024  # LRU eviction once cached responses exceed this size
+HASH_BODIES = None  # e.g. 'sha256' to digest every page body and count content changes between visits
+
+# Retries: jittered exponential backoff, retries capped at RETRY_BUDGET of all requests,
+# and a per-host breaker that sheds requests for BREAKER_RESET seconds after BREAKER_THRESHOLD failures
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_BUDGET = 0.2
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30.0  # seconds
+
+# Adaptive mode (--adaptive): closed loop where a new user starts as soon as a session slot frees up,
+# and the number of slots follows AIMD against these SLOs, starting from --concurrency
+ADAPTIVE = False
+SLO_P99 = 2.0  # seconds, per request
+SLO_ERROR_RATE = 0.01
+ADAPTIVE_INTERVAL = 10.0  # seconds per control window
+ADAPTIVE_MAX_CONCURRENCY = 1000
+
+# Structured events (--events DIR): one typed row per request and per session step, written in
+# batches to rotating Parquet or Arrow IPC files (needs pyarrow); load with event_recorder.read_events
+EVENTS_DIR = None
+EVENTS_FORMAT = 'parquet'
+events = None  # EventRecorder of the running simulation
 
-# Define a dictionary with user colors
-USER_COLORS = {
-    1: 'blue', 2: 'yellow', 3: 'green', 4: 'red', 5: 'cyan',
-    6: 'magenta', 7: 'orange', 8: 'purple', 9: 'brown', 10: 'pink'
-}
+# Hybrid runs: this fraction of users drive a real browser (traffic_generator_v3) on the same
+# scenario, scheduler and metrics; their navigations are reported as '<category>/browser'
+BROWSER_RATIO = 0.0
+BROWSER_POOL_SIZE = 2
 
-# Utility function for logging with color per user
+# Time scale for think/dwell/scroll/mouse and inter-arrival delays:
+# 1.0 = real time, 0.01 = 100x compressed, 0 = zero-dwell throughput mode
+TIME_SCALE = 1.0
+clock = VirtualClock(TIME_SCALE)
+
+# User arrivals: 'constant', 'poisson' or 'piecewise' (list of (seconds, users/second) segments)
+ARRIVAL_PROCESS = 'poisson'
+ARRIVAL_RATE = 0.5  # users per second
+ARRIVAL_SEGMENTS = [(600, 0.2), (1800, 0.5), (600, 0.2)]
+
+# Utility function for logging (non-blocking: the write happens on the log writer thread)
 def log_and_print(message, user_number=None):
-    color = USER_COLORS.get(user_number, 'white')  # Default to white if user number not specified
-    colored_message = f'<span style="color:{color};">{message}</span>'
-    log_queue.put(colored_message)
-    logging.info(message)  # Also log it in the file
+    logging.info(message, extra={'user_number': user_number})
 
 # Function to simulate mouse movements (human-like interaction)
 async def simulate_mouse_movement():
     movements = random.randint(3, 7)
     log_and_print(f"Simulating {movements} mouse movements")
     for _ in range(movements):
-        await asyncio.sleep(random.uniform(0.5, 2.0))
+        await clock.sleep(random.uniform(0.5, 2.0))
 
 # Function to simulate scrolling (human-like interaction)
 async def simulate_scrolling():
     scroll_count = random.randint(3, 8)
     log_and_print(f"Scrolling {scroll_count} times")
     for _ in range(scroll_count):
-        await asyncio.sleep(random.uniform(2, 5))
+        await clock.sleep(random.uniform(2, 5))
+
+# Function to record a step of a user's session (start is a time.time() timestamp)
+def record_step(user_number, phase, step, start, **fields):
+    if events is not None:
+        events.step(user_number, phase, step.category if step else None, step.url if step else None, start,
+                    time.time(), **fields)
+
+# Function to follow a random link of the page from the site graph (a lookup in the mapped arrays)
+async def follow_link(user_number, engine, session, url, retry_policy, cache):
+    if site_graph is None or random.random() >= LINK_FOLLOW_PROBABILITY:
+        return
+    link = site_graph.next_url(url, link_rng)
+    if link is None:
+        return
+    log_and_print(f"User {user_number} - Following link: {link}", user_number=user_number)
+    step = Step('link', 'link', link, 0.0)
+    start = time.time()
+    try:
+        await retry_policy.call(link, lambda: engine.fetch(session, link, 'link', cache=cache, user=user_number),
+                                label=f"User {user_number}")
+        await clock.sleep(random.uniform(5, 10))
+        record_step(user_number, 'link', step, start)
+    except Exception as e:
+        log_and_print(f"User {user_number} - Error following link {link}: {e}", user_number=user_number)
+        record_step(user_number, 'link', step, start, error=type(e).__name__)
 
 # Function to simulate a user visiting pages (mimicking human-like interactions)
-async def simulate_user(user_number, semaphore):
-    async with semaphore:
-        log_and_print(f"\n--- User {user_number} Session Started ---", user_number=user_number)
-        user_agent = random.choice(USER_AGENTS)
-        linkedin_referrer = random.choice(LINKEDIN_REFERRERS)
-
-        try:
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            async with aiohttp.ClientSession(headers={'User-Agent': user_agent}, connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-                # Step 1: Visit LinkedIn referrer
-                async with session.get(linkedin_referrer, proxy="socks5://localhost:9050", timeout=60) as response:
-                    log_and_print(f"User {user_number} - Visiting LinkedIn: {linkedin_referrer} (Status: {response.status})", user_number=user_number)
-                await asyncio.sleep(random.uniform(20, 60))  # Simulate time spent on page
-                await simulate_mouse_movement()
-                await simulate_scrolling()
-
-                # Step 2: Visit Insight Pages (2-3)
-                visited_insights = random.sample(INSIGHT_PAGES, k=random.randint(2, 3))
-                for insight_page in visited_insights:
-                    log_and_print(f"User {user_number} - Visiting insight page: {insight_page}", user_number=user_number)
-                    retry_count = 0
-                    max_retries = 3
-                    while retry_count < max_retries:
-                        try:
-                            async with session.get(insight_page, proxy="socks5://localhost:9050", timeout=60) as response:
-                                log_and_print(f"User {user_number} - Successfully visited: {insight_page} (Status: {response.status})", user_number=user_number)
-                            await simulate_mouse_movement()
-                            await simulate_scrolling()
-                            break
-                        except Exception as e:
-                            retry_count += 1
-                            log_and_print(f"User {user_number} - Error visiting {insight_page}: {e} (Retry {retry_count}/{max_retries})", user_number=user_number)
-                            await asyncio.sleep(2)
-                            if retry_count == max_retries:
-                                log_and_print(f"User {user_number} - Failed to visit {insight_page} after {max_retries} retries", user_number=user_number)
-                    await asyncio.sleep(random.uniform(5*60, 10*60))  # Simulate reading time on insight page
-
-                # Step 3: Visit Service Pages (2-3)
-                visited_services = random.sample(SERVICE_PAGES, k=random.randint(2, 3))
-                for service_page in visited_services:
-                    log_and_print(f"User {user_number} - Visiting service page: {service_page}", user_number=user_number)
-                    retry_count = 0
-                    max_retries = 3
-                    while retry_count < max_retries:
-                        try:
-                            async with session.get(service_page, proxy="socks5://localhost:9050", timeout=60) as response:
-                                log_and_print(f"User {user_number} - Successfully visited: {service_page} (Status: {response.status})", user_number=user_number)
-                            await simulate_mouse_movement()
-                            await simulate_scrolling()
-                            break
-                        except Exception as e:
-                            retry_count += 1
-                            log_and_print(f"User {user_number} - Error visiting {service_page}: {e} (Retry {retry_count}/{max_retries})", user_number=user_number)
-                            await asyncio.sleep(2)
-                            if retry_count == max_retries:
-                                log_and_print(f"User {user_number} - Failed to visit {service_page} after {max_retries} retries", user_number=user_number)
-                    await asyncio.sleep(random.uniform(2, 5))  # Simulate time spent on service page
-
-                # Step 4: Visit the Contact Page
-                log_and_print(f"User {user_number} - Visiting contact page: {CONTACT_PAGE}", user_number=user_number)
-                async with session.get(CONTACT_PAGE, proxy="socks5://localhost:9050", timeout=60) as response:
-                    log_and_print(f"User {user_number} - Visited contact page (Status: {response.status})", user_number=user_number)
-                await simulate_mouse_movement()
-                await simulate_scrolling()
-
-        except Exception as e:
-            log_and_print(f"User {user_number} - Error: {e}", user_number=user_number)
-
-        log_and_print(f"--- User {user_number} Session Finished ---\n", user_number=user_number)
-
-# Main async function to simulate multiple users
-async def main_simulation(total_users=10, concurrent_users=3):
-    global semaphore
-    semaphore = asyncio.Semaphore(concurrent_users)
-    tasks = []
-
-    for user_number in range(1, total_users + 1):
-        task = asyncio.create_task(simulate_user(user_number, semaphore))
-        tasks.append(task)
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between starting users
-
-    await asyncio.gather(*tasks)
+async def simulate_user(user_number, engine, journey, retry_policy, new_cache=lambda: None):
+    log_and_print(f"\n--- User {user_number} Session Started ---", user_number=user_number)
+    user_agent = random.choice(USER_AGENTS)
+    cache = new_cache()
+    session_start = time.time()
+
+    try:
+        async with engine.user_session(user_agent) as session:
+            # Each step of the pre-sampled journey: visit the page, interact, then dwell
+            for step in journey:
+                log_and_print(f"User {user_number} - Visiting {step.state} page: {step.url}", user_number=user_number)
+                start = time.time()
+                try:
+                    result = await retry_policy.call(step.url, lambda: engine.fetch(session, step.url, step.category, cache=cache,
+                                                                                    user=user_number),
+                                                     label=f"User {user_number}")
+                except CircuitOpenError as e:
+                    log_and_print(f"User {user_number} - Skipped {step.url}: {e}", user_number=user_number)
+                    record_step(user_number, 'visit', step, start, error='CircuitOpenError')
+                except Exception as e:
+                    log_and_print(f"User {user_number} - Failed to visit {step.url}: {e}", user_number=user_number)
+                    record_step(user_number, 'visit', step, start, error=type(e).__name__)
+                else:
+                    cached = f", cache {result.cache}" if result.cache else ''
+                    log_and_print(f"User {user_number} - Successfully visited: {step.url} (Status: {result.status}, {result.bytes} bytes{cached})", user_number=user_number)
+                    record_step(user_number, 'visit', step, start, status=result.status, nbytes=result.bytes)
+                    start = time.time()
+                    await simulate_mouse_movement()
+                    await simulate_scrolling()
+                    record_step(user_number, 'interact', step, start)
+                    await follow_link(user_number, engine, session, step.url, retry_policy, cache)
+                start = time.time()
+                await clock.sleep(step.dwell)  # Simulate time spent on the page
+                record_step(user_number, 'dwell', step, start)
+
+    except Exception as e:
+        log_and_print(f"User {user_number} - Error: {e}", user_number=user_number)
+        record_step(user_number, 'session', None, session_start, error=type(e).__name__)
+    else:
+        record_step(user_number, 'session', None, session_start)
+
+    log_and_print(f"--- User {user_number} Session Finished ---\n", user_number=user_number)
+
+# Spread browser users evenly: user n is a browser user when floor(n * ratio) steps up at n
+def is_browser_user(user_number, ratio):
+    return int(user_number * ratio) > int((user_number - 1) * ratio)
+
+# Browser side of a hybrid run: the v3 generator on this run's clock and proxy
+def browser_generator():
+    import traffic_generator_v3 as generator
+    generator.clock = clock
+    generator.PROXY_SERVER = PROXY
+    generator.CHECK_TOR_IP = False
+    return generator
+
+# Main async function to simulate multiple users (one shard when running with --workers)
+async def main_simulation(total_users=10, concurrent_users=3, rate_share=1.0, first_user=1, report=True,
+                          control_socket=None, events_prefix='events'):
+    global events
+    clock.reset()
+    # Started inside the try below, so the finally block stops whatever did start if a later step fails
+    events = engine = control_server = lag_monitor = controller = pool = None
+    started = False
+    control = RunControl(status=lambda: engine.metrics.totals() if engine is not None else {})
+    retry_policy = RetryPolicy(max_attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, budget_ratio=RETRY_BUDGET,
+                               breaker_threshold=BREAKER_THRESHOLD, breaker_reset=BREAKER_RESET)
+
+    # Cache freshness runs on the virtual clock so max-age keeps its meaning in compressed time
+    cache_stats = CacheStats()
+    if HTTP_CACHE == 'shared':
+        shared_cache = HttpCache(HTTP_CACHE_BYTES, shared=True, stats=cache_stats, now=clock.now)
+        new_cache = lambda: shared_cache
+    elif HTTP_CACHE == 'session':
+        new_cache = lambda: HttpCache(HTTP_CACHE_BYTES, stats=cache_stats, now=clock.now)
+    else:
+        new_cache = lambda: None
+
+    # Sessions are created lazily at each arrival, at most concurrent_users at a time
+    segments = [(duration, rate * rate_share) for duration, rate in ARRIVAL_SEGMENTS]
+    profile = make_rate_profile(ARRIVAL_PROCESS, ARRIVAL_RATE * rate_share, segments)
+    limiter = ResizableLimiter(concurrent_users)  # Resizable by the adaptive controller and the control socket
+    if ADAPTIVE:
+        profile = make_rate_profile('constant', 1e6)  # Arrivals only wait for a free slot
+    scheduler = ArrivalScheduler(profile, total_users=total_users, max_concurrency=concurrent_users,
+                                 clock=clock, limiter=limiter, control=control)
+    users = {'http': 0, 'browser': 0}
+
+    def spawn(arrival):
+        user_number = first_user + arrival - 1
+        if pool is not None and is_browser_user(user_number, BROWSER_RATIO):
+            users['browser'] += 1
+            return generator.simulate_user(user_number, next(journeys), pool, metrics=engine.metrics,
+                                           category_suffix='/browser')
+        users['http'] += 1
+        return simulate_user(user_number, engine, next(journeys), retry_policy, new_cache)
+
+    try:
+        if control_socket:
+            control_server = await ControlServer(control, control_socket).start()
+        control.install_signal_handlers()
+        lag_monitor = LoopLagMonitor().start()
+        if EVENTS_DIR:
+            events = EventRecorder(EVENTS_DIR, EVENTS_FORMAT, prefix=events_prefix)
+        engine = HttpEngine(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST, dns_ttl=DNS_CACHE_TTL,
+                            proxy=PROXY, metrics=PageMetrics(), hash_bodies=HASH_BODIES, events=events)
+        warm_up_urls = scenario.all_urls() if WARM_UP_CONNECTIONS else ()
+        await engine.start(warm_up_urls)
+        if ADAPTIVE:
+            controller = AdaptiveController(limiter, engine.metrics, SLO_P99, SLO_ERROR_RATE, ADAPTIVE_INTERVAL,
+                                            max_limit=ADAPTIVE_MAX_CONCURRENCY).start()
+        if BROWSER_RATIO > 0:
+            generator = browser_generator()
+            from browser_pool import BrowserPool
+            pool = await BrowserPool(BROWSER_POOL_SIZE, 'firefox', **generator.launch_options()).start()
+
+        started = True
+        journeys = scenario.journeys()  # Sampled for the population in batches
+        await scheduler.run(spawn)
+    finally:
+        if lag_monitor is not None:
+            lag_monitor.stop()
+        if controller:
+            controller.stop()
+        if control_server:
+            await control_server.close()
+        if pool is not None:
+            await pool.close()
+        if events is not None:
+            events.close()
+        if report and started:
+            if control.draining:
+                log_and_print(f"Run ended early ({control.state()}): {scheduler.arrivals} of {total_users} users "
+                              f"started, {control.cancelled} sessions cancelled")
+            log_and_print(f"Users: {users['http']} HTTP, {users['browser']} browser")
+            log_and_print(scheduler.report())
+            log_and_print(engine.report())
+            log_and_print(retry_policy.report())
+            if HTTP_CACHE:
+                log_and_print(cache_stats.report())
+            log_and_print(engine.metrics.report())
+            log_and_print(clock.report())
+            log_and_print(lag_monitor.report())
+            if controller:
+                log_and_print(controller.report())
+            if events is not None:
+                log_and_print(events.report())
+        if engine is not None:
+            await engine.close()
+
+    return {
+        'users': total_users,
+        'browser_users': users['browser'],
+        'elapsed': clock.wall_elapsed(),
+        'metrics': engine.metrics.to_dict(),
+        'scheduler': scheduler.stats(),
+        'engine': engine.stats(),
+        'retry': retry_policy.stats(),
+        'cache': cache_stats.stats(),
+        'loop_lag': lag_monitor.stats(),
+        'adaptive': controller.stats() if controller else None,
+        'control': control.status(),
+        'events': events.stats() if events is not None else None,
+    }
+
+# Entry point of a worker process in --workers mode
+def run_shard(shard, first_user, users, concurrent_users, rate_share, time_scale=TIME_SCALE,
+              scenario_file=SCENARIO_FILE, site_graph_file=SITE_GRAPH_FILE, browser_ratio=BROWSER_RATIO,
+              control_socket=CONTROL_SOCKET, events_dir=EVENTS_DIR, events_format=EVENTS_FORMAT):
+    global scenario, site_graph, BROWSER_RATIO, EVENTS_DIR, EVENTS_FORMAT
+    clock.time_scale = time_scale
+    BROWSER_RATIO = browser_ratio
+    EVENTS_DIR, EVENTS_FORMAT = events_dir, events_format
+    scenario = Scenario.load(scenario_file)
+    site_graph = SiteGraph(site_graph_file) if site_graph_file else None
+    logging.info(f"Shard {shard} starting with users {first_user}-{first_user + users - 1}")
+    control_socket = f"{control_socket}.{shard}" if control_socket else None
+    result = asyncio.run(main_simulation(users, concurrent_users, rate_share, first_user, report=False,
+                                         control_socket=control_socket, events_prefix=f"events-shard{shard}"))
+    result['shard'] = shard
+    return result
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulate visitors over HTTP")
+    parser.add_argument('--users', type=int, default=10, help="total number of users")
+    parser.add_argument('--concurrency', type=int, default=3, help="maximum concurrent users (across all workers)")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes to split the users across")
+    parser.add_argument('--scenario', default=SCENARIO_FILE, help="scenario file describing the journeys")
+    parser.add_argument('--site-graph', default=SITE_GRAPH_FILE, help="link graph built by site_graph.py")
+    parser.add_argument('--browser-ratio', type=float, default=BROWSER_RATIO,
+                        help="fraction of users driving a real browser, e.g. 0.05")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="closed loop: grow and shrink concurrency against the SLOs to find saturation")
+    parser.add_argument('--slo-p99', type=float, default=SLO_P99, help="p99 request latency SLO in seconds")
+    parser.add_argument('--slo-error-rate', type=float, default=SLO_ERROR_RATE, help="error rate SLO")
+    parser.add_argument('--control-socket', default=CONTROL_SOCKET,
+                        help="Unix socket for live control (control.py); empty to disable")
+    parser.add_argument('--events', default=EVENTS_DIR, metavar='DIR',
+                        help="record one row per request and session step into DIR (needs pyarrow)")
+    parser.add_argument('--events-format', choices=['parquet', 'arrow'], default=EVENTS_FORMAT)
+    parser.add_argument('--time-scale', type=float, default=TIME_SCALE, help="dwell time multiplier (0 = no dwell)")
+    args = parser.parse_args()
+    if args.adaptive and args.workers > 1:
+        parser.error("--adaptive controls one process's concurrency; run it without --workers")
+    return args
 
 # Function to run the simulation
 def run_simulation():
-    total_users = 10  # You can adjust this number
-    concurrent_users = 3  # You can adjust this number
+    global scenario, site_graph, BROWSER_RATIO, ADAPTIVE, SLO_P99, SLO_ERROR_RATE, EVENTS_DIR, EVENTS_FORMAT
+    args = parse_args()
+    total_users = args.users
+    concurrent_users = args.concurrency
+    clock.time_scale = args.time_scale
+    BROWSER_RATIO = args.browser_ratio
+    ADAPTIVE, SLO_P99, SLO_ERROR_RATE = args.adaptive, args.slo_p99, args.slo_error_rate
+    EVENTS_DIR, EVENTS_FORMAT = args.events, args.events_format
+    scenario = Scenario.load(args.scenario)
+    if args.site_graph:
+        site_graph = SiteGraph(args.site_graph)
+        logging.info(site_graph.report())
     logging.info(f"Starting simulation with {total_users} total users and {concurrent_users} concurrent users")
-    asyncio.run(main_simulation(total_users, concurrent_users))
+    if args.workers > 1:
+        # Ctrl-C reaches every worker of the process group and each drains itself; the parent
+        # keeps waiting so the shard report is still written
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        results = run_sharded(run_shard, args.workers, total_users, concurrent_users,
+                              time_scale=args.time_scale, scenario_file=args.scenario,
+                              site_graph_file=args.site_graph, browser_ratio=args.browser_ratio,
+                              control_socket=args.control_socket, events_dir=args.events,
+                              events_format=args.events_format)
+        logging.info(shard_report(results))
+    else:
+        asyncio.run(main_simulation(total_users, concurrent_users, control_socket=args.control_socket))
     logging.info("Simulation completed.")
+    logging.info(log_pipeline_report(log_handler))
 
 if __name__ == "__main__":
     run_simulation()
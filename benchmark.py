@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from metrics import PageMetrics, process_tree_rss_mb
+from scenario import Scenario
+from scheduler import ArrivalScheduler, ConstantRate
+from standin_server import localize_scenario
+
+# Summary fields compared against a baseline: (field, True if higher is better)
+SUMMARY_FIELDS = [
+    ('max_sessions_per_s', True),
+    ('max_requests_per_s', True),
+    ('cpu_ms_per_session', False),
+    ('memory_mb_per_session', False),
+]
+
+
+def cpu_seconds():
+    # Our own CPU plus every finished child (browsers are reaped when their pool closes)
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+# Peak process-tree memory while a load step runs
+class MemoryPeak:
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.baseline = process_tree_rss_mb()
+        self.peak = self.baseline
+
+    async def track(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.peak = max(self.peak, await loop.run_in_executor(None, process_tree_rss_mb))
+            await asyncio.sleep(self.interval)
+
+
+async def measure_step(run_step, concurrency, sessions):
+    memory = MemoryPeak()
+    tracker = asyncio.create_task(memory.track())
+    cpu_start = cpu_seconds()
+    start = time.monotonic()
+    try:
+        requests = await run_step(concurrency, sessions)
+    finally:
+        tracker.cancel()
+    elapsed = time.monotonic() - start
+    cpu = cpu_seconds() - cpu_start
+    return {
+        'concurrency': concurrency,
+        'sessions': sessions,
+        'requests': requests,
+        'elapsed': elapsed,
+        'sessions_per_s': sessions / elapsed,
+        'requests_per_s': requests / elapsed,
+        'cpu_ms_per_session': cpu * 1000 / sessions,
+        'memory_mb_per_session': max(0.0, memory.peak - memory.baseline) / concurrency,
+    }
+
+
+# HTTP engine (app.py) step: closed loop at the given concurrency with dwell disabled
+def http_step(scenario):
+    import app
+    app.scenario = scenario
+    app.PROXY = None
+    app.clock.time_scale = 0
+    app.ARRIVAL_PROCESS = 'constant'
+    app.ARRIVAL_RATE = 1e6  # Arrivals are only limited by free concurrency slots
+
+    async def run_step(concurrency, sessions):
+        result = await app.main_simulation(sessions, concurrency, report=False)
+        return sum(category['requests'] for category in result['metrics'].values())
+    return run_step
+
+
+# Playwright engine (traffic_generator_v3.py) step: pooled browsers, no Tor, dwell disabled
+def browser_step(scenario, pool_size, fidelity):
+    import traffic_generator_v3 as browser_generator
+    from browser_pool import BrowserPool
+    from fidelity import ResourceStats
+    browser_generator.scenario = scenario
+    browser_generator.PROXY_SERVER = None
+    browser_generator.CHECK_TOR_IP = False
+    browser_generator.clock.time_scale = 0
+    browser_generator.FIDELITY = fidelity
+
+    async def run_step(concurrency, sessions):
+        browser_generator.page_metrics = PageMetrics()
+        browser_generator.resource_stats = ResourceStats(fidelity)
+        pool = await BrowserPool(min(pool_size, concurrency), 'firefox').start()
+        scheduler = ArrivalScheduler(ConstantRate(1e6), total_users=sessions, max_concurrency=concurrency)
+        journeys = scenario.journeys()
+        try:
+            await scheduler.run(lambda user_number: browser_generator.simulate_user(user_number, next(journeys), pool))
+        finally:
+            await pool.close()
+        return sum(category.requests for category in browser_generator.page_metrics.categories.values())
+    return run_step
+
+
+def summarize(steps):
+    best = max(steps, key=lambda step: step['sessions_per_s'])
+    return {
+        'max_sessions_per_s': best['sessions_per_s'],
+        'max_requests_per_s': max(step['requests_per_s'] for step in steps),
+        'cpu_ms_per_session': best['cpu_ms_per_session'],
+        'memory_mb_per_session': best['memory_mb_per_session'],
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for engine, current in results['engines'].items():
+        previous = baseline.get('engines', {}).get(engine)
+        if not previous:
+            continue
+        for field, higher_is_better in SUMMARY_FIELDS:
+            old, new = previous['summary'][field], current['summary'][field]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f"{engine} {field}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+    return regressions
+
+
+async def run_benchmark(args, scenario):
+    engines = {}
+    for engine in args.engines:
+        if engine == 'http':
+            run_step, levels = http_step(scenario), args.http_levels
+        else:
+            run_step, levels = browser_step(scenario, args.browser_pool_size, args.fidelity), args.browser_levels
+        if not args.verbose:
+            # Importing the generators turns on INFO logging; per-session lines would dominate the CPU numbers
+            logging.getLogger().setLevel(logging.WARNING)
+        steps = []
+        for concurrency in levels:
+            step = await measure_step(run_step, concurrency, concurrency * args.sessions_per_slot)
+            print(f"{engine:<8} concurrency {concurrency:>4}: {step['sessions_per_s']:8.2f} sessions/s "
+                  f"{step['requests_per_s']:9.1f} req/s {step['cpu_ms_per_session']:8.1f} ms CPU/session "
+                  f"{step['memory_mb_per_session']:7.2f} MB/session")
+            steps.append(step)
+        engines[engine] = {'steps': steps, 'summary': summarize(steps)}
+    return engines
+
+
+def parse_levels(value):
+    return [int(level) for level in value.split(',')]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the generator's own capacity against the local stand-in server")
+    parser.add_argument('--scenario', default='scenarios/exponentiel.toml')
+    parser.add_argument('--engines', type=lambda value: value.split(','), default=['http', 'browser'])
+    parser.add_argument('--http-levels', type=parse_levels, default=[10, 50, 100, 200])
+    parser.add_argument('--browser-levels', type=parse_levels, default=[1, 2, 4, 8])
+    parser.add_argument('--browser-pool-size', type=int, default=2)
+    parser.add_argument('--fidelity', choices=['full', 'no-media', 'document-plus-scripts', 'document-only'], default='full',
+                        help="resource loading level for browser sessions")
+    parser.add_argument('--sessions-per-slot', type=int, default=5, help="sessions per concurrency slot at each level")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--size', type=int, default=50 * 1024)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="previous results file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed relative change before flagging")
+    parser.add_argument('--verbose', action='store_true', help="keep per-session INFO logging on")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    base_url = f"http://127.0.0.1:{args.port}"
+    scenario = localize_scenario(Scenario.load(args.scenario), base_url)
+
+    # The stand-in server runs in its own process so it doesn't compete with the generator's loop
+    server = subprocess.Popen([sys.executable, 'standin_server.py', '--scenario', args.scenario,
+                               '--port', str(args.port), '--latency', str(args.latency),
+                               '--size', str(args.size), '--error-rate', str(args.error_rate)])
+    try:
+        time.sleep(1.5)
+        engines = asyncio.run(run_benchmark(args, scenario))
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'settings': {'latency': args.latency, 'size': args.size, 'error_rate': args.error_rate,
+                     'sessions_per_slot': args.sessions_per_slot, 'fidelity': args.fidelity},
+        'engines': engines,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Error as PlaywrightError
+
+
+# A browser process in the pool and the number of contexts it is serving
+class PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.active_contexts = 0
+        self.contexts_served = 0
+        self.recycling = False  # A replacement browser is being launched
+
+
+# Long-lived pool of browsers: started once per run, each user gets an isolated
+# BrowserContext from the least-loaded browser instead of launching its own browser.
+class BrowserPool:
+    def __init__(self, size=2, browser_type='firefox', recycle_after=200, **launch_options):
+        self.size = size
+        self.browser_type = browser_type
+        self.recycle_after = recycle_after  # Relaunch a browser after serving this many contexts
+        self.launch_options = launch_options
+        self.browsers = []
+        self.launches = 0
+        self._owners = {}  # context -> PooledBrowser that created it
+        self._playwright = None
+        self._lock = asyncio.Lock()
+        self._recycled = asyncio.Condition(self._lock)  # Notified when a browser finishes recycling
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        for _ in range(self.size):
+            self.browsers.append(PooledBrowser(await self._launch()))
+        logging.info(f"Browser pool started with {self.size} {self.browser_type} browsers")
+        return self
+
+    async def _launch(self):
+        self.launches += 1
+        return await getattr(self._playwright, self.browser_type).launch(**self.launch_options)
+
+    async def new_context(self, **context_options):
+        async with self._lock:
+            # A recycling browser is about to be closed: never open a context on it
+            await self._recycled.wait_for(lambda: any(not b.recycling for b in self.browsers))
+            pooled = min((b for b in self.browsers if not b.recycling), key=lambda b: b.active_contexts)
+            if not pooled.browser.is_connected():
+                logging.warning("Pooled browser disconnected, relaunching")
+                pooled.browser = await self._launch()
+                pooled.contexts_served = 0
+            pooled.active_contexts += 1
+            pooled.contexts_served += 1
+        try:
+            context = await pooled.browser.new_context(**context_options)
+        except PlaywrightError:
+            pooled.active_contexts -= 1
+            raise
+        self._owners[context] = pooled
+        return context
+
+    async def release(self, context):
+        pooled = self._owners.pop(context)
+        try:
+            await context.close()
+        except PlaywrightError as e:
+            logging.warning(f"Error closing browser context: {e}")
+        pooled.active_contexts -= 1
+
+        # Recycle browsers that have served many sessions to keep their memory in check. The lock only
+        # covers the swap: launching and closing happen outside it so other releases are not stalled,
+        # and new_context leaves the browser alone until the swap is done.
+        async with self._lock:
+            if pooled.active_contexts or pooled.contexts_served < self.recycle_after or pooled.recycling:
+                return
+            pooled.recycling = True
+        old_browser = None
+        try:
+            new_browser = await self._launch()
+        except PlaywrightError as e:
+            logging.warning(f"Error relaunching pooled browser: {e}")
+            new_browser = None
+        async with self._lock:
+            if new_browser is not None:
+                old_browser = pooled.browser
+                pooled.browser = new_browser
+                pooled.contexts_served = 0
+            pooled.recycling = False
+            self._recycled.notify_all()
+        if old_browser is None:
+            return
+        try:
+            await old_browser.close()
+        except PlaywrightError as e:
+            logging.warning(f"Error closing recycled browser: {e}")
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        context = await self.new_context(**context_options)
+        try:
+            yield context
+        finally:
+            await self.release(context)
+
+    async def close(self):
+        for pooled in self.browsers:
+            try:
+                await pooled.browser.close()
+            except PlaywrightError:
+                pass
+        self.browsers = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+# Context for one user session: from the pool when given, else from a browser launched just for this user
+@asynccontextmanager
+async def user_context(pool=None, browser_type='firefox', launch_options=None, **context_options):
+    if pool is not None:
+        async with pool.context(**context_options) as context:
+            yield context
+        return
+
+    async with async_playwright() as p:
+        browser = await getattr(p, browser_type).launch(**(launch_options or {}))
+        try:
+            yield await browser.new_context(**context_options)
+        finally:
+            await browser.close()
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+DEFAULT_SOCKET = 'simulation.sock'
+
+HELP = ("status | pause | resume | drain (no new users, let sessions finish) | stop (cancel sessions) | "
+        "concurrency N | rate FACTOR (multiplies the arrival rate)")
+
+
+# Live control of a running simulation. The arrival loop asks it whether to start the next user
+# (paused: wait, draining: stop arriving); stop() also cancels the in-flight sessions, which
+# close their browser contexts and HTTP sessions on the way out, so the run's reports still get written.
+class RunControl:
+    def __init__(self, status=None):
+        self.status_extra = status  # Optional callable adding run-specific fields to 'status'
+        self.paused = False
+        self.draining = False
+        self.stopping = False
+        self.rate_factor = 1.0
+        self.paused_seconds = 0.0  # Shifts the arrival timeline so a pause does not end in a burst
+        self.cancelled = 0
+        self.scheduler = None
+        self.slots = None
+        self.sessions = set()
+        self.start_time = time.monotonic()
+        self._changed = asyncio.Event()
+        self._signals = 0
+
+    def attach(self, scheduler, slots, sessions):
+        self.scheduler = scheduler
+        self.slots = slots
+        self.sessions = sessions
+
+    def _notify(self):
+        # Wake everything waiting on the control, then re-arm
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_running(self):
+        """Wait while paused; returns False once the run is draining."""
+        if self.paused and not self.draining:
+            started = time.monotonic()
+            while self.paused and not self.draining:
+                await self._changed.wait()
+            self.paused_seconds += time.monotonic() - started
+        return not self.draining
+
+    async def sleep(self, delay):
+        """Sleep up to delay seconds; returns False if a command arrived first."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), delay)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    async def acquire(self, slots):
+        """Wait for a session slot; returns False (without a slot) if draining starts first."""
+        while not self.draining:
+            acquire = asyncio.ensure_future(slots.acquire())
+            changed = asyncio.ensure_future(self._changed.wait())
+            await asyncio.wait({acquire, changed}, return_when=asyncio.FIRST_COMPLETED)
+            changed.cancel()
+            if acquire.done():
+                if not self.draining:
+                    return True
+                slots.release()
+                return False
+            acquire.cancel()
+        return False
+
+    def pause(self):
+        self.paused = True
+        self._notify()
+
+    def resume(self):
+        self.paused = False
+        self._notify()
+
+    def drain(self):
+        if not self.draining:
+            logging.info("Control: draining, no new users will start")
+        self.draining = True
+        self._notify()
+
+    def stop(self):
+        self.drain()
+        self.stopping = True
+        for task in list(self.sessions):
+            if not task.done():
+                task.cancel()
+                self.cancelled += 1
+        logging.info(f"Control: stopping, {self.cancelled} sessions cancelled")
+
+    def resize(self, limit):
+        if not hasattr(self.slots, 'set_limit'):
+            raise ValueError("this run's concurrency is fixed")
+        self.slots.set_limit(limit)
+        logging.info(f"Control: concurrency set to {self.slots.limit}")
+
+    def set_rate(self, factor):
+        if factor <= 0:
+            raise ValueError("rate factor must be > 0 (use pause to stop arrivals)")
+        self.rate_factor = factor
+        self._notify()
+        logging.info(f"Control: arrival rate x{factor:g}")
+
+    def state(self):
+        if self.stopping:
+            return 'stopping'
+        if self.draining:
+            return 'draining'
+        return 'paused' if self.paused else 'running'
+
+    def status(self):
+        status = {'state': self.state(), 'uptime': round(time.monotonic() - self.start_time, 1),
+                  'active': sum(1 for task in self.sessions if not task.done()),
+                  'rate_factor': self.rate_factor, 'cancelled': self.cancelled}
+        if self.scheduler is not None:
+            status['arrivals'] = self.scheduler.arrivals
+        if hasattr(self.slots, 'limit'):
+            status['concurrency'] = self.slots.limit
+        if self.status_extra:
+            status.update(self.status_extra())
+        return status
+
+    def execute(self, line):
+        """Run one text command and return the JSON-serializable reply."""
+        words = line.split()
+        if not words:
+            return {'ok': False, 'error': f"empty command; expected {HELP}"}
+        command, arguments = words[0].lower(), words[1:]
+        try:
+            if command == 'pause':
+                self.pause()
+            elif command == 'resume':
+                self.resume()
+            elif command == 'drain':
+                self.drain()
+            elif command == 'stop':
+                self.stop()
+            elif command == 'concurrency' and len(arguments) == 1:
+                self.resize(int(arguments[0]))
+            elif command == 'rate' and len(arguments) == 1:
+                self.set_rate(float(arguments[0]))
+            elif command != 'status':
+                return {'ok': False, 'error': f"unknown command {line.strip()!r}; expected {HELP}"}
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True, **self.status()}
+
+    def install_signal_handlers(self):
+        # First SIGINT/SIGTERM drains, the second one cancels the remaining sessions
+        def handle(signum):
+            self._signals += 1
+            logging.info(f"Control: received {signal.Signals(signum).name}")
+            if self._signals > 1:
+                self.stop()
+            else:
+                self.drain()
+
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, handle, signum)
+            except (NotImplementedError, RuntimeError):
+                return  # Not the main thread (Streamlit) or no signal support: socket only
+
+
+# Line-oriented Unix socket server: one command per line, one JSON reply per line
+class ControlServer:
+    def __init__(self, control, path=DEFAULT_SOCKET):
+        self.control = control
+        self.path = path
+        self.server = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            if _is_listening(self.path):
+                raise RuntimeError(f"Another simulation is already listening on {self.path}")
+            os.unlink(self.path)  # Left over by a killed run
+        self.server = await asyncio.start_unix_server(self._handle, self.path)
+        logging.info(f"Control socket listening on {self.path} ({HELP})")
+        return self
+
+    async def _handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                reply = self.control.execute(line.decode('utf-8', 'replace'))
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def _is_listening(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+            return True
+        except OSError:
+            return False
+
+
+def send_command(path, command, timeout=5.0):
+    """Send one command to a running simulation and return its reply (blocking client)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        client.sendall(command.encode() + b'\n')
+        reply = b''
+        while not reply.endswith(b'\n'):
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    return json.loads(reply)
+
+
+# Sockets of a run: the given path, plus '<path>.<shard>' for each worker process of a sharded run
+def run_sockets(path):
+    return [candidate for candidate in [path] + sorted(glob.glob(glob.escape(path) + '.*'))
+            if os.path.exists(candidate)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Control a running simulation")
+    parser.add_argument('command', nargs='+', help=HELP)
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="control socket of the run")
+    args = parser.parse_args()
+    sockets = run_sockets(args.socket)
+    if not sockets:
+        raise SystemExit(f"No simulation is listening on {args.socket}")
+    failed = False
+    for path in sockets:
+        try:
+            reply = send_command(path, ' '.join(args.command))
+        except OSError as e:
+            reply = {'ok': False, 'error': str(e)}
+        failed |= not reply.get('ok')
+        print(f"{path}: {json.dumps(reply)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
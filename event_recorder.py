@@ -0,0 +1,259 @@
+import argparse
+import glob
+import logging
+import math
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+# One row per request and per session step. Strings are stored as int32 codes into run-wide,
+# append-only dictionaries (a page or URL repeats millions of times but is kept once); -1 is null.
+NUMERIC_COLUMNS = {
+    'user': np.int32,
+    'start': np.float64,     # Epoch seconds
+    'duration': np.float32,  # Seconds
+    'ttfb': np.float32,      # Seconds, NaN for steps and cache hits
+    'status': np.int16,      # 0 when there was no response
+    'bytes': np.int64,
+}
+STRING_COLUMNS = ['event', 'phase', 'page', 'url', 'error']
+COLUMN_ORDER = ['event', 'user', 'phase', 'page', 'url', 'start', 'duration', 'ttfb', 'status', 'bytes', 'error']
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def arrow_schema():
+    import pyarrow as pa
+    types = {'user': pa.int32(), 'start': pa.timestamp('us', tz='UTC'), 'duration': pa.float32(),
+             'ttfb': pa.float32(), 'status': pa.int16(), 'bytes': pa.int64()}
+    for name in STRING_COLUMNS:
+        types[name] = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([(name, types[name]) for name in COLUMN_ORDER])
+
+
+# Preallocated column arrays for one batch; recycled once the writer thread has written them
+class ColumnBuffers:
+    def __init__(self, size):
+        self.size = size
+        self.rows = 0
+        self.columns = {name: np.empty(size, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        self.columns.update({name: np.empty(size, dtype=np.int32) for name in STRING_COLUMNS})
+        self.dictionaries = None  # Snapshot of the string dictionaries taken when the batch is handed over
+
+
+# Typed event recorder. Rows are appended into the current ColumnBuffers from the event loop with no
+# I/O; full batches go to a writer thread that encodes them with pyarrow and appends them to the
+# current file, starting a new one every rows_per_file rows. pyarrow is only needed when enabled.
+class EventRecorder:
+    def __init__(self, directory, format='parquet', batch_size=65536, rows_per_file=1_000_000, prefix='events',
+                 compression='zstd'):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown event format: {format} (expected one of {', '.join(FORMATS)})")
+        try:
+            import pyarrow  # noqa: F401 (fail at startup, not at the first flush)
+        except ImportError:
+            raise RuntimeError("Event recording needs pyarrow (pip install -r requirements.txt)") from None
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.format = format
+        self.batch_size = batch_size
+        self.rows_per_file = rows_per_file
+        self.prefix = prefix
+        self.compression = compression
+
+        self.dictionaries = {name: {} for name in STRING_COLUMNS}  # value -> code, in code order
+        self.free = queue.Queue()
+        for _ in range(2):
+            self.free.put(ColumnBuffers(batch_size))
+        self.extra_buffers = 0  # Allocated because the writer fell behind
+        self.buffers = self.free.get()
+        self.pending = queue.Queue()  # Never blocks the event loop; a slow disk costs extra buffers instead
+        self.schema = arrow_schema()
+
+        self.rows = 0
+        self.rows_written = 0
+        self.files = []
+        self.write_time = 0.0
+        self._writer = None
+        self._file_rows = 0
+        self._thread = threading.Thread(target=self._drain, name='event-writer', daemon=True)
+        self._thread.start()
+
+    def _code(self, column, value):
+        if value is None:
+            return -1
+        codes = self.dictionaries[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def _append(self, event, user, phase, page, url, start, end, ttfb, status, nbytes, error):
+        buffers = self.buffers
+        row = buffers.rows
+        columns = buffers.columns
+        columns['event'][row] = self._code('event', event)
+        columns['user'][row] = user
+        columns['phase'][row] = self._code('phase', phase)
+        columns['page'][row] = self._code('page', page)
+        columns['url'][row] = self._code('url', url)
+        columns['start'][row] = start
+        columns['duration'][row] = end - start
+        columns['ttfb'][row] = ttfb
+        columns['status'][row] = status
+        columns['bytes'][row] = nbytes
+        columns['error'][row] = self._code('error', error)
+        buffers.rows = row + 1
+        self.rows += 1
+        if buffers.rows == buffers.size:
+            self._hand_over()
+
+    def request(self, user, page, url, start, end, ttfb=math.nan, status=0, nbytes=0, phase='network', error=None):
+        """One HTTP request; phase is 'network' or the cache outcome ('hit', 'revalidated')."""
+        self._append('request', user, phase, page, url, start, end, ttfb, status, nbytes, error)
+
+    def step(self, user, phase, page, url, start, end, status=0, nbytes=0, error=None):
+        """One step of a session: 'session', 'visit', 'interact', 'link', 'dwell'..."""
+        self._append('step', user, phase, page, url, start, end, math.nan, status, nbytes, error)
+
+    def _hand_over(self):
+        if not self.buffers.rows:
+            return
+        # Codes only ever grow, so a snapshot of the lists is valid for every row written so far
+        self.buffers.dictionaries = {name: list(codes) for name, codes in self.dictionaries.items()}
+        self.pending.put(self.buffers)
+        try:
+            self.buffers = self.free.get_nowait()
+        except queue.Empty:
+            self.extra_buffers += 1
+            self.buffers = ColumnBuffers(self.batch_size)
+
+    def _drain(self):
+        while True:
+            buffers = self.pending.get()
+            if buffers is None:
+                break
+            started = time.perf_counter()
+            try:
+                self._write(buffers)
+            except Exception as e:
+                logging.error(f"Event recorder: failed to write {buffers.rows} rows: {e}")
+            self.write_time += time.perf_counter() - started
+            buffers.rows = 0
+            self.free.put(buffers)
+        self._close_file()
+
+    def _batch(self, buffers):
+        import pyarrow as pa
+        rows = buffers.rows
+        arrays = []
+        for name in COLUMN_ORDER:
+            values = buffers.columns[name][:rows]
+            if name in NUMERIC_COLUMNS:
+                if name == 'start':
+                    values = (values * 1e6).astype(np.int64)
+                arrays.append(pa.array(values, type=self.schema.field(name).type))
+            else:
+                indices = pa.array(values, mask=values < 0)
+                arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(buffers.dictionaries[name], pa.string())))
+        return pa.record_batch(arrays, schema=self.schema)
+
+    def _write(self, buffers):
+        if self._writer is None or self._file_rows >= self.rows_per_file:
+            self._open_file()
+        batch = self._batch(buffers)
+        if self.format == 'parquet':
+            self._writer.write_batch(batch, row_group_size=self.batch_size)
+        else:
+            self._writer.write_batch(batch)
+        self._file_rows += buffers.rows
+        self.rows_written += buffers.rows
+
+    def _open_file(self):
+        import pyarrow as pa
+        self._close_file()
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.files):04d}{FORMATS[self.format]}")
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self.schema, compression=self.compression)
+        else:
+            # Dictionaries grow between batches: the file carries only the new entries of each batch
+            options = pa.ipc.IpcWriteOptions(compression=self.compression, emit_dictionary_deltas=True)
+            self._writer = pa.ipc.new_file(path, self.schema, options=options)
+        self.files.append(path)
+        self._file_rows = 0
+
+    def _close_file(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def close(self):
+        """Write the partial batch, finish the current file and stop the writer thread."""
+        self._hand_over()
+        self.pending.put(None)
+        self._thread.join()
+
+    def disk_bytes(self):
+        return sum(os.path.getsize(path) for path in self.files if os.path.exists(path))
+
+    def stats(self):
+        return {'rows': self.rows, 'rows_written': self.rows_written, 'files': len(self.files),
+                'disk_bytes': self.disk_bytes(), 'write_time': self.write_time, 'extra_buffers': self.extra_buffers}
+
+    def report(self):
+        stats = self.stats()
+        per_row = stats['disk_bytes'] / stats['rows_written'] if stats['rows_written'] else 0.0
+        return (f"Events: {stats['rows']} recorded, {stats['rows_written']} written to {stats['files']} "
+                f"{self.format} files in {self.directory} ({stats['disk_bytes'] / 1024:.1f} KB, "
+                f"{per_row:.1f} bytes/row, {stats['write_time']:.2f}s writing off the event loop, "
+                f"{stats['extra_buffers']} extra buffers)")
+
+
+def event_files(path):
+    if os.path.isdir(path):
+        return sorted(name for extension in FORMATS.values() for name in glob.glob(os.path.join(path, '*' + extension)))
+    return [path]
+
+
+def read_events(path):
+    """All events of a file or directory as one pyarrow Table (.to_pandas() for a DataFrame)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    tables = []
+    for name in event_files(path):
+        if name.endswith('.parquet'):
+            tables.append(pq.read_table(name))
+        else:
+            with pa.memory_map(name) as source:
+                tables.append(pa.ipc.open_file(source).read_all())
+    if not tables:
+        raise FileNotFoundError(f"No event files in {path}")
+    return pa.concat_tables(tables).unify_dictionaries()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize recorded events")
+    parser.add_argument('path', help="event file or directory")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    frame = read_events(args.path).to_pandas()
+    loaded = time.perf_counter() - started
+    size = sum(os.path.getsize(name) for name in event_files(args.path))
+    print(f"{len(frame)} events loaded in {loaded:.2f}s from {size / 1024:.1f} KB")
+    requests = frame[frame['event'] == 'request']
+    if len(requests):
+        requests = requests.assign(failed=(requests['status'] >= 400) | requests['error'].notna())
+        summary = requests.groupby('page', observed=True).agg(
+            requests=('duration', 'size'), errors=('failed', 'sum'),
+            p50=('duration', lambda values: values.quantile(0.5)), p99=('duration', lambda values: values.quantile(0.99)),
+            kb=('bytes', lambda values: values.sum() / 1024))
+        print(summary.to_string(float_format=lambda value: f"{value:.3f}"))
+    steps = frame[frame['event'] == 'step']
+    if len(steps):
+        print(steps.groupby('phase', observed=True)['duration'].describe().to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import logging
+from urllib.parse import urlsplit
+from playwright.async_api import Error as PlaywrightError
+
+# Resource-loading fidelity for browser sessions, enforced with context.route:
+#   full                  everything the page asks for
+#   no-media              no images, media or fonts
+#   document-plus-scripts the document, first-party scripts and XHR/fetch (the backend calls)
+#   document-only         the document alone
+FIDELITY_LEVELS = {
+    'full': {'blocked': set(), 'first_party_only': False, 'wait_until': 'networkidle'},
+    'no-media': {'blocked': {'image', 'media', 'font'}, 'first_party_only': False, 'wait_until': 'networkidle'},
+    'document-plus-scripts': {'blocked': {'image', 'media', 'font', 'stylesheet', 'texttrack', 'manifest', 'other'},
+                              'first_party_only': True, 'wait_until': 'networkidle'},
+    'document-only': {'blocked': None, 'first_party_only': True, 'wait_until': 'domcontentloaded'},
+}
+
+# Static resource types served from the per-context cache once fetched
+CACHEABLE_TYPES = {'stylesheet', 'script', 'image', 'font', 'media'}
+
+
+def site_of(url):
+    # Last two labels of the host: www.example.com and cdn.example.com are the same site
+    host = urlsplit(url).hostname or ''
+    return '.'.join(host.split('.')[-2:])
+
+
+def wait_until(level):
+    return FIDELITY_LEVELS[level]['wait_until']
+
+
+# Requests and bytes per resource type for one run: fetched, blocked, served from cache
+class ResourceStats:
+    def __init__(self, level):
+        self.level = level
+        self.types = {}
+
+    def _counters(self, resource_type):
+        if resource_type not in self.types:
+            self.types[resource_type] = {'fetched': 0, 'fetched_bytes': 0, 'sized': 0,
+                                         'blocked': 0, 'cache_hits': 0, 'cache_bytes': 0}
+        return self.types[resource_type]
+
+    def fetched(self, resource_type, nbytes=None):
+        counters = self._counters(resource_type)
+        counters['fetched'] += 1
+        if nbytes is not None:
+            counters['fetched_bytes'] += nbytes
+            counters['sized'] += 1
+
+    def blocked(self, resource_type):
+        self._counters(resource_type)['blocked'] += 1
+
+    def cache_hit(self, resource_type, nbytes):
+        counters = self._counters(resource_type)
+        counters['cache_hits'] += 1
+        counters['cache_bytes'] += nbytes
+
+    def report(self):
+        """Requests and bytes saved per resource type. Blocked bytes are estimated from the
+        mean size of the same type fetched in this run (n/a when none were fetched)."""
+        lines = [f"Resource loading [{self.level}]",
+                 f"{'type':<12}{'fetched':>9}{'blocked':>9}{'cached':>9}{'KB saved':>12}"]
+        saved_requests = 0
+        saved_kb = 0.0
+        for resource_type in sorted(self.types):
+            counters = self.types[resource_type]
+            kilobytes = counters['cache_bytes'] / 1024
+            saved = f"{kilobytes:.1f}"
+            if counters['blocked']:
+                if counters['sized']:
+                    kilobytes += counters['blocked'] * counters['fetched_bytes'] / counters['sized'] / 1024
+                    saved = f"~{kilobytes:.1f}"
+                else:
+                    saved += '+'  # Blocked bytes unknown: lower bound
+            saved_requests += counters['blocked'] + counters['cache_hits']
+            saved_kb += kilobytes
+            lines.append(f"{resource_type:<12}{counters['fetched']:>9}{counters['blocked']:>9}"
+                         f"{counters['cache_hits']:>9}{saved:>12}")
+        lines.append(f"Saved {saved_requests} requests and about {saved_kb:.1f} KB "
+                     f"(~ estimated from fetched sizes, + blocked bytes unknown)")
+        return '\n'.join(lines)
+
+
+# Install the fidelity level on a browser context. Routing turns off the browser's HTTP cache,
+# so static assets already fetched by this context are replayed from a small in-memory cache.
+async def apply_fidelity(context, level, stats=None, cache_bytes=16 * 1024 * 1024):
+    rules = FIDELITY_LEVELS[level]
+    if level == 'full':
+        return  # Nothing to enforce: leave routing (and the browser's own cache) alone
+    cache = {}  # url -> (status, headers, body)
+    cache_used = 0
+
+    async def handle(route, request):
+        nonlocal cache_used
+        resource_type = request.resource_type
+        try:
+            if resource_type != 'document':
+                blocked = rules['blocked']
+                first_party = site_of(request.url) == site_of(request.frame.url) if rules['first_party_only'] else True
+                if blocked is None or resource_type in blocked or not first_party:
+                    if stats:
+                        stats.blocked(resource_type)
+                    await route.abort('blockedbyclient')
+                    return
+
+            if resource_type not in CACHEABLE_TYPES or request.method != 'GET' or not cache_bytes:
+                if stats:
+                    stats.fetched(resource_type)
+                await route.continue_()
+                return
+
+            cached = cache.get(request.url)
+            if cached:
+                status, headers, body = cached
+                if stats:
+                    stats.cache_hit(resource_type, len(body))
+                await route.fulfill(status=status, headers=headers, body=body)
+                return
+
+            response = await route.fetch()
+            body = await response.body()
+            if stats:
+                stats.fetched(resource_type, len(body))
+            if (response.status == 200 and 'no-store' not in response.headers.get('cache-control', '')
+                    and cache_used + len(body) <= cache_bytes):
+                cache[request.url] = (response.status, response.headers, body)
+                cache_used += len(body)
+            await route.fulfill(response=response, body=body)
+        except PlaywrightError as e:
+            # Context closed mid-request or the fetch itself failed
+            logging.debug(f"Route for {request.url} failed: {e}")
+            try:
+                await route.abort()
+            except PlaywrightError:
+                pass
+
+    await context.route('**/*', handle)
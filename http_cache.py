@@ -0,0 +1,135 @@
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+# Heuristic freshness for responses with Last-Modified but no explicit lifetime (RFC 9111 4.2.2)
+HEURISTIC_FRACTION = 0.1
+
+
+def parse_cache_control(value):
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+
+def parse_http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+# What the cache remembers about a response. Bodies are streamed and dropped by the engine, so
+# an entry only keeps validators and the size the body would occupy in a browser cache.
+class CacheEntry:
+    __slots__ = ('etag', 'last_modified', 'size', 'expires', 'no_cache')
+
+    def __init__(self, etag, last_modified, size, expires, no_cache):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.size = size
+        self.expires = expires
+        self.no_cache = no_cache
+
+
+# Hit / revalidation / miss counters, shared by every cache of a run
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+    def lookups(self):
+        return self.hits + self.revalidations + self.misses
+
+    def stats(self):
+        return {'hits': self.hits, 'revalidations': self.revalidations, 'misses': self.misses,
+                'bytes_saved': self.bytes_saved, 'evictions': self.evictions}
+
+    def report(self):
+        total = self.lookups() or 1
+        return (f"HTTP cache: {self.lookups()} lookups, hits {self.hits / total:.1%}, "
+                f"revalidated {self.revalidations / total:.1%} (304), misses {self.misses / total:.1%}, "
+                f"{self.bytes_saved / 1024:.1f} KB not transferred, {self.evictions} evictions")
+
+
+# Browser-like HTTP cache for one user session (or, with shared=True, a proxy-like cache for
+# all of them). Honours Cache-Control (no-store, no-cache, private, max-age, s-maxage), Expires,
+# ETag and Last-Modified, revalidates stale entries with If-None-Match / If-Modified-Since and
+# evicts least recently used entries once the cached sizes exceed max_bytes.
+class HttpCache:
+    def __init__(self, max_bytes=50 * 1024 * 1024, shared=False, stats=None, now=time.monotonic):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.stats = stats or CacheStats()
+        self.now = now  # Clock for freshness; a VirtualClock keeps max-age meaningful in compressed time
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def request(self, url):
+        """Returns (fresh, headers): fresh is True when the stored response can be reused without
+        a request; otherwise headers holds the conditional request headers (possibly empty)."""
+        entry = self.entries.get(url)
+        if entry is None:
+            return False, {}
+        self.entries.move_to_end(url)
+        if not entry.no_cache and self.now() < entry.expires:
+            self.stats.hits += 1
+            self.stats.bytes_saved += entry.size
+            return True, {}
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return False, headers
+
+    def response(self, url, status, headers, nbytes):
+        """Update the cache from a response; returns 'revalidated' for a 304 on a stored entry, else 'miss'."""
+        entry = self.entries.get(url)
+        if status == 304 and entry is not None:
+            self.stats.revalidations += 1
+            self.stats.bytes_saved += entry.size
+            entry.expires = self._expires(headers, parse_cache_control(headers.get('Cache-Control')))
+            entry.etag = headers.get('ETag', entry.etag)
+            return 'revalidated'
+
+        self.stats.misses += 1
+        if entry is not None:
+            self._remove(url)
+        directives = parse_cache_control(headers.get('Cache-Control'))
+        cacheable = status == 200 and 'no-store' not in directives and not (self.shared and 'private' in directives)
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+        expires = self._expires(headers, directives) if cacheable else 0.0
+        if cacheable and nbytes <= self.max_bytes and (etag or last_modified or expires > self.now()):
+            self.entries[url] = CacheEntry(etag, last_modified, nbytes, expires, 'no-cache' in directives)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.stats.evictions += 1
+        return 'miss'
+
+    def _expires(self, headers, directives):
+        now = self.now()
+        for name in (('s-maxage', 'max-age') if self.shared else ('max-age',)):
+            if name in directives:
+                try:
+                    return now + int(directives[name])
+                except ValueError:
+                    return now
+        date = parse_http_date(headers.get('Date')) or time.time()
+        expires = parse_http_date(headers.get('Expires')) if 'Expires' in headers else None
+        if 'Expires' in headers:
+            return now + (expires - date if expires is not None else 0)  # Invalid Expires means already stale
+        last_modified = parse_http_date(headers.get('Last-Modified'))
+        if last_modified is not None:
+            return now + max(0.0, date - last_modified) * HEURISTIC_FRACTION
+        return now
+
+    def _remove(self, url):
+        self.size -= self.entries.pop(url).size
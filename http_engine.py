@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import logging
+import ssl
+import time
+from urllib.parse import urlsplit
+from collections import namedtuple
+import aiohttp
+
+# Outcome of one fetch: status, body bytes read, the body's digest (None unless hashing) and
+# the HTTP cache outcome ('hit', 'revalidated', 'miss' or None without a cache)
+FetchResult = namedtuple('FetchResult', ['status', 'bytes', 'digest', 'cache'], defaults=[None])
+
+
+# Run-wide HTTP engine: one shared connector (keep-alive pool + DNS cache) for every user.
+# Each user still gets its own ClientSession so cookies and headers stay isolated.
+class HttpEngine:
+    def __init__(self, limit=100, limit_per_host=20, dns_ttl=300, keepalive_timeout=30, verify_ssl=False, proxy=None,
+                 metrics=None, chunk_size=64 * 1024, hash_bodies=None, events=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.verify_ssl = verify_ssl
+        self.proxy = proxy
+        self.metrics = metrics  # PageMetrics receiving per-request timings, if any
+        self.events = events    # EventRecorder receiving one row per request, if any
+        self.chunk_size = chunk_size
+        self.hash_bodies = hash_bodies  # hashlib algorithm name (e.g. 'sha256') to digest every body
+        self.connector = None
+
+        # Body counters: bytes read, bodies shorter than their Content-Length, pages whose content changed
+        self.body_bytes = 0
+        self.short_bodies = 0
+        self.digest_changes = 0
+        self.digests = {}  # url -> last digest seen
+
+        # Connection / DNS counters filled in by the trace hooks
+        self.connections_created = 0
+        self.tls_handshakes = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._on_request_start)
+        self.trace_config.on_connection_create_end.append(self._on_connection_create)
+        self.trace_config.on_connection_reuseconn.append(self._on_connection_reuse)
+        self.trace_config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        self.trace_config.on_dns_cache_miss.append(self._on_dns_cache_miss)
+
+    async def start(self, warm_up_urls=(), connections_per_host=2):
+        ssl_context = ssl.create_default_context()
+        if not self.verify_ssl:
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+
+        self.connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        if warm_up_urls:
+            await self.warm_up(warm_up_urls, connections_per_host)
+        return self
+
+    # Pre-open keep-alive connections to each origin so the first users skip DNS/TCP/TLS setup
+    async def warm_up(self, urls, connections_per_host=2):
+        origins = {f"{parts.scheme}://{parts.netloc}/" for parts in map(urlsplit, urls)}
+
+        async def preconnect(session, origin):
+            try:
+                async with session.head(origin, proxy=self.proxy, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    await response.release()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"Warm-up request to {origin} failed: {e}")
+
+        async with self.user_session() as session:
+            await asyncio.gather(*(preconnect(session, origin)
+                                   for origin in origins for _ in range(connections_per_host)))
+        logging.info(f"Warmed up {len(origins)} origins with {connections_per_host} connections each")
+
+    # Per-user session on top of the shared connector, with its own cookie jar and headers
+    def user_session(self, user_agent=None, headers=None):
+        session_headers = dict(headers or {})
+        if user_agent:
+            session_headers['User-Agent'] = user_agent
+        return aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=False,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            headers=session_headers,
+            trace_configs=[self.trace_config],
+        )
+
+    # GET a page, stream its body to the end and record TTFB, total time, bytes and status under its category.
+    # The body is consumed chunk by chunk and never held whole; reading it to EOF lets the connection
+    # go back to the pool for keep-alive instead of being closed with unread data.
+    # With an HttpCache, fresh entries are served without a request and stale ones are revalidated.
+    # method, headers, data and allow_redirects allow replaying recorded requests (the cache only applies to GET).
+    # user only labels the request's row in the event recording.
+    async def fetch(self, session, url, category='other', timeout=60, cache=None, method='GET', headers=None,
+                    data=None, allow_redirects=True, user=0):
+        headers = dict(headers or {})
+        if method != 'GET':
+            cache = None
+        if cache is not None:
+            fresh, conditional = cache.request(url)
+            if fresh:
+                if self.events is not None:
+                    now = time.time()
+                    self.events.request(user, category, url, now, now, status=200, phase='hit')
+                return FetchResult(200, 0, None, 'hit')
+            headers.update(conditional)
+
+        wall_start = time.time()
+        start = time.perf_counter()
+        digest = hashlib.new(self.hash_bodies) if self.hash_bodies else None
+        nbytes = 0
+        try:
+            async with session.request(method, url, headers=headers, data=data, proxy=self.proxy,
+                                       timeout=timeout, allow_redirects=allow_redirects) as response:
+                ttfb = time.perf_counter() - start
+                status = response.status
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    nbytes += len(chunk)
+                    if digest:
+                        digest.update(chunk)
+                expected = response.content_length
+                response_headers = response.headers
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.record_error(category)
+            if self.events is not None:
+                self.events.request(user, category, url, wall_start, wall_start + time.perf_counter() - start,
+                                    nbytes=nbytes, error=type(e).__name__)
+            raise
+        elapsed = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.record(category, ttfb, elapsed, nbytes, status)
+
+        outcome = cache.response(url, status, response_headers, nbytes) if cache is not None else None
+        if self.events is not None:
+            self.events.request(user, category, url, wall_start, wall_start + elapsed, ttfb, status, nbytes,
+                                phase=outcome if outcome == 'revalidated' else 'network')
+        self.body_bytes += nbytes
+        if expected is not None and nbytes < expected:
+            self.short_bodies += 1
+        if digest:
+            digest = digest.hexdigest()
+            if status == 200:
+                if self.digests.get(url, digest) != digest:
+                    self.digest_changes += 1
+                self.digests[url] = digest
+        return FetchResult(status, nbytes, digest, outcome)
+
+    async def _on_request_start(self, session, ctx, params):
+        ctx.is_https = params.url.scheme == 'https'
+
+    async def _on_connection_create(self, session, ctx, params):
+        self.connections_created += 1
+        if getattr(ctx, 'is_https', False):
+            self.tls_handshakes += 1
+
+    async def _on_connection_reuse(self, session, ctx, params):
+        self.connections_reused += 1
+
+    async def _on_dns_cache_hit(self, session, ctx, params):
+        self.dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(self, session, ctx, params):
+        self.dns_cache_misses += 1
+
+    def reuse_ratio(self):
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total else 0.0
+
+    def stats(self):
+        return {
+            'connections_created': self.connections_created,
+            'tls_handshakes': self.tls_handshakes,
+            'connections_reused': self.connections_reused,
+            'reuse_ratio': self.reuse_ratio(),
+            'dns_cache_hits': self.dns_cache_hits,
+            'dns_cache_misses': self.dns_cache_misses,
+            'body_bytes': self.body_bytes,
+            'short_bodies': self.short_bodies,
+            'digest_changes': self.digest_changes,
+        }
+
+    def report(self):
+        bodies = f"{self.body_bytes / 1024:.1f} KB of bodies read, {self.short_bodies} short"
+        if self.hash_bodies:
+            bodies += f", {self.digest_changes} content changes"
+        return (f"HTTP engine: {self.connections_created} new connections "
+                f"({self.tls_handshakes} TLS handshakes), "
+                f"{self.connections_reused} reused, reuse ratio {self.reuse_ratio():.1%}, "
+                f"DNS cache {self.dns_cache_hits} hits / {self.dns_cache_misses} misses, {bodies}")
+
+    async def close(self):
+        if self.connector:
+            await self.connector.close()
+            self.connector = None
@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+
+# Visible, navigable links of the current document in a single evaluate call: [href attribute, absolute URL]
+# pairs, deduplicated, without in-page anchors, mailto:/tel:/javascript: links or links opening new windows.
+LINKS_JS = """() => {
+    const seen = new Set();
+    const links = [];
+    for (const a of document.links) {
+        const raw = a.getAttribute('href');
+        if (!raw || raw.startsWith('#') || a.target === '_blank') continue;
+        if (a.protocol !== 'http:' && a.protocol !== 'https:') continue;
+        if (a.origin === location.origin && a.pathname === location.pathname && a.search === location.search) continue;
+        if (!a.getClientRects().length || seen.has(raw)) continue;
+        seen.add(raw);
+        links.push([raw, a.href]);
+    }
+    return links;
+}"""
+
+
+def link_selector(raw_href):
+    # CSS attribute selector matching the exact href attribute
+    return 'a[href="{}"]'.format(raw_href.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+# Run-wide page URL -> links cache. Repeat visits to a page within `ttl` seconds reuse its
+# links instead of extracting them again; the oldest pages are dropped past max_pages.
+class LinkCache:
+    def __init__(self, ttl=300.0, max_pages=10000):
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self.pages = OrderedDict()  # url -> (expires, links)
+        self.hits = 0
+        self.misses = 0
+
+    async def links(self, page):
+        url = page.url
+        cached = self.pages.get(url)
+        if cached and cached[0] > time.monotonic():
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        links = await page.evaluate(LINKS_JS)
+        self.pages[url] = (time.monotonic() + self.ttl, links)
+        self.pages.move_to_end(url)
+        if len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        return links
+
+    def invalidate(self, url):
+        self.pages.pop(url, None)
+
+    def report(self):
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        return (f"Link cache: {self.hits} hits, {self.misses} extractions ({ratio:.1%} hit ratio), "
+                f"{len(self.pages)} pages cached")
@@ -0,0 +1,350 @@
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlsplit
+from metrics import LatencyHistogram
+
+# Record header of every format the scripts have written:
+#   2024-09-16 17:57:44,410 - INFO - message   (log_pipeline / basicConfig format)
+#   2024-09-13 16:13:12,401 ERROR:message      (older scripts)
+#   2024-09-16 17:37:42,234 INFO message
+# Anything up to the next header (traceback, text after a leading "\n") belongs to the record.
+HEADER = re.compile(rb'^(\d{4}-\d\d-\d\d \d\d:\d\d):(\d\d),(\d{3})(?: - | )(DEBUG|INFO|WARNING|ERROR|CRITICAL)'
+                    rb'(?: - |:| )?', re.M)
+
+SESSION = re.compile(r'--- User (\d+) Session (Started|Finished) ---|User (\d+) - Simulation: (Started|Finished)')
+VISIT = re.compile(r'User (\d+) - Visiting(?: (\w+) page| LinkedIn)?: (\S+)')
+SUCCESS = re.compile(r'User (\d+) - Successfully (?:visited|loaded): (\S+)')
+FAILURE = re.compile(r'User (\d+) - (?:Error loading page|Failed to visit \S+|Skipped \S+|Error): (.*)')
+ERROR_WORDS = re.compile(r'\b(?:[Ee]rror|[Ff]ailed|[Ee]xception|[Tt]imeout)\b')
+EXCEPTION_LINE = re.compile(r'^([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Timeout|Warning))(?::|$)', re.M)
+
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+INDEX_EVERY = 1 << 20     # One (offset, time) entry per MiB of log, for --since
+HEAD_BYTES = 4096         # Hash of the file's first bytes: a different head means a rotated or replaced log
+MAX_TIMELINES = 1000      # Finished sessions whose timelines are kept (aggregates cover every session)
+MAX_SESSION_EVENTS = 100
+MAX_ERROR_GROUPS = 500
+
+
+def normalize_error(message):
+    # Error signature: the same failure on another user, URL or port groups together
+    message = re.sub(r'^User \d+ - ', '', message)
+    message = re.sub(r'\w+://\S+', '<url>', message)
+    message = re.sub(r'0x[0-9a-fA-F]+', '<hex>', message)
+    return re.sub(r'\d+', 'N', message)[:100]
+
+
+def page_key(state, url):
+    if state:
+        return state
+    parts = urlsplit(url)
+    return (parts.netloc + parts.path).rstrip('/') or url
+
+
+# Everything the analyzer knows about a log, serializable so a rerun resumes from the sidecar
+class LogAnalysis:
+    def __init__(self):
+        self.records = 0
+        self.levels = {}
+        self.first_time = None
+        self.last_time = None
+        self.sessions_started = 0
+        self.sessions_finished = 0
+        self.sessions_abandoned = 0  # Started again (or a new run began) before their Finished marker
+        self.session_durations = LatencyHistogram()
+        self.open_sessions = {}  # user -> session
+        self.recent_sessions = deque(maxlen=MAX_TIMELINES)
+        self.pending_visits = {}  # user -> (page, time of the Visiting line)
+        self.pages = {}  # page -> {'visits', 'successes', 'failures', 'latency': LatencyHistogram}
+        self.errors = {}  # signature -> [count, first time, last time, example]
+
+    def _page(self, name):
+        if name not in self.pages:
+            self.pages[name] = {'visits': 0, 'successes': 0, 'failures': 0, 'latency': LatencyHistogram()}
+        return self.pages[name]
+
+    def _session(self, user, t):
+        session = self.open_sessions.get(user)
+        if session is None:
+            # Events before any start marker (log began mid-session, or a script without markers)
+            session = self.open_sessions[user] = {'user': user, 'start': t, 'end': None, 'visits': 0, 'errors': 0,
+                                                  'events': []}
+        return session
+
+    def _event(self, session, t, kind, detail):
+        if len(session['events']) < MAX_SESSION_EVENTS:
+            session['events'].append([round(t - session['start'], 3), kind, detail])
+
+    def _error(self, t, signature, example):
+        group = self.errors.get(signature)
+        if group is None:
+            if len(self.errors) >= MAX_ERROR_GROUPS:
+                signature = 'other'
+                group = self.errors.get(signature)
+            if group is None:
+                group = self.errors[signature] = [0, t, t, example[:200]]
+        group[0] += 1
+        group[2] = t
+
+    def add(self, t, level, message, continuation):
+        self.records += 1
+        self.levels[level] = self.levels.get(level, 0) + 1
+        if self.first_time is None:
+            self.first_time = t
+        self.last_time = t
+
+        match = SESSION.match(message)
+        if match:
+            user = int(match.group(1) or match.group(3))
+            if (match.group(2) or match.group(4)) == 'Started':
+                if user in self.open_sessions:
+                    self.sessions_abandoned += 1
+                    self.recent_sessions.append(self.open_sessions.pop(user))
+                self.sessions_started += 1
+                self.open_sessions[user] = {'user': user, 'start': t, 'end': None, 'visits': 0, 'errors': 0,
+                                            'events': []}
+            else:
+                session = self._session(user, t)
+                session['end'] = t
+                self.sessions_finished += 1
+                self.session_durations.record(t - session['start'])
+                self.recent_sessions.append(self.open_sessions.pop(user))
+                self.pending_visits.pop(user, None)
+            return
+
+        match = VISIT.search(message)
+        if match:
+            user, page = int(match.group(1)), page_key(match.group(2), match.group(3))
+            self.pending_visits[user] = (page, t)
+            self._page(page)['visits'] += 1
+            session = self._session(user, t)
+            session['visits'] += 1
+            self._event(session, t, 'visit', match.group(3))
+            return
+
+        match = SUCCESS.search(message)
+        if match:
+            user = int(match.group(1))
+            pending = self.pending_visits.pop(user, None)
+            if pending:
+                page = self._page(pending[0])
+                page['successes'] += 1
+                page['latency'].record(t - pending[1])
+            self._event(self._session(user, t), t, 'loaded', match.group(2))
+            return
+
+        match = FAILURE.search(message)
+        if match:
+            user = int(match.group(1))
+            pending = self.pending_visits.pop(user, None)
+            if pending:
+                self._page(pending[0])['failures'] += 1
+            session = self._session(user, t)
+            session['errors'] += 1
+            self._event(session, t, 'error', match.group(2)[:120])
+
+        if match or level in ('WARNING', 'ERROR', 'CRITICAL') or 'Traceback' in continuation \
+                or ERROR_WORDS.search(message):
+            exceptions = EXCEPTION_LINE.findall(continuation) if 'Traceback' in continuation else None
+            # Tracebacks group by the exception that ended them, other errors by their normalized text
+            self._error(t, exceptions[-1] if exceptions else normalize_error(message), message)
+
+    def to_dict(self):
+        return {
+            'records': self.records, 'levels': self.levels, 'first_time': self.first_time, 'last_time': self.last_time,
+            'sessions_started': self.sessions_started, 'sessions_finished': self.sessions_finished,
+            'sessions_abandoned': self.sessions_abandoned, 'session_durations': self.session_durations.to_dict(),
+            'open_sessions': list(self.open_sessions.values()), 'recent_sessions': list(self.recent_sessions),
+            'pending_visits': [[user, page, t] for user, (page, t) in self.pending_visits.items()],
+            'pages': {name: {**page, 'latency': page['latency'].to_dict()} for name, page in self.pages.items()},
+            'errors': self.errors,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        analysis = cls()
+        for name in ('records', 'levels', 'first_time', 'last_time', 'sessions_started', 'sessions_finished',
+                     'sessions_abandoned', 'errors'):
+            setattr(analysis, name, data[name])
+        analysis.session_durations = LatencyHistogram.from_dict(data['session_durations'])
+        analysis.open_sessions = {session['user']: session for session in data['open_sessions']}
+        analysis.recent_sessions.extend(data['recent_sessions'])
+        analysis.pending_visits = {user: (page, t) for user, page, t in data['pending_visits']}
+        analysis.pages = {name: {**page, 'latency': LatencyHistogram.from_dict(page['latency'])}
+                          for name, page in data['pages'].items()}
+        return analysis
+
+    def report(self, top=15):
+        def when(t):
+            return datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S') if t is not None else 'n/a'
+
+        durations = self.session_durations
+        levels = ', '.join(f"{count} {level}" for level, count in sorted(self.levels.items()))
+        lines = [f"Log: {self.records} records ({levels}) from {when(self.first_time)} to {when(self.last_time)}",
+                 f"Sessions: {self.sessions_started} started, {self.sessions_finished} finished, "
+                 f"{self.sessions_abandoned} abandoned, {len(self.open_sessions)} still open; duration "
+                 f"p50 {durations.percentile(50):.1f}s p90 {durations.percentile(90):.1f}s max {durations.max:.1f}s",
+                 "Page latency (Visiting -> Successfully loaded/visited, seconds)",
+                 f"{'page':<40}{'visits':>8}{'ok':>8}{'failed':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+        for name, page in sorted(self.pages.items(), key=lambda item: -item[1]['visits'])[:top]:
+            latency = page['latency']
+            lines.append(f"{name[:39]:<40}{page['visits']:>8}{page['successes']:>8}{page['failures']:>8}"
+                         f"{latency.percentile(50):>9.2f}{latency.percentile(90):>9.2f}"
+                         f"{latency.percentile(99):>9.2f}{latency.max:>9.2f}")
+        if len(self.pages) > top:
+            lines.append(f"... {len(self.pages) - top} more pages")
+        lines.append("Errors by type")
+        lines.append(f"{'count':>7}  {'first seen':<19}  {'last seen':<19}  type / message")
+        for signature, (count, first, last, example) in sorted(self.errors.items(), key=lambda item: -item[1][0])[:top]:
+            lines.append(f"{count:>7}  {when(first):<19}  {when(last):<19}  {signature}")
+        if len(self.errors) > top:
+            lines.append(f"... {len(self.errors) - top} more error types")
+        return '\n'.join(lines)
+
+    def timelines(self, user):
+        sessions = [session for session in list(self.recent_sessions) + list(self.open_sessions.values())
+                    if session['user'] == user]
+        lines = []
+        for session in sessions:
+            start = datetime.fromtimestamp(session['start']).strftime('%Y-%m-%d %H:%M:%S')
+            end = f"{session['end'] - session['start']:.1f}s" if session['end'] is not None else 'unfinished'
+            lines.append(f"User {user} session at {start} ({end}, {session['visits']} visits, {session['errors']} errors)")
+            for offset, kind, detail in session['events']:
+                lines.append(f"  +{offset:>9.3f}s  {kind:<7} {detail}")
+        return '\n'.join(lines) or f"No session of user {user} among the last {MAX_TIMELINES} sessions"
+
+
+# Streaming parser over a memory-mapped log. Minute prefixes are converted to epoch once and cached.
+class LogParser:
+    def __init__(self, analysis, since=None):
+        self.analysis = analysis
+        self.since = since
+        self.minutes = {}
+        self.index = []  # [offset, time] every INDEX_EVERY bytes
+
+    def _time(self, match):
+        minute = match.group(1)
+        base = self.minutes.get(minute)
+        if base is None:
+            base = self.minutes[minute] = datetime.strptime(minute.decode(), '%Y-%m-%d %H:%M').timestamp()
+        return base + int(match.group(2)) + int(match.group(3)) / 1000
+
+    def _add(self, data, match, end):
+        t = self._time(match)
+        if self.since is not None and t < self.since:
+            return
+        body = data[match.end():end].decode('utf-8', 'replace')
+        message, _, continuation = body.lstrip('\n').partition('\n')
+        self.analysis.add(t, match.group(4).decode(), message.strip(), continuation)
+
+    def parse(self, data, offset, checkpoint=None):
+        """Parse records from offset. The last record may still be growing (a traceback being written), so
+        checkpoint(offset) is called before it is parsed; the returned offset is where the next run resumes."""
+        previous = None
+        next_index = (offset // INDEX_EVERY + 1) * INDEX_EVERY if offset else 0
+        for match in HEADER.finditer(data, offset):
+            if previous is not None:
+                self._add(data, previous, match.start())
+            if match.start() >= next_index:
+                self.index.append([match.start(), self._time(match)])
+                next_index = (match.start() // INDEX_EVERY + 1) * INDEX_EVERY
+            previous = match
+        if previous is None:
+            return offset
+        if checkpoint:
+            checkpoint(previous.start())
+        self._add(data, previous, len(data))
+        return previous.start()
+
+
+def head_digest(path, size):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read(min(size, HEAD_BYTES))).hexdigest()
+
+
+def load_index(path, size):
+    """Saved state for path, or None when there is none or the log was rotated / truncated since."""
+    try:
+        with open(path + INDEX_SUFFIX) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get('version') != INDEX_VERSION or size < saved['offset'] or size < saved['head_bytes'] \
+            or head_digest(path, saved['head_bytes']) != saved['head']:
+        return None
+    return saved
+
+
+def save_index(path, offset, analysis, index, size):
+    head_bytes = min(size, HEAD_BYTES)
+    saved = {'version': INDEX_VERSION, 'offset': offset, 'head_bytes': head_bytes,
+             'head': head_digest(path, head_bytes), 'index': index, 'analysis': analysis.to_dict()}
+    temporary = path + INDEX_SUFFIX + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(saved, f, separators=(',', ':'))
+    os.replace(temporary, path + INDEX_SUFFIX)
+
+
+def analyze(path, rebuild=False, since=None):
+    """Returns (analysis, bytes parsed). Resumes from the sidecar index unless rebuild or since is given;
+    with since, parsing starts at the last index entry before that time and the sidecar is left alone."""
+    size = os.path.getsize(path)
+    saved = None if rebuild else load_index(path, size)
+    offset = 0
+    index = []
+    if saved:
+        index = saved['index']
+        if since is None:
+            offset = saved['offset']
+        else:
+            position = bisect.bisect_right([entry[1] for entry in index], since) - 1
+            offset = index[position][0] if position >= 0 else 0
+    analysis = LogAnalysis.from_dict(saved['analysis']) if saved and since is None else LogAnalysis()
+    if size == 0 or offset >= size:
+        return analysis, 0
+
+    parser = LogParser(analysis, since)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if since is None:
+            def checkpoint(resume_offset):
+                known = [entry for entry in index if entry[0] < offset]
+                save_index(path, resume_offset, analysis, known + parser.index, size)
+        else:
+            checkpoint = None
+        parser.parse(data, offset, checkpoint)
+    return analysis, size - offset
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sessions, page latency and errors from a simulation log")
+    parser.add_argument('log', nargs='?', default='simulation.log')
+    parser.add_argument('--rebuild', action='store_true', help=f"ignore the {INDEX_SUFFIX} sidecar and parse everything")
+    parser.add_argument('--since', help="only records from this time on, e.g. '2024-09-16 17:00'")
+    parser.add_argument('--user', type=int, help="print the session timelines of this user")
+    parser.add_argument('--top', type=int, default=15, help="rows per table")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    started = time.perf_counter()
+    analysis, parsed = analyze(args.log, args.rebuild, since)
+    elapsed = time.perf_counter() - started
+    print(f"Parsed {parsed / 1024:.1f} KB of {args.log} in {elapsed:.3f}s")
+    print(analysis.report(args.top))
+    if args.user is not None:
+        print(analysis.timelines(args.user))
+
+
+if __name__ == "__main__":
+    main()
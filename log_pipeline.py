@@ -0,0 +1,120 @@
+import logging
+import queue
+import threading
+
+
+# Logging handler that only enqueues records; a background thread formats and writes them
+# in batches, so file and console I/O never run on the event-loop thread.
+class BackgroundLogHandler(logging.Handler):
+    def __init__(self, handlers, max_queue=10000, batch_size=200, flush_interval=0.5, policy='drop_newest'):
+        super().__init__()
+        if policy not in ('drop_newest', 'drop_oldest', 'block'):
+            raise ValueError(f"Unknown log queue policy: {policy}")
+        self.handlers = handlers
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy  # What to do when the queue is full
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._drain, name='log-writer', daemon=True)
+        self._writer.start()
+
+    def emit(self, record):
+        try:
+            self._prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        try:
+            if self.policy == 'block':
+                self.queue.put(record)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.policy == 'drop_newest':
+                return
+            # drop_oldest: make room for the new record
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                return
+        self.enqueued += 1
+
+    # Render the message now so its arguments can't change before the writer thread formats it
+    def _prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+    def _drain(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        for handler in self.handlers:
+            for record in batch:
+                if record.levelno >= handler.level:
+                    try:
+                        # Write through the handler's stream without taking a flush per record
+                        handler.stream.write(handler.format(record) + handler.terminator)
+                    except Exception:
+                        handler.handleError(record)
+            try:
+                handler.flush()
+            except Exception:
+                pass
+        self.written += len(batch)
+
+    def stats(self):
+        return {'enqueued': self.enqueued, 'written': self.written,
+                'dropped': self.dropped, 'queued': self.queue.qsize()}
+
+    def close(self):
+        self._stop.set()
+        self._writer.join(timeout=10)
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+
+# Replacement for logging.basicConfig(...) used by the generator scripts
+def configure_logging(log_file_path, level=logging.INFO, max_queue=10000, policy='drop_newest', console_stream=None):
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, BackgroundLogHandler):
+            return handler  # Already configured (e.g. Streamlit re-running the script)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler(console_stream), logging.FileHandler(log_file_path)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    background = BackgroundLogHandler(handlers, max_queue=max_queue, policy=policy)
+    root.setLevel(level)
+    root.addHandler(background)
+    return background
+
+
+def log_pipeline_report(handler):
+    stats = handler.stats()
+    return (f"Log pipeline: {stats['enqueued']} enqueued, {stats['written']} written, "
+            f"{stats['dropped']} dropped, {stats['queued']} still queued")
@@ -0,0 +1,55 @@
+import os
+from collections import deque
+
+
+# Incremental `tail -F`: remembers its byte offset and only reads what was appended since the
+# last poll, keeping the last max_lines lines in a ring buffer. Handles rotation (new inode)
+# and truncation (file shorter than our offset). Each poll reads at most max_read bytes, so
+# refresh cost stays constant however large the log grows.
+class LogTailer:
+    def __init__(self, path, max_lines=100, max_read=256 * 1024):
+        self.path = path
+        self.lines = deque(maxlen=max_lines)
+        self.max_read = max_read
+        self.offset = 0
+        self.inode = None
+        self._partial = b''
+
+    def poll(self):
+        """Read newly appended data; returns the number of new complete lines."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+
+        if self.inode != stat.st_ino or stat.st_size < self.offset:
+            # First poll, rotated or truncated file: start again from the beginning
+            self.inode = stat.st_ino
+            self.offset = 0
+            self._partial = b''
+
+        if stat.st_size == self.offset:
+            return 0
+
+        skip_to_line_start = False
+        if stat.st_size - self.offset > self.max_read:
+            # Too far behind to matter for the last max_lines: jump close to the end
+            self.offset = stat.st_size - self.max_read
+            self._partial = b''
+            skip_to_line_start = True
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        self.offset += len(data)
+
+        chunks = (self._partial + data).split(b'\n')
+        self._partial = chunks.pop()
+        if skip_to_line_start and chunks:
+            chunks.pop(0)  # Drop the line we jumped into the middle of
+        for chunk in chunks:
+            self.lines.append(chunk.decode('utf-8', errors='replace'))
+        return len(chunks)
+
+    def text(self):
+        return '\n'.join(self.lines)
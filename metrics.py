@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+
+# Resident memory of this process and all of its descendants (browsers, drivers), in MB.
+# Uses `ps` so it works the same on Linux and macOS without extra dependencies.
+def process_tree_rss_mb(root_pid=None):
+    root_pid = root_pid or os.getpid()
+    try:
+        output = subprocess.run(['ps', '-A', '-o', 'pid=,ppid=,rss='],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 0.0
+
+    children = {}
+    rss = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) != 3:
+            continue
+        pid, ppid, kb = (int(value) for value in parts)
+        children.setdefault(ppid, []).append(pid)
+        rss[pid] = kb
+
+    total_kb = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total_kb += rss.get(pid, 0)
+        stack.extend(children.get(pid, ()))
+    return total_kb / 1024
+
+
+# Session throughput and peak memory for one run
+class SessionStats:
+    def __init__(self, mode):
+        self.mode = mode
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.peak_rss_mb = 0.0
+        self.start_time = time.monotonic()
+        self.end_time = None
+
+    def session_started(self):
+        self.started += 1
+
+    def session_finished(self, ok=True):
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    def elapsed(self):
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    def sessions_per_minute(self):
+        elapsed = self.elapsed()
+        if elapsed <= 0:
+            return 0.0
+        return (self.completed + self.failed) * 60 / elapsed
+
+    def sample_memory(self):
+        self.peak_rss_mb = max(self.peak_rss_mb, process_tree_rss_mb())
+        return self.peak_rss_mb
+
+    # Background task: sample process-tree memory until cancelled
+    async def track_memory(self, interval=5.0):
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.sample_memory)
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        self.sample_memory()
+        self.end_time = time.monotonic()
+
+    def report(self):
+        return (f"Run stats [{self.mode}]: {self.started} sessions started, "
+                f"{self.completed} completed, {self.failed} failed in {self.elapsed():.1f}s "
+                f"- {self.sessions_per_minute():.2f} sessions/min, peak memory {self.peak_rss_mb:.1f} MB")
+
+
+# Fixed-memory latency histogram with logarithmic buckets (~2.5% relative error).
+# Histograms with the same layout merge by adding bucket counts.
+class LatencyHistogram:
+    MIN_VALUE = 1e-4   # 0.1 ms
+    MAX_VALUE = 3600.0  # 1 hour; larger values land in the last bucket
+    GROWTH = 1.05
+    BUCKETS = int(math.log(MAX_VALUE / MIN_VALUE) / math.log(GROWTH)) + 2
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def _bucket(self, value):
+        if value <= self.MIN_VALUE:
+            return 0
+        return min(self.BUCKETS - 1, int(math.log(value / self.MIN_VALUE) / math.log(self.GROWTH)) + 1)
+
+    def _bucket_value(self, index):
+        # Geometric middle of the bucket's range
+        if index == 0:
+            return self.MIN_VALUE
+        return self.MIN_VALUE * self.GROWTH ** (index - 0.5)
+
+    def record(self, value):
+        self.counts[self._bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        # Sparse form for shipping between processes
+        return {'counts': {i: c for i, c in enumerate(self.counts) if c},
+                'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for index, count in data['counts'].items():
+            histogram.counts[int(index)] = count
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+
+# Per-category request counters and latency histograms (TTFB and total time)
+class CategoryMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.statuses = {}
+        self.ttfb = LatencyHistogram()
+        self.total_time = LatencyHistogram()
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.bytes += other.bytes
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.ttfb.merge(other.ttfb)
+        self.total_time.merge(other.total_time)
+        return self
+
+    def to_dict(self):
+        return {'requests': self.requests, 'errors': self.errors, 'bytes': self.bytes,
+                'statuses': dict(self.statuses), 'ttfb': self.ttfb.to_dict(),
+                'total_time': self.total_time.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        metrics = cls()
+        metrics.requests = data['requests']
+        metrics.errors = data['errors']
+        metrics.bytes = data['bytes']
+        metrics.statuses = {int(status): count for status, count in data['statuses'].items()}
+        metrics.ttfb = LatencyHistogram.from_dict(data['ttfb'])
+        metrics.total_time = LatencyHistogram.from_dict(data['total_time'])
+        return metrics
+
+
+# Timings for every request / navigation of a run, keyed by page category
+# (insight, service, contact, referrer, ...). Memory is constant in the number of requests.
+class PageMetrics:
+    def __init__(self):
+        self.categories = {}
+        self.start_time = time.monotonic()
+
+    def category(self, name):
+        if name not in self.categories:
+            self.categories[name] = CategoryMetrics()
+        return self.categories[name]
+
+    def record(self, category, ttfb, total_time, nbytes, status):
+        metrics = self.category(category)
+        metrics.requests += 1
+        metrics.bytes += nbytes
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        if status >= 400:
+            metrics.errors += 1
+        metrics.ttfb.record(ttfb)
+        metrics.total_time.record(total_time)
+
+    def record_error(self, category):
+        metrics = self.category(category)
+        metrics.requests += 1
+        metrics.errors += 1
+
+    def totals(self):
+        categories = self.categories.values()
+        return {'requests': sum(metrics.requests for metrics in categories),
+                'errors': sum(metrics.errors for metrics in categories),
+                'bytes': sum(metrics.bytes for metrics in categories)}
+
+    def merge(self, other):
+        for name, metrics in other.categories.items():
+            self.category(name).merge(metrics)
+        self.start_time = min(self.start_time, other.start_time)
+        return self
+
+    def to_dict(self):
+        return {name: metrics.to_dict() for name, metrics in self.categories.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        page_metrics = cls()
+        for name, metrics in data.items():
+            page_metrics.categories[name] = CategoryMetrics.from_dict(metrics)
+        return page_metrics
+
+    def report(self, elapsed=None):
+        """End-of-run latency and throughput tables, one row per page category."""
+        elapsed = elapsed or (time.monotonic() - self.start_time)
+        names = sorted(self.categories)
+        rows = [self.categories[name] for name in names]
+        total = CategoryMetrics()
+        for metrics in rows:
+            total.merge(metrics)
+        names.append('all')
+        rows.append(total)
+
+        lines = [f"Latency (ms) over {elapsed:.1f}s",
+                 f"{'category':<20}{'metric':<8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"]
+        for name, metrics in zip(names, rows):
+            for label, histogram in (('ttfb', metrics.ttfb), ('total', metrics.total_time)):
+                values = [histogram.percentile(p) * 1000 for p in (50, 90, 99)] + [histogram.max * 1000]
+                lines.append(f"{name:<20}{label:<8}" + ''.join(f"{value:>10.1f}" for value in values))
+
+        lines.append("Throughput")
+        lines.append(f"{'category':<20}{'requests':>10}{'errors':>8}{'req/s':>10}{'KB':>12}{'KB/s':>10}")
+        for name, metrics in zip(names, rows):
+            rate = metrics.requests / elapsed if elapsed > 0 else 0.0
+            kilobytes = metrics.bytes / 1024
+            lines.append(f"{name:<20}{metrics.requests:>10}{metrics.errors:>8}{rate:>10.2f}"
+                         f"{kilobytes:>12.1f}{kilobytes / elapsed if elapsed > 0 else 0.0:>10.1f}")
+        return '\n'.join(lines)
+
+
+# Navigation Timing entry of the page's current document (times in ms, relative to navigation start)
+NAVIGATION_TIMING_JS = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (!nav) return null;
+    return {ttfb: nav.responseStart - nav.startTime,
+            total: (nav.loadEventEnd || nav.responseEnd) - nav.startTime,
+            bytes: nav.transferSize || nav.encodedBodySize || 0};
+}"""
+
+
+# Record a browser navigation, preferring the browser's own timings over wall-clock time
+async def record_navigation(metrics, page, category, response, elapsed):
+    status = response.status if response else 0
+    try:
+        timing = await page.evaluate(NAVIGATION_TIMING_JS)
+    except Exception:
+        timing = None
+    if timing:
+        metrics.record(category, timing['ttfb'] / 1000, timing['total'] / 1000, int(timing['bytes']), status)
+    else:
+        metrics.record(category, elapsed, elapsed, 0, status)
+
+
+# Event-loop lag: how late a periodic timer wakes up. Sustained lag means the loop (and so
+# every session on it) is saturated and more concurrency in this process won't help.
+# A watchdog thread also catches single callbacks that block the loop for longer than
+# block_threshold and records where the loop thread was stuck, grouped by stack.
+class LoopLagMonitor:
+    STACK_DEPTH = 8     # Innermost frames kept per blocking stack
+    MAX_STACKS = 50     # Distinct stacks kept; later ones are only counted
+
+    def __init__(self, interval=0.1, block_threshold=0.25):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.lag = LatencyHistogram()
+        self.blocks = {}  # stack text -> {'count', 'total', 'max'}
+        self.blocks_dropped = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lag.record(max(0.0, loop.time() - start - self.interval))
+
+    def _watch(self):
+        pending = None  # (heartbeat, stack) of the stall being watched
+        while not self._stopped.wait(min(self.interval, self.block_threshold / 2)):
+            beat = self._heartbeat
+            if pending and beat != pending[0]:
+                # The loop is running again: the stall lasted from its last heartbeat to this one
+                self._record_block(pending[1], beat - pending[0] - self.interval)
+                pending = None
+            if pending is None and time.monotonic() - beat - self.interval > self.block_threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    pending = (beat, self._format_stack(frame))
+
+    def _format_stack(self, frame):
+        # Innermost frames without the event loop's own machinery (unless that is all there is)
+        frames = traceback.extract_stack(frame)
+        own = [entry for entry in frames if os.sep + 'asyncio' + os.sep not in entry.filename]
+        return ''.join(traceback.format_list((own or frames)[-self.STACK_DEPTH:]))
+
+    def _record_block(self, stack, duration):
+        block = self.blocks.get(stack)
+        if block is None:
+            if len(self.blocks) >= self.MAX_STACKS:
+                self.blocks_dropped += 1
+                return
+            block = self.blocks[stack] = {'count': 0, 'total': 0.0, 'max': 0.0}
+            logging.warning(f"Event loop blocked for {duration * 1000:.0f} ms in:\n{stack.rstrip()}")
+        block['count'] += 1
+        block['total'] += duration
+        block['max'] = max(block['max'], duration)
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._task = asyncio.create_task(self._sample())
+        if self.block_threshold:
+            self._stopped.clear()
+            self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._watchdog.start()
+        return self
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog:
+            self._stopped.set()
+            self._watchdog.join()
+            self._watchdog = None
+
+    def stats(self):
+        return {'samples': self.lag.count, 'p50': self.lag.percentile(50),
+                'p90': self.lag.percentile(90), 'p99': self.lag.percentile(99), 'max': self.lag.max,
+                'blocked_calls': sum(block['count'] for block in self.blocks.values()) + self.blocks_dropped}
+
+    def report(self, top=3):
+        stats = self.stats()
+        lines = [f"Loop lag: p50 {stats['p50'] * 1000:.1f} ms, p90 {stats['p90'] * 1000:.1f} ms, "
+                 f"p99 {stats['p99'] * 1000:.1f} ms, max {stats['max'] * 1000:.1f} ms over {stats['samples']} samples, "
+                 f"{stats['blocked_calls']} calls blocked the loop for more than {self.block_threshold * 1000:.0f} ms"]
+        worst = sorted(self.blocks.items(), key=lambda item: item[1]['total'], reverse=True)[:top]
+        for stack, block in worst:
+            lines.append(f"  {block['count']} blocks, {block['total'] * 1000:.0f} ms total, "
+                         f"max {block['max'] * 1000:.0f} ms in:\n{stack.rstrip()}")
+        return '\n'.join(lines)
@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime
+from http_engine import HttpEngine
+from log_pipeline import configure_logging, log_pipeline_report
+from metrics import PageMetrics, LoopLagMonitor
+from retry import RetryPolicy, CircuitOpenError
+from scheduler import ArrivalScheduler, make_rate_profile
+from virtual_clock import VirtualClock
+from scenario import Scenario
+
+# Headers the HTTP engine manages itself (connection, cookies per user jar, framing) and never replays
+SKIPPED_HEADERS = {'host', 'connection', 'content-length', 'cookie', 'keep-alive', 'transfer-encoding',
+                   'upgrade', 'te', 'proxy-connection'}
+
+# Recorded values rewritten into per-user placeholders before replay: (pattern, replacement)
+SUBSTITUTIONS = [
+    (re.compile(r'([?&]_=)\d{10,13}'), r'\1{{timestamp_ms}}'),          # jQuery-style cache busters
+    (re.compile(r'([?&](?:sid|session_id|sessionid)=)[\w-]+'), r'\1{{session_id}}'),
+]
+
+# Content types -> category used for replayed requests when the HAR has no _resourceType
+MIME_CATEGORIES = [('html', 'document'), ('css', 'stylesheet'), ('javascript', 'script'), ('image', 'image'),
+                   ('font', 'font'), ('json', 'xhr'), ('video', 'media'), ('audio', 'media')]
+
+# Concurrent sub-resource requests per page load, like a browser's per-host connection limit
+SUBRESOURCE_CONCURRENCY = 6
+
+
+def entry_category(entry):
+    resource_type = entry.get('_resourceType')
+    if resource_type:
+        return resource_type
+    mime = entry.get('response', {}).get('content', {}).get('mimeType', '')
+    for marker, category in MIME_CATEGORIES:
+        if marker in mime:
+            return category
+    return 'other'
+
+
+def parse_started(entry):
+    return datetime.fromisoformat(entry['startedDateTime'].replace('Z', '+00:00')).timestamp()
+
+
+# One page load of a recording: its document requests (redirect hops included) are replayed in
+# order, the sub-resources they triggered concurrently, then the user thinks for `think` seconds.
+class PageLoad:
+    def __init__(self, think=0.0):
+        self.documents = []
+        self.subresources = []
+        self.think = think
+
+
+# A recorded session compiled for replay. HAR files written by `record` carry the journey steps
+# (start time and dwell of each page); for other HAR files each document starts a page load and
+# the think time is the gap between page load starts.
+class Recording:
+    def __init__(self, name, page_loads):
+        self.name = name
+        self.page_loads = page_loads
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            log = json.load(f)['log']
+        entries = sorted(log['entries'], key=parse_started)
+        steps = log.get('_steps')
+
+        page_loads = []
+        starts = []
+        for entry in entries:
+            request = compile_request(entry)
+            if request is None:
+                continue
+            started = parse_started(entry)
+            if steps:
+                # Page load of the last step started at or before this request
+                step = sum(1 for marker in steps if marker['started'] <= started) - 1
+                while len(page_loads) <= max(step, 0):
+                    page_loads.append(PageLoad(steps[len(page_loads)]['dwell']))
+                page_load = page_loads[max(step, 0)]
+            elif request['category'] == 'document' or not page_loads:
+                page_loads.append(PageLoad())
+                starts.append(started)
+                page_load = page_loads[-1]
+            else:
+                page_load = page_loads[-1]
+
+            if request['category'] == 'document':
+                page_load.documents.append(request)
+            else:
+                page_load.subresources.append(request)
+
+        for page_load, start, next_start in zip(page_loads, starts, starts[1:]):
+            page_load.think = next_start - start
+        page_loads = [page_load for page_load in page_loads if page_load.documents or page_load.subresources]
+        if not page_loads:
+            raise ValueError(f"{path} has no replayable requests")
+        return cls(os.path.basename(path), page_loads)
+
+    def requests(self):
+        return sum(len(page_load.documents) + len(page_load.subresources) for page_load in self.page_loads)
+
+
+def substitute_recorded(text):
+    for pattern, replacement in SUBSTITUTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def compile_request(entry):
+    request = entry['request']
+    if not request['url'].startswith(('http://', 'https://')):
+        return None  # data:, blob:, about: ...
+    headers = {header['name']: substitute_recorded(header['value']) for header in request.get('headers', [])
+               if not header['name'].startswith(':') and header['name'].lower() not in SKIPPED_HEADERS}
+    post_data = request.get('postData', {}).get('text')
+    return {
+        'method': request['method'],
+        'url': substitute_recorded(request['url']),
+        'headers': headers,
+        'data': substitute_recorded(post_data) if post_data else None,
+        'category': entry_category(entry),
+    }
+
+
+def user_variables(user_number):
+    return {'user_number': str(user_number), 'session_id': uuid.uuid4().hex,
+            'timestamp_ms': str(int(time.time() * 1000)), 'random': str(random.randint(0, 2 ** 31))}
+
+
+def render(text, variables):
+    # {{name}} placeholders; unknown names are left untouched
+    if text is None or '{{' not in text:
+        return text
+    return re.sub(r'\{\{(\w+)\}\}', lambda match: variables.get(match.group(1), match.group(0)), text)
+
+
+# Record Playwright sessions following scenario journeys, one HAR file per session
+async def record(scenario, sessions, output_dir, time_scale=0.1, proxy=None, browser_type='firefox'):
+    from browser_pool import BrowserPool
+    from playwright.async_api import Error as PlaywrightError
+
+    os.makedirs(output_dir, exist_ok=True)
+    clock = VirtualClock(time_scale)
+    journeys = scenario.journeys()
+    launch_options = {'proxy': {'server': proxy}} if proxy else {}
+    pool = await BrowserPool(1, browser_type, **launch_options).start()
+    paths = []
+    try:
+        for session in range(1, sessions + 1):
+            path = os.path.join(output_dir, f"session-{session:03d}.har")
+            steps = []
+            async with pool.context(record_har_path=path, record_har_content='omit') as context:
+                page = await context.new_page()
+                for step in next(journeys):
+                    logging.info(f"Recording session {session} - {step.state} page: {step.url}")
+                    steps.append({'started': time.time(), 'dwell': step.dwell, 'url': step.url})
+                    try:
+                        await page.goto(step.url, wait_until='networkidle', timeout=120000)
+                    except PlaywrightError as e:
+                        logging.warning(f"Recording session {session} - Error loading {step.url}: {e}")
+                    await clock.sleep(step.dwell)
+            add_steps(path, steps)  # The HAR is written when the context closes
+            paths.append(path)
+    finally:
+        await pool.close()
+    return paths
+
+
+# Journey steps in the HAR, so replay gets the real dwell however compressed the recording was
+def add_steps(path, steps):
+    with open(path) as f:
+        har = json.load(f)
+    har['log']['_steps'] = steps
+    with open(path, 'w') as f:
+        json.dump(har, f)
+
+
+async def replay_session(user_number, engine, recording, clock, retry_policy):
+    variables = user_variables(user_number)
+    limit = asyncio.Semaphore(SUBRESOURCE_CONCURRENCY)
+    label = f"User {user_number}"
+
+    async def send(request):
+        url = render(request['url'], variables)
+        headers = {name: render(value, variables) for name, value in request['headers'].items()}
+        try:
+            await retry_policy.call(url, lambda: engine.fetch(
+                session, url, request['category'], method=request['method'], headers=headers,
+                data=render(request['data'], variables), allow_redirects=False), label=label)
+        except CircuitOpenError as e:
+            logging.info(f"{label} - Skipped {url}: {e}")
+        except Exception as e:
+            logging.info(f"{label} - Failed {request['method']} {url}: {e}")
+
+    async def send_limited(request):
+        async with limit:
+            await send(request)
+
+    logging.info(f"{label} - Replaying {recording.name} ({recording.requests()} requests)")
+    async with engine.user_session() as session:
+        for page_load in recording.page_loads:
+            for request in page_load.documents:
+                await send(request)
+            await asyncio.gather(*(send_limited(request) for request in page_load.subresources))
+            await clock.sleep(page_load.think)
+    logging.info(f"{label} - Replay finished")
+
+
+async def replay(recordings, total_users, concurrent_users, arrival_rate, time_scale=1.0, proxy=None):
+    clock = VirtualClock(time_scale)
+    retry_policy = RetryPolicy()
+    scheduler = ArrivalScheduler(make_rate_profile('poisson', arrival_rate, None), total_users=total_users,
+                                 max_concurrency=concurrent_users, clock=clock)
+    # Started inside the try below, so the finally block stops whatever did start if a later step fails
+    lag_monitor = None
+    started = False
+    engine = HttpEngine(proxy=proxy, metrics=PageMetrics())
+    try:
+        lag_monitor = LoopLagMonitor().start()
+        await engine.start({request['url'] for recording in recordings for page_load in recording.page_loads
+                            for request in page_load.documents if '{{' not in request['url']})
+        started = True
+        await scheduler.run(lambda user_number: replay_session(
+            user_number, engine, recordings[(user_number - 1) % len(recordings)], clock, retry_policy))
+    finally:
+        if lag_monitor is not None:
+            lag_monitor.stop()
+        if started:
+            logging.info(scheduler.report())
+            logging.info(engine.report())
+            logging.info(retry_policy.report())
+            logging.info(engine.metrics.report())
+            logging.info(clock.report())
+            logging.info(lag_monitor.report())
+        await engine.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Record browser sessions as HAR files and replay them over HTTP")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help="record Playwright sessions following the scenario")
+    record_parser.add_argument('--scenario', default='scenarios/exponentiel.toml')
+    record_parser.add_argument('--standin', metavar='BASE_URL', help="record against a stand-in server")
+    record_parser.add_argument('--sessions', type=int, default=3)
+    record_parser.add_argument('--output-dir', default='recordings')
+    record_parser.add_argument('--time-scale', type=float, default=0.1,
+                               help="dwell multiplier while recording (the real dwell is kept for replay)")
+    record_parser.add_argument('--proxy', help="e.g. socks5://localhost:9050")
+
+    replay_parser = commands.add_parser('replay', help="replay recorded sessions with the HTTP engine")
+    replay_parser.add_argument('--recordings', default='recordings', help="directory of .har files, or one file")
+    replay_parser.add_argument('--users', type=int, default=100)
+    replay_parser.add_argument('--concurrency', type=int, default=20)
+    replay_parser.add_argument('--rate', type=float, default=0.5, help="user arrivals per second")
+    replay_parser.add_argument('--time-scale', type=float, default=1.0, help="think time multiplier (0 = none)")
+    replay_parser.add_argument('--proxy', help="e.g. socks5://localhost:9050")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    log_handler = configure_logging('simulation.log', console_stream=sys.stdout)
+    if args.command == 'record':
+        scenario = Scenario.load(args.scenario)
+        if args.standin:
+            from standin_server import localize_scenario
+            scenario = localize_scenario(scenario, args.standin)
+        paths = asyncio.run(record(scenario, args.sessions, args.output_dir, args.time_scale, args.proxy))
+        logging.info(f"Recorded {len(paths)} sessions into {args.output_dir}")
+    else:
+        paths = (sorted(glob.glob(os.path.join(args.recordings, '*.har')))
+                 if os.path.isdir(args.recordings) else [args.recordings])
+        recordings = [Recording.load(path) for path in paths]
+        if not recordings:
+            raise SystemExit(f"No recordings found in {args.recordings}")
+        logging.info(f"Replaying {len(recordings)} recordings "
+                     f"({sum(recording.requests() for recording in recordings)} requests in total)")
+        asyncio.run(replay(recordings, args.users, args.concurrency, args.rate, args.time_scale, args.proxy))
+    logging.info(log_pipeline_report(log_handler))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import random
+import time
+from urllib.parse import urlsplit
+
+# Statuses treated as a failed attempt (retried, and counted against the host's breaker)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Raised instead of sending a request while the host's circuit breaker is open
+class CircuitOpenError(Exception):
+    def __init__(self, host):
+        super().__init__(f"Circuit open for {host}, request shed")
+        self.host = host
+
+
+# Per-host circuit breaker: opens after `threshold` consecutive failures, sheds requests for
+# `reset_timeout` seconds, then lets a single probe through (half-open) to decide whether to close.
+class CircuitBreaker:
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        # Restarting the timer means a lost probe (e.g. a cancelled session) only blocks one more period
+        self.opened_at = time.monotonic()
+        self.probing = True
+        return True
+
+    def succeeded(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    # Returns True when this failure trips the breaker open
+    def failed(self):
+        self.failures += 1
+        if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            self.probing = False
+            return True
+        return False
+
+
+# One retry policy for the whole run: jittered exponential backoff, a run-wide retry budget and a
+# circuit breaker per host. The budget caps retries at `budget_ratio` of all requests (plus a small
+# floor for the start of the run), so a degraded target sees at most that much extra load.
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0, budget_ratio=0.2, budget_floor=10,
+                 breaker_threshold=5, breaker_reset=30.0, retry_statuses=RETRY_STATUSES, sleep=asyncio.sleep):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_floor = budget_floor
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.retry_statuses = retry_statuses
+        self.sleep = sleep
+        self.breakers = {}
+
+        self.requests = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.breaker_trips = 0
+        self.shed = 0
+        self.failures = 0
+
+    def breaker(self, host):
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        return self.breakers[host]
+
+    def backoff(self, attempt):
+        # "Full jitter": uniform in [0, base * 2^attempt], so retrying users spread out instead of moving in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _budget_left(self):
+        return self.retries < self.budget_floor + self.budget_ratio * self.requests
+
+    async def call(self, url, operation, label=''):
+        """Run operation() (a coroutine factory) for url with retries. Returns its result; a response whose
+        .status is in retry_statuses is retried and returned as-is once attempts or budget run out."""
+        host = urlsplit(url).hostname or url
+        breaker = self.breaker(host)
+        prefix = f"{label} - " if label else ''
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.shed += 1
+                raise CircuitOpenError(host)
+            self.requests += 1
+            attempt += 1
+            try:
+                result = await operation()
+            except Exception as e:
+                error, result = e, None
+            else:
+                if getattr(result, 'status', None) not in self.retry_statuses:
+                    breaker.succeeded()
+                    return result
+                error = f"status {result.status}"
+
+            self.failures += 1
+            if breaker.failed():
+                self.breaker_trips += 1
+                logging.warning(f"Circuit breaker opened for {host} after {breaker.failures} failures")
+            if attempt >= self.max_attempts or not self._budget_left():
+                if attempt < self.max_attempts:
+                    self.budget_exhausted += 1
+                if result is not None:
+                    return result
+                raise error
+
+            delay = self.backoff(attempt - 1)
+            self.retries += 1
+            logging.info(f"{prefix}Error visiting {url}: {error} (Retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s)")
+            await self.sleep(delay)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures,
+            'budget_exhausted': self.budget_exhausted,
+            'breaker_trips': self.breaker_trips,
+            'shed': self.shed,
+            'open_breakers': sum(1 for breaker in self.breakers.values() if breaker.opened_at is not None),
+        }
+
+    def report(self):
+        stats = self.stats()
+        ratio = stats['retries'] / stats['requests'] if stats['requests'] else 0.0
+        return (f"Retries: {stats['retries']} retries for {stats['requests']} attempts ({ratio:.1%}), "
+                f"{stats['failures']} failed attempts, {stats['budget_exhausted']} retries refused by the budget, "
+                f"{stats['breaker_trips']} breaker trips, {stats['shed']} requests shed, "
+                f"{stats['open_breakers']} breakers open at the end")
@@ -0,0 +1,143 @@
+import copy
+import tomllib
+from collections import namedtuple
+import numpy as np
+
+EXIT = -1
+DWELL_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+
+# One page visit of a journey
+Step = namedtuple('Step', ['state', 'category', 'url', 'dwell'])
+
+
+# A scenario file compiled once at startup into flat arrays: states, a cumulative transition
+# table and per-state dwell parameters. Journeys for many users are then sampled in one
+# vectorised pass, so a user's next page is a table lookup instead of random.sample calls.
+class Scenario:
+    def __init__(self, name, states, categories, urls, transitions, dwell, start, max_steps):
+        self.name = name
+        self.states = states            # State names, index = state id
+        self.categories = categories    # Metrics category per state
+        self.urls = urls                # List of URLs per state
+        self.start = start
+        self.max_steps = max_steps
+
+        # cumulative[s, t]: probability of moving from s to any of targets 0..t (last column = exit)
+        self.cumulative = np.cumsum(transitions, axis=1)
+        self.cumulative[:, -1] = 1.0
+        self.url_counts = np.array([len(state_urls) for state_urls in urls])
+        self.dwell_kind = np.array([DWELL_DISTRIBUTIONS.index(kind) for kind, _, _ in dwell])
+        self.dwell_a = np.array([a for _, a, _ in dwell], dtype=float)
+        self.dwell_b = np.array([b for _, _, b in dwell], dtype=float)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.compile(tomllib.load(f))
+
+    @classmethod
+    def compile(cls, spec):
+        pages = spec['pages']
+        states = list(pages)
+        index = {name: i for i, name in enumerate(states)}
+        if spec['start'] not in index:
+            raise ValueError(f"Unknown start state: {spec['start']}")
+
+        transitions = np.zeros((len(states), len(states) + 1))
+        for source, targets in spec.get('transitions', {}).items():
+            if source not in index:
+                raise ValueError(f"Transition from unknown state: {source}")
+            for target, probability in targets.items():
+                column = len(states) if target == 'exit' else index.get(target)
+                if column is None:
+                    raise ValueError(f"Transition to unknown state: {target}")
+                transitions[index[source], column] = probability
+        totals = transitions.sum(axis=1)
+        transitions[totals == 0, -1] = 1.0  # States without transitions end the session
+        transitions /= transitions.sum(axis=1, keepdims=True)
+
+        dwell = []
+        for name in states:
+            spec_dwell = pages[name].get('dwell', {'dist': 'constant', 'value': 0})
+            kind = spec_dwell['dist']
+            if kind == 'constant':
+                dwell.append((kind, spec_dwell['value'], 0.0))
+            elif kind == 'uniform':
+                dwell.append((kind, spec_dwell['low'], spec_dwell['high']))
+            elif kind == 'exponential':
+                dwell.append((kind, spec_dwell['mean'], 0.0))
+            elif kind == 'lognormal':
+                dwell.append((kind, spec_dwell['median'], spec_dwell['sigma']))
+            else:
+                raise ValueError(f"Unknown dwell distribution for {name}: {kind}")
+
+        for name in states:
+            if not pages[name].get('urls'):
+                raise ValueError(f"State {name} has no urls")
+
+        return cls(
+            name=spec.get('name', 'scenario'),
+            states=states,
+            categories=[pages[name].get('category', name) for name in states],
+            urls=[list(pages[name]['urls']) for name in states],
+            transitions=transitions,
+            dwell=dwell,
+            start=index[spec['start']],
+            max_steps=spec.get('max_steps', 10),
+        )
+
+    def with_urls(self, rewrite):
+        """Copy of the scenario with every URL passed through rewrite(url)."""
+        scenario = copy.copy(self)
+        scenario.urls = [[rewrite(url) for url in urls] for urls in self.urls]
+        return scenario
+
+    def urls_for(self, category):
+        return [url for state, urls in enumerate(self.urls) if self.categories[state] == category for url in urls]
+
+    def all_urls(self):
+        return [url for urls in self.urls for url in urls]
+
+    def sample(self, n_users, rng):
+        """Sample journeys for n_users at once: state, URL and dwell arrays of shape (n_users, max_steps)."""
+        states = np.full((n_users, self.max_steps), EXIT, dtype=np.int32)
+        current = np.full(n_users, self.start, dtype=np.int32)
+        for step in range(self.max_steps):
+            active = current != EXIT
+            if not active.any():
+                break
+            states[:, step] = current
+            # Next state: first column of the cumulative row that exceeds a uniform draw
+            rows = self.cumulative[np.where(active, current, 0)]
+            draws = rng.random(n_users)
+            targets = (rows < draws[:, None]).sum(axis=1)
+            current = np.where(active & (targets < len(self.states)), targets, EXIT).astype(np.int32)
+
+        visited = states != EXIT
+        lookup = np.where(visited, states, 0)
+        url_index = (rng.random(states.shape) * self.url_counts[lookup]).astype(np.int32)
+
+        kind, a, b = self.dwell_kind[lookup], self.dwell_a[lookup], self.dwell_b[lookup]
+        uniform = rng.random(states.shape)
+        sigma = np.where(kind == 3, b, 0.0)  # Only lognormal states use b as sigma
+        dwell = np.select(
+            [kind == 0, kind == 1, kind == 2, kind == 3],
+            [a, a + (b - a) * uniform, rng.exponential(1.0, states.shape) * a,
+             a * np.exp(sigma * rng.standard_normal(states.shape))],
+        )
+        return states, url_index, np.where(visited, dwell, 0.0)
+
+    def journeys(self, rng=None, batch_size=1024):
+        """Endless supply of journeys (lists of Step), sampled in batches."""
+        rng = rng or np.random.default_rng()
+        while True:
+            states, url_index, dwell = self.sample(batch_size, rng)
+            for user in range(batch_size):
+                steps = []
+                for step in range(self.max_steps):
+                    state = states[user, step]
+                    if state == EXIT:
+                        break
+                    steps.append(Step(self.states[state], self.categories[state],
+                                      self.urls[state][url_index[user, step]], float(dwell[user, step])))
+                yield steps
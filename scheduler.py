@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import random
+
+
+# Arrival-rate profiles: each returns the gap (seconds) to the next arrival at elapsed time t
+class ConstantRate:
+    def __init__(self, rate):
+        self.rate = rate  # arrivals per second
+
+    def rate_at(self, t):
+        return self.rate
+
+    def next_interval(self, t, rng):
+        return 1.0 / self.rate
+
+
+class PoissonRate(ConstantRate):
+    def next_interval(self, t, rng):
+        return rng.expovariate(self.rate)
+
+
+# Rate that changes over time: segments of (duration_seconds, rate); the last segment repeats forever
+class PiecewiseRate:
+    def __init__(self, segments, poisson=True):
+        self.segments = segments
+        self.poisson = poisson
+
+    def _segment_at(self, t):
+        start = 0.0
+        for duration, rate in self.segments:
+            if t < start + duration:
+                return start, duration, rate
+            start += duration
+        duration, rate = self.segments[-1]
+        return start, float('inf'), rate
+
+    def rate_at(self, t):
+        return self._segment_at(t)[2]
+
+    def next_interval(self, t, rng):
+        gap = 0.0
+        while True:
+            start, duration, rate = self._segment_at(t + gap)
+            if rate > 0:
+                return gap + (rng.expovariate(rate) if self.poisson else 1.0 / rate)
+            if duration == float('inf'):
+                raise ValueError("Piecewise rate ends with a zero-rate segment")
+            gap = start + duration - t  # Skip idle segments
+
+
+def make_rate_profile(kind, rate=1.0, segments=None):
+    if kind == 'constant':
+        return ConstantRate(rate)
+    if kind == 'poisson':
+        return PoissonRate(rate)
+    if kind == 'piecewise':
+        return PiecewiseRate(segments)
+    raise ValueError(f"Unknown arrival process: {kind}")
+
+
+def format_rate(rate):
+    return f"{rate:.3f}/s" if rate is not None else "n/a"
+
+
+# Open-model scheduler: sessions are created lazily on a monotonic-clock timeline.
+# Arrival times are absolute (start + sum of gaps), so loop lag never accumulates as drift.
+class ArrivalScheduler:
+    def __init__(self, profile, total_users=None, duration=None, max_concurrency=None, seed=None, clock=None,
+                 limiter=None, control=None):
+        self.profile = profile
+        self.clock = clock  # VirtualClock: arrival gaps and duration are virtual time, scaled to wall time
+        self.total_users = total_users
+        self.duration = duration
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter  # Resizable replacement for the fixed max_concurrency semaphore (adaptive.py)
+        self.control = control  # RunControl (control.py): pause, drain, stop and rate changes while running
+        self.rng = random.Random(seed)
+
+        self.arrivals = 0
+        self.late_arrivals = 0  # Started more than 100 ms after their scheduled time
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+        self.total_slot_wait = 0.0
+        self.max_slot_wait = 0.0
+        self.start_time = None
+        self.last_arrival = None
+        self.last_scheduled = None
+
+    async def run(self, spawn):
+        """Start spawn(user_number) at each arrival and wait for every session to finish."""
+        loop = asyncio.get_running_loop()
+        slots = self.limiter or (asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None)
+        tasks = set()
+
+        async def session(user_number):
+            try:
+                await spawn(user_number)
+            except Exception as e:
+                logging.error(f"User {user_number} - Unhandled session error: {e}")
+            finally:
+                if slots:
+                    slots.release()
+
+        if self.control:
+            self.control.attach(self, slots, tasks)
+        self.start_time = loop.time()
+        virtual_t = 0.0
+        while self.total_users is None or self.arrivals < self.total_users:
+            if self.duration is not None and virtual_t >= self.duration:
+                break
+            if self.control and not await self.control.wait_running():
+                break  # Draining: no new arrivals
+            paused = self.control.paused_seconds if self.control else 0.0
+            scheduled = self.start_time + paused + (self.clock.scale(virtual_t) if self.clock else virtual_t)
+            delay = scheduled - loop.time()
+            if delay > 0:
+                if self.control:
+                    if not await self.control.sleep(delay):
+                        continue  # A command arrived: check pause/drain again before this arrival
+                else:
+                    await asyncio.sleep(delay)
+                lateness = max(0.0, loop.time() - scheduled)  # Loop lag on wake-up
+            elif slots:
+                lateness = 0.0  # Already behind because earlier arrivals queued for a slot
+            else:
+                lateness = -delay
+
+            # Concurrency cap: wait for a free slot, tracked separately from loop lateness
+            if slots:
+                if self.control:
+                    if not await self.control.acquire(slots):
+                        break
+                    if self.control.paused:
+                        slots.release()  # Paused while waiting for the slot
+                        continue
+                else:
+                    await slots.acquire()
+            slot_wait = max(0.0, loop.time() - scheduled - lateness)
+
+            self._record(lateness, slot_wait, scheduled)
+            task = asyncio.create_task(session(self.arrivals))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+            gap = self.profile.next_interval(virtual_t, self.rng)
+            virtual_t += gap / self.control.rate_factor if self.control else gap
+
+        if tasks:
+            # Sessions cancelled by a stop command are collected here rather than cancelling the run
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _record(self, lateness, slot_wait, scheduled):
+        self.arrivals += 1
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        if lateness > 0.1:
+            self.late_arrivals += 1
+        self.total_slot_wait += slot_wait
+        self.max_slot_wait = max(self.max_slot_wait, slot_wait)
+        self.last_scheduled = scheduled
+        self.last_arrival = scheduled + lateness + slot_wait
+
+    # Rates are None when every arrival happened at the same instant (no span to divide by)
+    def requested_rate(self):
+        if self.last_scheduled is None or self.arrivals < 2:
+            return 0.0
+        span = self.last_scheduled - self.start_time
+        return (self.arrivals - 1) / span if span > 0 else None
+
+    def achieved_rate(self):
+        if self.last_arrival is None or self.arrivals < 2:
+            return 0.0
+        span = self.last_arrival - self.start_time
+        return (self.arrivals - 1) / span if span > 0 else None
+
+    def stats(self):
+        return {
+            'arrivals': self.arrivals,
+            'requested_rate': self.requested_rate(),
+            'achieved_rate': self.achieved_rate(),
+            'mean_lateness': self.total_lateness / self.arrivals if self.arrivals else 0.0,
+            'max_lateness': self.max_lateness,
+            'late_arrivals': self.late_arrivals,
+            'mean_slot_wait': self.total_slot_wait / self.arrivals if self.arrivals else 0.0,
+            'max_slot_wait': self.max_slot_wait,
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (f"Scheduler: {stats['arrivals']} arrivals, requested {format_rate(stats['requested_rate'])}, "
+                f"achieved {format_rate(stats['achieved_rate'])}, lateness mean {stats['mean_lateness'] * 1000:.1f} ms "
+                f"max {stats['max_lateness'] * 1000:.1f} ms ({stats['late_arrivals']} late > 100 ms), "
+                f"slot wait mean {stats['mean_slot_wait']:.2f}s max {stats['max_slot_wait']:.2f}s")
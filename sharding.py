@@ -0,0 +1,69 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from metrics import PageMetrics
+
+
+# Split total users and concurrency across shards as evenly as possible
+def split_evenly(total, shards):
+    base, extra = divmod(total, shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+# Run one simulation per process and collect their results. shard_fn(shard, first_user, users,
+# concurrency, rate_share, **shard_options) must be a picklable top-level function returning a
+# result dict with at least 'shard', 'users', 'metrics' (PageMetrics.to_dict()), 'elapsed' and 'loop_lag'.
+def run_sharded(shard_fn, workers, total_users, concurrent_users, **shard_options):
+    # Every shard needs at least one session slot, so more workers than slots would raise the total
+    if workers > concurrent_users:
+        logging.warning(f"Only {concurrent_users} concurrent users: using {max(1, concurrent_users)} workers "
+                        f"instead of {workers}")
+        workers = max(1, concurrent_users)
+    users = split_evenly(total_users, workers)
+    first_users = [1 + sum(users[:shard]) for shard in range(workers)]  # Unique user numbers per shard
+    concurrency = split_evenly(max(1, concurrent_users), workers)
+    rate_share = 1.0 / workers  # Each shard generates this fraction of the arrival rate
+
+    logging.info(f"Starting {workers} worker processes: users {users}, concurrency {concurrency}")
+    # Spawn (not fork): every shard starts with a clean event loop, logging setup and RNG state
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(shard_fn, shard, first_users[shard], users[shard], concurrency[shard],
+                                   rate_share, **shard_options)
+                   for shard in range(workers)]
+        results = [future.result() for future in futures]
+    return results
+
+
+def merge_shard_results(results):
+    metrics = PageMetrics()
+    for result in results:
+        metrics.merge(PageMetrics.from_dict(result['metrics']))
+    return metrics
+
+
+def shard_report(results):
+    lines = ["Shards:"]
+    for result in results:
+        lag = result['loop_lag']
+        lines.append(f"  shard {result['shard']}: {result['users']} users in {result['elapsed']:.1f}s, "
+                     f"loop lag p50 {lag['p50'] * 1000:.1f} ms p99 {lag['p99'] * 1000:.1f} ms "
+                     f"max {lag['max'] * 1000:.1f} ms")
+    retry = {}
+    for result in results:
+        for key, value in result.get('retry', {}).items():
+            retry[key] = retry.get(key, 0) + value
+    if retry:
+        lines.append(f"  retries: {retry['retries']} for {retry['requests']} attempts, "
+                     f"{retry['breaker_trips']} breaker trips, {retry['shed']} requests shed")
+    cache = {}
+    for result in results:
+        for key, value in result.get('cache', {}).items():
+            cache[key] = cache.get(key, 0) + value
+    lookups = cache.get('hits', 0) + cache.get('revalidations', 0) + cache.get('misses', 0)
+    if lookups:
+        lines.append(f"  HTTP cache: hits {cache['hits'] / lookups:.1%}, revalidated {cache['revalidations'] / lookups:.1%}, "
+                     f"misses {cache['misses'] / lookups:.1%}, {cache['bytes_saved'] / 1024:.1f} KB not transferred")
+    elapsed = max(result['elapsed'] for result in results)
+    lines.append(merge_shard_results(results).report(elapsed))
+    return '\n'.join(lines)
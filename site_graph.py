@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import logging
+import os
+import struct
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, urldefrag
+import aiohttp
+import numpy as np
+
+# File layout (little endian, every array 8-byte aligned so it can be memory-mapped in place):
+#   header   MAGIC, version, nodes, edges, blob bytes
+#   offsets  uint64[nodes + 1]  start of each URL in the blob (URLs sorted, so lookups are a bisect)
+#   blob     UTF-8 URLs back to back
+#   indptr   uint32[nodes + 1]  CSR row pointers: links of node i are indices[indptr[i]:indptr[i + 1]]
+#   indices  uint32[edges]      link targets
+MAGIC = b'TGSG'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIQ')
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+# href collector for the crawler
+class LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.hrefs.append(href)
+
+
+def normalize(base, href):
+    try:
+        url, _ = urldefrag(urljoin(base, href))
+        scheme = urlsplit(url).scheme
+    except ValueError:
+        return None  # Malformed href, e.g. an unclosed IPv6 bracket
+    return url if scheme in ('http', 'https') else None
+
+
+# Breadth-first crawl of the seeds' hosts; returns {url: [linked urls]} for every HTML page fetched
+async def crawl(seeds, max_pages=5000, concurrency=20, timeout=30, proxy=None):
+    hosts = {urlsplit(seed).netloc for seed in seeds}
+    seen = set(seeds)
+    queue = asyncio.Queue()
+    for seed in seeds:
+        queue.put_nowait(seed)
+    pages = {}
+
+    async def worker(session):
+        while True:
+            url = await queue.get()
+            try:
+                if len(pages) >= max_pages:
+                    continue
+                async with session.get(url, proxy=proxy, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    if response.status != 200 or 'html' not in response.headers.get('Content-Type', ''):
+                        continue
+                    html = await response.text(errors='replace')
+                parser = LinkParser()
+                parser.feed(html)
+                links = []
+                for href in parser.hrefs:
+                    link = normalize(str(response.url), href)
+                    if link and urlsplit(link).netloc in hosts:
+                        links.append(link)
+                        if link not in seen:
+                            seen.add(link)
+                            queue.put_nowait(link)
+                pages[url] = links
+                if len(pages) % 500 == 0:
+                    logging.info(f"Crawled {len(pages)} pages, {queue.qsize()} queued")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"Crawl of {url} failed: {e}")
+            except Exception as e:
+                # Keep the worker alive: a dead worker would leave queue.join() waiting forever
+                logging.error(f"Unexpected error crawling {url}: {e!r}")
+            finally:
+                queue.task_done()
+
+    async with aiohttp.ClientSession() as session:
+        workers = [asyncio.create_task(worker(session)) for _ in range(concurrency)]
+        await queue.join()
+        for task in workers:
+            task.cancel()
+    return pages
+
+
+def write_graph(pages, path):
+    """Write the crawl as a CSR graph; links to pages that were not crawled are dropped."""
+    urls = sorted(pages)
+    index = {url: i for i, url in enumerate(urls)}
+    encoded = [url.encode('utf-8') for url in urls]
+    offsets = np.zeros(len(urls) + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(url) for url in encoded])
+    indptr = np.zeros(len(urls) + 1, dtype='<u4')
+    targets = []
+    for i, url in enumerate(urls):
+        row = sorted({index[link] for link in pages[url] if link in index and link != url})
+        targets.extend(row)
+        indptr[i + 1] = len(targets)
+    indices = np.array(targets, dtype='<u4')
+    blob = b''.join(encoded)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(urls), len(indices), len(blob)))
+        for data in (offsets.tobytes(), blob, indptr.tobytes(), indices.tobytes()):
+            f.write(b'\0' * (_aligned(f.tell()) - f.tell()))
+            f.write(data)
+    return len(urls), len(indices)
+
+
+# Read-only view of a graph file. Arrays are memory-mapped, so opening costs no parsing and
+# every worker process maps the same page-cache pages instead of holding its own copy.
+class SiteGraph:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, self.nodes, self.edges, blob_size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} site graph")
+
+        offset = _aligned(HEADER.size)
+        self.offsets = np.memmap(path, dtype='<u8', mode='r', offset=offset, shape=(self.nodes + 1,))
+        offset = _aligned(offset + self.offsets.nbytes)
+        self.blob = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(max(blob_size, 1),))
+        offset = _aligned(offset + blob_size)
+        self.indptr = np.memmap(path, dtype='<u4', mode='r', offset=offset, shape=(self.nodes + 1,))
+        offset = _aligned(offset + self.indptr.nbytes)
+        self.indices = (np.memmap(path, dtype='<u4', mode='r', offset=offset, shape=(self.edges,))
+                        if self.edges else np.zeros(0, dtype='<u4'))
+
+    def url(self, node):
+        return self.blob[self.offsets[node]:self.offsets[node + 1]].tobytes().decode('utf-8')
+
+    def index(self, url):
+        """Node id of url, or None (binary search over the sorted URL table)."""
+        low, high = 0, self.nodes
+        while low < high:
+            middle = (low + high) // 2
+            if self.url(middle) < url:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.nodes and self.url(low) == url else None
+
+    def links(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def next_url(self, url, rng):
+        """A random page linked from url, or None when url is unknown or has no links."""
+        node = self.index(url)
+        if node is None:
+            return None
+        links = self.links(node)
+        if not len(links):
+            return None
+        return self.url(links[rng.integers(len(links))])
+
+    def walk(self, start_url, steps, rng):
+        urls = [start_url]
+        while len(urls) < steps:
+            url = self.next_url(urls[-1], rng)
+            if url is None:
+                break
+            urls.append(url)
+        return urls
+
+    def report(self):
+        degrees = np.diff(self.indptr.astype(np.int64))
+        mean_degree = degrees.mean() if self.nodes else 0.0
+        return (f"Site graph {self.path}: {self.nodes} pages, {self.edges} links "
+                f"(mean out-degree {mean_degree:.1f}), {os.path.getsize(self.path) / 1024:.1f} KB")
+
+
+def read_seeds(args):
+    seeds = list(args.seed or [])
+    if args.scenario:
+        from scenario import Scenario
+        scenario = Scenario.load(args.scenario)
+        if args.standin:
+            from standin_server import localize_scenario
+            scenario = localize_scenario(scenario, args.standin)
+        seeds.extend(scenario.all_urls())
+    return list(dict.fromkeys(seeds))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl a site once into a memory-mappable link graph")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="crawl and write a graph file")
+    build.add_argument('--seed', action='append', help="start URL (repeatable)")
+    build.add_argument('--scenario', help="also start from every URL of this scenario file")
+    build.add_argument('--standin', metavar='BASE_URL', help="crawl the scenario's pages on a stand-in server")
+    build.add_argument('--output', default='site.graph')
+    build.add_argument('--max-pages', type=int, default=5000)
+    build.add_argument('--concurrency', type=int, default=20)
+    build.add_argument('--proxy', help="e.g. socks5://localhost:9050")
+    info = commands.add_parser('info', help="describe a graph file")
+    info.add_argument('path')
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    if args.command == 'info':
+        print(SiteGraph(args.path).report())
+        return
+
+    seeds = read_seeds(args)
+    if not seeds:
+        raise SystemExit("Give at least one --seed or a --scenario")
+    start = time.monotonic()
+    pages = asyncio.run(crawl(seeds, args.max_pages, args.concurrency, proxy=args.proxy))
+    crawled = time.monotonic() - start
+    nodes, edges = write_graph(pages, args.output)
+    built = time.monotonic() - start
+    size = os.path.getsize(args.output)
+    print(f"Crawled {nodes} pages in {crawled:.1f}s, wrote {edges} links in {built - crawled:.2f}s")
+    print(f"{args.output}: {size / 1024:.1f} KB ({size / max(nodes, 1):.0f} bytes per page)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import random
+import zlib
+from urllib.parse import urlsplit
+from aiohttp import web
+from scenario import Scenario
+
+# Static assets referenced by every page, so browser sessions exercise sub-resource loading
+ASSETS = {
+    'style.css': ('text/css', 8 * 1024),
+    'app.js': ('application/javascript', 32 * 1024),
+    'hero.jpg': ('image/jpeg', 64 * 1024),
+    'font.woff2': ('font/woff2', 24 * 1024),
+}
+
+
+# Path on the stand-in server for a scenario URL: the original host becomes the first segment
+def local_path(url):
+    parts = urlsplit(url)
+    path = f"/{parts.netloc}{parts.path or '/'}"
+    return f"{path}?{parts.query}" if parts.query else path
+
+
+def localize_scenario(scenario, base_url):
+    """Point every URL of the scenario at the stand-in server."""
+    return scenario.with_urls(lambda url: base_url.rstrip('/') + local_path(url))
+
+
+# Local stand-in for the target site: serves the scenario's pages with configurable latency,
+# page size and error injection so the generator's own capacity can be measured offline.
+def make_app(scenario, latency=0.05, jitter=0.02, size=50 * 1024, error_rate=0.0, links_per_page=20, seed=None):
+    rng = random.Random(seed)
+    paths = [local_path(url) for url in scenario.all_urls()]
+    counters = {'requests': 0, 'errors': 0, 'not_modified': 0, 'bytes': 0}
+
+    async def delay():
+        wait = max(0.0, rng.gauss(latency, jitter)) if jitter else latency
+        if wait:
+            await asyncio.sleep(wait)
+
+    def render_page(path):
+        links = ''.join(f'<li><a href="{link}">{link}</a></li>'
+                        for link in rng.sample(paths, k=min(links_per_page, len(paths))))
+        assets = ('<link rel="stylesheet" href="/static/style.css">'
+                  '<script src="/static/app.js"></script>'
+                  '<img src="/static/hero.jpg" alt="">'
+                  '<link rel="preload" as="font" href="/static/font.woff2" crossorigin>')
+        head = f'<!doctype html><html><head><title>{path}</title>{assets}</head><body><ul>{links}</ul><p>'
+        tail = '</p></body></html>'
+        filler = 'x' * max(0, size - len(head) - len(tail))
+        return head + filler + tail
+
+    async def page(request):
+        counters['requests'] += 1
+        await delay()
+        if error_rate and rng.random() < error_rate:
+            counters['errors'] += 1
+            return web.Response(status=503, text='Injected error')
+        etag = f'"{zlib.crc32(request.path.encode()):x}"'
+        if request.headers.get('If-None-Match') == etag:
+            counters['not_modified'] += 1
+            return web.Response(status=304, headers={'Cache-Control': 'no-cache', 'ETag': etag})
+        body = render_page(request.path)
+        counters['bytes'] += len(body)
+        return web.Response(text=body, content_type='text/html', headers={'Cache-Control': 'no-cache', 'ETag': etag})
+
+    async def asset(request):
+        name = request.match_info['name']
+        if name not in ASSETS:
+            raise web.HTTPNotFound()
+        counters['requests'] += 1
+        content_type, asset_size = ASSETS[name]
+        counters['bytes'] += asset_size
+        return web.Response(body=b'\0' * asset_size, content_type=content_type,
+                            headers={'Cache-Control': 'public, max-age=3600'})
+
+    async def stats(request):
+        return web.json_response(counters)
+
+    app = web.Application()
+    app['counters'] = counters
+    app.router.add_get('/_stats', stats)
+    app.router.add_get('/static/{name}', asset)
+    app.router.add_route('GET', '/{path:.*}', page)
+    app.router.add_route('HEAD', '/{path:.*}', page)
+    return app
+
+
+async def start_standin_server(scenario, host='127.0.0.1', port=8080, **options):
+    """Start the server on the running loop; returns (runner, base_url)."""
+    runner = web.AppRunner(make_app(scenario, **options), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, f"http://{host}:{port}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local stand-in target server for benchmarks")
+    parser.add_argument('--scenario', default='scenarios/exponentiel.toml')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.05, help="mean response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02, help="latency standard deviation in seconds")
+    parser.add_argument('--size', type=int, default=50 * 1024, help="HTML page size in bytes")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of page requests answered with 503")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    app = make_app(Scenario.load(args.scenario), latency=args.latency, jitter=args.jitter,
+                   size=args.size, error_rate=args.error_rate)
+    print(f"Stand-in server on http://{args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port, access_log=None, print=None)
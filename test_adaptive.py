@@ -0,0 +1,128 @@
+# test_adaptive.py
+
+import asyncio
+from adaptive import ResizableLimiter, AdaptiveController
+from metrics import PageMetrics
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_limiter_shrink_waits_for_held_slots():
+    async def run():
+        limiter = ResizableLimiter(2)
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await settle()
+        limiter.set_limit(1)  # Both sessions keep their slots
+        assert limiter.active == 2 and not waiter.done()
+        limiter.release()
+        await settle()
+        assert not waiter.done()  # Still at the new limit
+        limiter.release()
+        await settle()
+        assert waiter.done() and limiter.active == 1
+
+    asyncio.run(run())
+
+
+def test_limiter_grow_wakes_waiters():
+    async def run():
+        limiter = ResizableLimiter(1)
+        await limiter.acquire()
+        waiters = [asyncio.create_task(limiter.acquire()) for _ in range(3)]
+        await settle()
+        assert not any(waiter.done() for waiter in waiters)
+        limiter.set_limit(3)
+        await settle()
+        assert [waiter.done() for waiter in waiters] == [True, True, False]
+        assert limiter.active == 3
+        limiter.set_limit(0)
+        assert limiter.limit == 1
+        for waiter in waiters:
+            waiter.cancel()
+
+    asyncio.run(run())
+
+
+def test_limiter_cancelled_waiter_passes_its_slot_on():
+    async def run():
+        limiter = ResizableLimiter(1)
+        await limiter.acquire()
+        first = asyncio.create_task(limiter.acquire())
+        second = asyncio.create_task(limiter.acquire())
+        await settle()
+        limiter.release()  # Wakes first...
+        first.cancel()     # ...which is cancelled before it runs
+        await settle()
+        assert first.cancelled()
+        assert second.done() and limiter.active == 1
+
+    asyncio.run(run())
+
+
+def record(metrics, requests, latency, errors=0):
+    for _ in range(requests):
+        metrics.record('page', latency / 2, latency, 100, 200)
+    for _ in range(errors):
+        metrics.record('page', latency / 2, latency, 100, 503)
+
+
+def controller(limit=10, **options):
+    limiter = ResizableLimiter(limit)
+    metrics = PageMetrics()
+    options = {'slo_p99': 1.0, 'slo_error_rate': 0.05, 'interval': 5.0, 'min_requests': 20, **options}
+    return AdaptiveController(limiter, metrics, **options), limiter, metrics
+
+
+def test_additive_increase_when_within_slo_and_saturated():
+    adaptive, limiter, metrics = controller(increase=2)
+    limiter.active = 10
+    record(metrics, 50, 0.2)
+    sample = adaptive.step()
+    assert sample['decision'] == 'increase'
+    assert limiter.limit == 12
+    assert sample['throughput'] == 10.0
+    assert adaptive.best is sample
+
+
+def test_hold_when_demand_is_below_the_limit_or_too_few_requests():
+    adaptive, limiter, metrics = controller()
+    limiter.active = 5
+    record(metrics, 50, 0.2)
+    assert adaptive.step()['decision'] == 'hold'
+    limiter.active = 10
+    record(metrics, 5, 5.0)  # Slow, but too few completions to judge
+    assert adaptive.step()['decision'] == 'hold'
+    assert limiter.limit == 10
+
+
+def test_multiplicative_decrease_on_latency_or_errors():
+    adaptive, limiter, metrics = controller(limit=20, decrease=0.5, min_limit=4)
+    limiter.active = 20
+    record(metrics, 50, 3.0)
+    assert adaptive.step()['decision'] == 'decrease'
+    assert limiter.limit == 10
+    record(metrics, 40, 0.2, errors=10)  # 20% errors
+    assert adaptive.step()['decision'] == 'decrease'
+    assert limiter.limit == 5
+    record(metrics, 40, 3.0)
+    adaptive.step()
+    assert limiter.limit == 4  # Never below min_limit
+    assert adaptive.best is None
+
+
+def test_windows_only_count_new_requests_and_respect_max_limit():
+    limiter, metrics = ResizableLimiter(9), PageMetrics()
+    record(metrics, 100, 3.0)  # Before the controller started
+    adaptive = AdaptiveController(limiter, metrics, slo_p99=1.0, max_limit=10, increase=5)
+    limiter.active = 9
+    record(metrics, 30, 0.2)
+    sample = adaptive.step()
+    assert sample['p99'] < 1.0 and sample['decision'] == 'increase'
+    assert limiter.limit == 10
+    assert [entry['decision'] for entry in adaptive.stats()['timeline']] == ['increase']
+    assert 'Highest sustainable: 9' in adaptive.report()
@@ -0,0 +1,120 @@
+# test_browser_pool.py
+
+import asyncio
+import browser_pool
+from browser_pool import BrowserPool
+from playwright.async_api import Error as PlaywrightError
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.contexts = []
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, **options):
+        if self.closed:
+            raise PlaywrightError("Target browser has been closed")
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+# Stands in for async_playwright(): launches take a little while so other sessions can run meanwhile
+class FakePlaywright:
+    def __init__(self, fail_after=None):
+        self.launched = []
+        self.fail_after = fail_after
+        self.firefox = self
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+    async def launch(self, **options):
+        await asyncio.sleep(0.01)
+        if self.fail_after is not None and len(self.launched) >= self.fail_after:
+            raise PlaywrightError("launch failed")
+        browser = FakeBrowser(len(self.launched))
+        self.launched.append(browser)
+        return browser
+
+
+def make_pool(monkeypatch, size=1, recycle_after=1, fail_after=None):
+    playwright = FakePlaywright(fail_after)
+    monkeypatch.setattr(browser_pool, 'async_playwright', lambda: playwright)
+    return BrowserPool(size, recycle_after=recycle_after), playwright
+
+
+def test_new_context_waits_for_a_recycle_in_progress(monkeypatch):
+    pool, playwright = make_pool(monkeypatch)
+
+    async def run():
+        await pool.start()
+        first = await pool.new_context()
+
+        async def second_user():
+            await asyncio.sleep(0.001)  # While release() is launching the replacement
+            return await pool.new_context()
+
+        _, second = await asyncio.gather(pool.release(first), second_user())
+        return first, second
+
+    first, second = asyncio.run(run())
+    old, new = playwright.launched
+    assert first.browser is old and old.closed
+    assert second.browser is new and not new.closed
+    assert pool.browsers[0].active_contexts == 1
+
+
+def test_recycle_uses_the_other_browser_meanwhile(monkeypatch):
+    pool, playwright = make_pool(monkeypatch, size=2, recycle_after=1)
+
+    async def run():
+        await pool.start()
+        first = await pool.new_context()
+
+        async def second_user():
+            await asyncio.sleep(0.001)
+            return await pool.new_context()
+
+        _, second = await asyncio.gather(pool.release(first), second_user())
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second.browser is not first.browser
+    assert not second.browser.closed
+    assert first.browser.closed
+    assert pool.launches == 3
+
+
+def test_failed_relaunch_keeps_the_old_browser(monkeypatch):
+    pool, playwright = make_pool(monkeypatch, fail_after=1)
+
+    async def run():
+        await pool.start()
+        first = await pool.new_context()
+        await pool.release(first)
+        return await pool.new_context()
+
+    second = asyncio.run(run())
+    assert len(playwright.launched) == 1
+    assert second.browser is playwright.launched[0] and not second.browser.closed
+    assert not pool.browsers[0].recycling
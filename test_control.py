@@ -0,0 +1,95 @@
+# test_control.py
+
+import asyncio
+import time
+import pytest
+from adaptive import ResizableLimiter
+from control import RunControl, ControlServer, send_command
+from scheduler import ArrivalScheduler, ConstantRate
+
+
+# Run the scheduler with a RunControl; at[t] lists commands to execute t seconds into the run
+def run_with_control(profile, total_users, at, session_time=0.0, limiter=None):
+    control = RunControl()
+    times = []
+
+    async def spawn(user_number):
+        times.append(time.monotonic() - start)
+        await asyncio.sleep(session_time)
+
+    async def run():
+        nonlocal start
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        for delay, command in at:
+            loop.call_later(delay, control.execute, command)
+        scheduler = ArrivalScheduler(profile, total_users=total_users, limiter=limiter, control=control)
+        await scheduler.run(spawn)
+        return scheduler, time.monotonic() - start
+
+    start = None
+    scheduler, elapsed = asyncio.run(run())
+    return control, scheduler, times, elapsed
+
+
+def test_drain_stops_arrivals_and_lets_sessions_finish():
+    control, scheduler, times, elapsed = run_with_control(ConstantRate(50.0), 1000, [(0.11, 'drain')],
+                                                          session_time=0.1)
+    assert control.state() == 'draining'
+    assert 4 <= scheduler.arrivals <= 7
+    assert len(times) == scheduler.arrivals
+    assert max(times) < 0.11  # Nothing arrived after the drain
+    assert elapsed >= max(times) + 0.1  # The run waited for the sessions already started
+    assert control.cancelled == 0
+
+
+def test_pause_shifts_the_schedule():
+    control, scheduler, times, _ = run_with_control(ConstantRate(20.0), 4, [(0.07, 'pause'), (0.27, 'resume')])
+    assert control.paused_seconds == pytest.approx(0.2, abs=0.03)
+    assert times[:2] == pytest.approx([0.0, 0.05], abs=0.03)
+    # Arrival 3 was due at 0.10: it moves by the pause instead of bursting out with arrival 4 on resume
+    assert times[2] == pytest.approx(0.10 + control.paused_seconds, abs=0.03)
+    assert times[3] - times[2] == pytest.approx(0.05, abs=0.03)
+
+
+def test_stop_cancels_sessions():
+    control, scheduler, times, elapsed = run_with_control(ConstantRate(100.0), 1000, [(0.05, 'stop')],
+                                                          session_time=10.0)
+    assert control.state() == 'stopping'
+    assert control.cancelled == scheduler.arrivals > 0
+    assert elapsed < 1.0
+
+
+def test_resize_and_rate_commands():
+    limiter = ResizableLimiter(1)
+    control, scheduler, times, _ = run_with_control(ConstantRate(1000.0), 6, [(0.05, 'concurrency 3')],
+                                                    session_time=0.1, limiter=limiter)
+    assert limiter.limit == 3
+    assert len(times) == 6
+    assert sum(1 for t in times if t < 0.05) == 1  # One slot until the resize
+    reply = control.execute('rate 2')
+    assert reply['ok'] and reply['rate_factor'] == 2.0 and reply['concurrency'] == 3
+    assert not control.execute('rate 0')['ok']
+    assert not control.execute('fly')['ok']
+    fixed = RunControl()
+    fixed.attach(None, asyncio.Semaphore(1), set())
+    assert fixed.execute('concurrency 4') == {'ok': False, 'error': "this run's concurrency is fixed"}
+
+
+def test_control_server_round_trip(tmp_path):
+    path = str(tmp_path / 'run.sock')
+
+    async def run():
+        control = RunControl(status=lambda: {'requests': 7})
+        server = await ControlServer(control, path).start()
+        try:
+            paused = await asyncio.to_thread(send_command, path, 'pause')
+            status = await asyncio.to_thread(send_command, path, 'status')
+        finally:
+            await server.close()
+        return paused, status
+
+    paused, status = asyncio.run(run())
+    assert paused['ok'] and paused['state'] == 'paused'
+    assert status['requests'] == 7
+    assert not (tmp_path / 'run.sock').exists()
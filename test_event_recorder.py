@@ -0,0 +1,45 @@
+# test_event_recorder.py
+
+import math
+import pytest
+from event_recorder import EventRecorder, arrow_schema, event_files, read_events
+
+pytest.importorskip('pyarrow')
+
+
+def record(directory, format):
+    # Small batches and files so the run spans several of each
+    recorder = EventRecorder(str(directory), format, batch_size=4, rows_per_file=8)
+    for user in range(1, 6):
+        recorder.request(user, 'home', 'https://site.test/', 100.0 + user, 100.5 + user, ttfb=0.1, status=200,
+                         nbytes=1000)
+        recorder.step(user, 'visit', 'home', 'https://site.test/', 100.0 + user, 101.0 + user, status=200, nbytes=1000)
+    recorder.step(6, 'link', 'link', 'https://site.test/é', 200.0, 200.25, error='ClientError')
+    recorder.close()
+    return recorder
+
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_round_trip(tmp_path, format):
+    recorder = record(tmp_path, format)
+    assert recorder.stats()['rows'] == recorder.stats()['rows_written'] == 11
+    assert len(event_files(str(tmp_path))) == recorder.stats()['files'] == 2
+
+    table = read_events(str(tmp_path))
+    assert table.num_rows == 11
+    assert table.schema.remove_metadata().equals(arrow_schema())
+    rows = table.to_pylist()
+    assert [row['event'] for row in rows].count('request') == 5
+    first = rows[0]
+    assert (first['event'], first['user'], first['phase'], first['page']) == ('request', 1, 'network', 'home')
+    assert first['duration'] == pytest.approx(0.5) and first['ttfb'] == pytest.approx(0.1)
+    assert first['start'].timestamp() == pytest.approx(101.0)
+    assert first['error'] is None
+    assert math.isnan(rows[1]['ttfb'])  # Steps have no time to first byte
+    last = rows[-1]
+    assert (last['phase'], last['url'], last['error'], last['status']) == ('link', 'https://site.test/é', 'ClientError', 0)
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        EventRecorder(str(tmp_path), 'csv')
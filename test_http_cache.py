@@ -0,0 +1,82 @@
+# test_http_cache.py
+
+from http_cache import HttpCache, CacheStats
+
+URL = 'https://example.test/style.css'
+
+
+# Cache on a hand-driven clock
+def cache(**options):
+    now = [100.0]
+    return HttpCache(now=lambda: now[0], **options), now
+
+
+def test_max_age_freshness():
+    http_cache, now = cache()
+    assert http_cache.request(URL) == (False, {})
+    assert http_cache.response(URL, 200, {'Cache-Control': 'max-age=60'}, 1000) == 'miss'
+    now[0] += 59
+    assert http_cache.request(URL) == (True, {})
+    now[0] += 2
+    assert http_cache.request(URL) == (False, {})  # Stale and no validator: plain request
+    assert (http_cache.stats.hits, http_cache.stats.misses, http_cache.stats.bytes_saved) == (1, 1, 1000)
+
+
+def test_etag_revalidation_with_304():
+    http_cache, now = cache()
+    http_cache.response(URL, 200, {'Cache-Control': 'max-age=10', 'ETag': '"v1"',
+                                   'Last-Modified': 'Mon, 16 Sep 2024 10:00:00 GMT'}, 500)
+    now[0] += 11
+    fresh, headers = http_cache.request(URL)
+    assert not fresh
+    assert headers == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 16 Sep 2024 10:00:00 GMT'}
+    assert http_cache.response(URL, 304, {'Cache-Control': 'max-age=10'}, 0) == 'revalidated'
+    assert http_cache.request(URL) == (True, {})  # The 304 refreshed the lifetime
+    assert (http_cache.stats.revalidations, http_cache.stats.bytes_saved) == (1, 1000)
+
+
+def test_changed_resource_replaces_entry():
+    http_cache, now = cache()
+    http_cache.response(URL, 200, {'ETag': '"v1"'}, 500)
+    assert http_cache.request(URL) == (False, {'If-None-Match': '"v1"'})
+    assert http_cache.response(URL, 200, {'ETag': '"v2"'}, 700) == 'miss'
+    assert http_cache.request(URL) == (False, {'If-None-Match': '"v2"'})
+    assert http_cache.size == 700
+
+
+def test_no_store_no_cache_and_private():
+    http_cache, now = cache()
+    http_cache.response(URL, 200, {'Cache-Control': 'no-store, max-age=60'}, 100)
+    assert URL not in http_cache.entries
+    http_cache.response(URL, 200, {'Cache-Control': 'no-cache, max-age=60', 'ETag': '"a"'}, 100)
+    assert http_cache.request(URL) == (False, {'If-None-Match': '"a"'})  # Always revalidated
+
+    shared, _ = cache(shared=True)
+    shared.response(URL, 200, {'Cache-Control': 'private, max-age=60'}, 100)
+    assert URL not in shared.entries
+    shared.response(URL, 200, {'Cache-Control': 'max-age=0, s-maxage=60'}, 100)
+    assert shared.request(URL) == (True, {})
+
+
+def test_expires_relative_to_date():
+    http_cache, now = cache()
+    http_cache.response(URL, 200, {'Date': 'Mon, 16 Sep 2024 10:00:00 GMT',
+                                   'Expires': 'Mon, 16 Sep 2024 10:00:30 GMT'}, 100)
+    now[0] += 29
+    assert http_cache.request(URL)[0]
+    now[0] += 2
+    assert not http_cache.request(URL)[0]
+
+
+def test_lru_eviction():
+    stats = CacheStats()
+    http_cache, now = cache(max_bytes=100, stats=stats)
+    for name in ('a', 'b'):
+        http_cache.response(f'{URL}?{name}', 200, {'Cache-Control': 'max-age=60'}, 40)
+    http_cache.request(f'{URL}?a')  # a becomes the most recently used
+    http_cache.response(f'{URL}?c', 200, {'Cache-Control': 'max-age=60'}, 40)
+    assert list(http_cache.entries) == [f'{URL}?a', f'{URL}?c']
+    assert http_cache.size == 80
+    assert stats.evictions == 1
+    http_cache.response(f'{URL}?big', 200, {'Cache-Control': 'max-age=60'}, 101)
+    assert f'{URL}?big' not in http_cache.entries  # Larger than the whole cache
@@ -0,0 +1,63 @@
+# test_log_analyzer.py
+
+import json
+import os
+import shutil
+from log_analyzer import analyze, INDEX_SUFFIX
+
+SAMPLE_LOG = 'simulation.log'
+
+
+def summary(analysis):
+    return json.dumps(analysis.to_dict(), sort_keys=True)
+
+
+def grow(path, data, cuts):
+    # Write the log in pieces, analysing (and resuming from the sidecar) after each one
+    with open(path, 'wb') as f:
+        previous = 0
+        for cut in cuts + [len(data)]:
+            f.write(data[previous:cut])
+            f.flush()
+            previous = cut
+            analysis, _ = analyze(path)
+    return analysis
+
+
+def test_incremental_equals_rebuild(tmp_path):
+    with open(SAMPLE_LOG, 'rb') as f:
+        data = f.read()
+    path = str(tmp_path / 'simulation.log')
+    # Cuts on a record boundary, mid-line and inside a traceback
+    boundary = data.index(b'\n2024-', len(data) // 3) + 1
+    cuts = [boundary, boundary + 7, len(data) // 2, data.index(b'Traceback', len(data) // 2) + 20]
+    incremental = grow(path, data, sorted(cuts))
+    assert os.path.exists(path + INDEX_SUFFIX)
+    rebuilt, parsed = analyze(path, rebuild=True)
+    assert parsed == len(data)
+    assert summary(incremental) == summary(rebuilt)
+    assert incremental.report() == rebuilt.report()
+
+
+def test_resume_parses_only_new_bytes(tmp_path):
+    path = str(tmp_path / 'simulation.log')
+    shutil.copy(SAMPLE_LOG, path)
+    first, parsed = analyze(path)
+    assert parsed == os.path.getsize(path)
+    records = first.records
+    with open(path, 'ab') as f:
+        f.write(b'2024-09-16 17:57:44,410 - INFO - User 1 - Visiting home page: https://site.test/\n')
+    second, parsed = analyze(path)
+    assert parsed < 1000  # The last record of the first run plus the new one
+    assert second.records == records + 1
+
+
+def test_replaced_log_is_parsed_again(tmp_path):
+    path = str(tmp_path / 'simulation.log')
+    shutil.copy(SAMPLE_LOG, path)
+    analyze(path)
+    with open(path, 'wb') as f:
+        f.write(b'2024-09-17 08:00:00,000 - ERROR - User 2 - Error: timeout\n')
+    analysis, parsed = analyze(path)
+    assert analysis.records == 1
+    assert analysis.levels == {'ERROR': 1}
@@ -0,0 +1,81 @@
+# test_log_pipeline.py
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from log_pipeline import BackgroundLogHandler, log_pipeline_report
+
+
+# Stream whose first write blocks until released, so the writer thread stalls and the queue fills up
+class StalledStream:
+    def __init__(self):
+        self.lines = []
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.release.wait(10)
+        self.lines.append(text)
+
+    def flush(self):
+        pass
+
+
+def stalled_handler(policy, max_queue=5):
+    stream = StalledStream()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(logging.Formatter('%(message)s'))
+    handler = BackgroundLogHandler([target], max_queue=max_queue, policy=policy, flush_interval=0.05)
+    logger = logging.getLogger(f'test_log_pipeline.{policy}')
+    logger.propagate = False
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    return handler, logger, stream
+
+
+@pytest.mark.parametrize('policy', ['drop_newest', 'drop_oldest'])
+def test_full_queue_drops_and_counts(policy):
+    handler, logger, stream = stalled_handler(policy)
+    logger.info('record 0')
+    assert stream.writing.wait(5)  # The writer holds record 0; the queue is empty again
+    for number in range(1, 21):
+        logger.info('record %d', number)
+    # drop_newest refuses the new records; drop_oldest enqueues them and evicts older ones instead
+    enqueued = 6 if policy == 'drop_newest' else 21
+    assert handler.stats() == {'enqueued': enqueued, 'written': 0, 'dropped': 15, 'queued': 5}
+    stream.release.set()
+    handler.close()
+
+    stats = handler.stats()
+    assert stats['written'] == 6 and stats['queued'] == 0
+    assert stats['written'] + stats['dropped'] == 21  # Every record is either written or counted as dropped
+    written = [line.strip() for line in stream.lines]
+    if policy == 'drop_newest':
+        assert written == [f'record {n}' for n in range(6)]
+    else:
+        assert written == ['record 0'] + [f'record {n}' for n in range(16, 21)]
+    assert log_pipeline_report(handler) == f"Log pipeline: {enqueued} enqueued, 6 written, 15 dropped, 0 still queued"
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BackgroundLogHandler([], policy='spill')
+
+
+def test_queued_records_are_flushed_at_exit(tmp_path):
+    path = str(tmp_path / 'simulation.log')
+    script = ("import logging, sys\n"
+              "from log_pipeline import configure_logging\n"
+              "configure_logging(sys.argv[1], console_stream=open('/dev/null', 'w'))\n"
+              "for n in range(2000):\n"
+              "    logging.info('record %d', n)\n")
+    subprocess.run([sys.executable, '-c', script, path], check=True, timeout=60,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2000
+    assert lines[-1].endswith(' - INFO - record 1999')
@@ -0,0 +1,60 @@
+# test_log_tail.py
+
+import os
+from log_tail import LogTailer
+
+
+def append(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+
+def test_appends_and_partial_lines(tmp_path):
+    path = str(tmp_path / 'simulation.log')
+    tailer = LogTailer(path, max_lines=3)
+    assert tailer.poll() == 0 and tailer.text() == ''  # Not created yet
+    append(path, 'one\ntwo\nthr')
+    assert tailer.poll() == 2
+    assert tailer.text() == 'one\ntwo'
+    assert tailer.poll() == 0
+    append(path, 'ee\nfour\n')
+    assert tailer.poll() == 2
+    assert tailer.text() == 'two\nthree\nfour'  # Only the last max_lines are kept
+
+
+def test_rotation_starts_over_on_the_new_file(tmp_path):
+    path = str(tmp_path / 'simulation.log')
+    tailer = LogTailer(path)
+    append(path, 'old 1\nold 2\n')
+    tailer.poll()
+    os.rename(path, path + '.1')
+    append(path, 'new 1\n')  # Shorter than the offset too, but detected by its new inode
+    append(path + '.1', 'late write to the rotated file\n')
+    assert tailer.poll() == 1
+    assert tailer.text() == 'old 1\nold 2\nnew 1'
+    append(path, 'new 2\n')
+    assert tailer.poll() == 1
+    assert tailer.text().endswith('new 1\nnew 2')
+
+
+def test_truncation_starts_over(tmp_path):
+    path = str(tmp_path / 'simulation.log')
+    tailer = LogTailer(path)
+    append(path, 'a long line before the truncation\nanother one\n')
+    tailer.poll()
+    inode = os.stat(path).st_ino
+    with open(path, 'w') as f:
+        f.write('fresh\n')
+    assert os.stat(path).st_ino == inode
+    assert tailer.poll() == 1
+    assert tailer.text().endswith('another one\nfresh')
+    assert tailer.offset == len('fresh\n')
+
+
+def test_far_behind_reads_only_the_tail(tmp_path):
+    path = str(tmp_path / 'simulation.log')
+    append(path, ''.join(f'line {i:05d}\n' for i in range(10000)))
+    tailer = LogTailer(path, max_lines=5, max_read=1000)
+    tailer.poll()
+    assert tailer.text() == '\n'.join(f'line {i:05d}' for i in range(9995, 10000))
+    assert tailer.offset == os.path.getsize(path)
@@ -0,0 +1,69 @@
+# test_metrics.py
+
+import math
+import random
+from metrics import LatencyHistogram
+
+# Bucket width is GROWTH, so a percentile is within half a bucket of the exact value
+RELATIVE_ERROR = math.sqrt(LatencyHistogram.GROWTH) - 1
+
+
+def exact_percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * p / 100)) - 1]
+
+
+def log_uniform(rng, n, low=1e-3, high=10.0):
+    return [math.exp(rng.uniform(math.log(low), math.log(high))) for _ in range(n)]
+
+
+def test_percentile_within_bucket_error():
+    values = log_uniform(random.Random(1), 10000)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for p in (1, 50, 90, 99, 99.9, 100):
+        exact = exact_percentile(values, p)
+        assert abs(histogram.percentile(p) - exact) <= exact * RELATIVE_ERROR + 1e-12, p
+    assert histogram.percentile(100) <= max(values)
+    assert math.isclose(histogram.mean(), sum(values) / len(values))
+
+
+def test_out_of_range_values_land_in_edge_buckets():
+    histogram = LatencyHistogram()
+    for value in (1e-6, 5e-5, 7200.0):
+        histogram.record(value)
+    assert histogram.counts[0] == 2
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(1) == LatencyHistogram.MIN_VALUE
+    assert histogram.percentile(100) >= LatencyHistogram.MAX_VALUE / LatencyHistogram.GROWTH
+
+
+def test_merge_equals_single_histogram():
+    rng = random.Random(2)
+    first, second = log_uniform(rng, 3000), log_uniform(rng, 5000, 0.01, 100.0)
+    merged, single = LatencyHistogram(), LatencyHistogram()
+    part = LatencyHistogram()
+    for value in first:
+        merged.record(value)
+        single.record(value)
+    for value in second:
+        part.record(value)
+        single.record(value)
+    merged.merge(part)
+    assert merged.counts == single.counts
+    assert (merged.count, merged.min, merged.max) == (single.count, single.min, single.max)
+    assert math.isclose(merged.total, single.total)
+    for p in (50, 99):
+        assert merged.percentile(p) == single.percentile(p)
+
+
+def test_empty_histogram_merge_and_round_trip():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0.0
+    histogram.merge(LatencyHistogram())
+    assert histogram.count == 0 and histogram.min == float('inf')
+    histogram.record(0.25)
+    copy = LatencyHistogram.from_dict(histogram.to_dict())
+    assert copy.counts == histogram.counts
+    assert copy.percentile(50) == histogram.percentile(50) == 0.25
@@ -0,0 +1,121 @@
+# test_retry.py
+
+import asyncio
+import random
+import pytest
+import retry
+from retry import RetryPolicy, CircuitBreaker, CircuitOpenError
+
+
+class Response:
+    def __init__(self, status):
+        self.status = status
+
+
+# Operation that plays back a list of outcomes: an exception is raised, anything else returned
+def scripted(outcomes):
+    outcomes = list(outcomes)
+
+    async def operation():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return operation
+
+
+def policy(**options):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+    return RetryPolicy(sleep=sleep, **options), delays
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(retry.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_backoff_is_full_jitter_capped_at_max_delay():
+    random.seed(6)
+    retry_policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for attempt in range(6):
+        delays = [retry_policy.backoff(attempt) for _ in range(2000)]
+        ceiling = min(5.0, 2 ** attempt)
+        assert 0 <= min(delays) and max(delays) <= ceiling
+        assert sum(delays) / len(delays) == pytest.approx(ceiling / 2, rel=0.1)
+
+
+def test_retries_until_success():
+    retry_policy, delays = policy(max_attempts=3)
+    result = asyncio.run(retry_policy.call('http://a.test/', scripted([OSError('reset'), Response(503), Response(200)])))
+    assert result.status == 200
+    assert len(delays) == 2
+    assert delays[0] <= 1.0 and delays[1] <= 2.0
+    assert retry_policy.stats()['requests'] == 3
+    assert retry_policy.stats()['retries'] == 2
+
+
+def test_gives_up_after_max_attempts():
+    retry_policy, delays = policy(max_attempts=3, breaker_threshold=1000)
+    result = asyncio.run(retry_policy.call('http://a.test/', scripted([Response(503)] * 3)))
+    assert result.status == 503  # Last response is returned as-is
+    with pytest.raises(OSError):
+        asyncio.run(retry_policy.call('http://a.test/', scripted([OSError('reset')] * 3)))
+    assert len(delays) == 4
+    assert retry_policy.stats()['failures'] == 6
+
+
+def test_budget_caps_retries_at_a_fraction_of_requests():
+    retry_policy, delays = policy(max_attempts=10, budget_ratio=0.1, budget_floor=2, breaker_threshold=1000)
+    for _ in range(20):
+        asyncio.run(retry_policy.call('http://a.test/', scripted([Response(200)])))
+    # Retry n is allowed while n - 1 < 2 + 0.1 * requests: the 26th request (5 retries in) is refused
+    result = asyncio.run(retry_policy.call('http://a.test/', scripted([Response(500)] * 10)))
+    assert result.status == 500
+    stats = retry_policy.stats()
+    assert stats['retries'] == len(delays) == 5
+    assert stats['budget_exhausted'] == 1
+    assert stats['requests'] == 26
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3, reset_timeout=30)
+    assert not breaker.failed() and not breaker.failed()
+    breaker.succeeded()  # Only consecutive failures count
+    assert not breaker.failed() and not breaker.failed()
+    assert breaker.failed()
+    assert not breaker.allow()
+    clock[0] += 29.9
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_probe(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30)
+    breaker.failed()
+    clock[0] += 30
+    assert breaker.allow()      # One probe...
+    assert not breaker.allow()  # ...and the timer restarts for everyone else
+    assert breaker.failed()     # A failed probe opens the breaker again
+    assert not breaker.allow()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.succeeded()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_open_breaker_sheds_requests(clock):
+    retry_policy, _ = policy(max_attempts=1, breaker_threshold=2, breaker_reset=30)
+    for _ in range(2):
+        asyncio.run(retry_policy.call('http://down.test/a', scripted([Response(502)])))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(retry_policy.call('http://down.test/b', scripted([Response(200)])))
+    asyncio.run(retry_policy.call('http://up.test/', scripted([Response(200)])))  # Breakers are per host
+    stats = retry_policy.stats()
+    assert (stats['breaker_trips'], stats['shed'], stats['open_breakers']) == (1, 1, 1)
+    clock[0] += 30
+    assert asyncio.run(retry_policy.call('http://down.test/b', scripted([Response(200)]))).status == 200
+    assert retry_policy.stats()['open_breakers'] == 0
@@ -0,0 +1,74 @@
+# test_scenario.py
+
+from collections import Counter
+import numpy as np
+import pytest
+from scenario import Scenario, EXIT
+
+SPEC = {
+    'name': 'test',
+    'start': 'home',
+    'max_steps': 4,
+    'pages': {
+        'home': {'urls': ['https://site.test/'], 'dwell': {'dist': 'constant', 'value': 2}},
+        'blog': {'urls': ['https://site.test/blog/1', 'https://site.test/blog/2'], 'category': 'articles',
+                 'dwell': {'dist': 'uniform', 'low': 1, 'high': 3}},
+        'contact': {'urls': ['https://site.test/contact']},
+    },
+    'transitions': {
+        'home': {'blog': 0.6, 'contact': 0.3, 'exit': 0.1},
+        'blog': {'blog': 0.5, 'home': 0.5},
+    },
+}
+
+
+def test_transition_sampling_matches_probabilities():
+    scenario = Scenario.compile(SPEC)
+    n = 20000
+    states, url_index, dwell = scenario.sample(n, np.random.default_rng(7))
+    assert (states[:, 0] == scenario.start).all()
+    second = Counter(states[:, 1].tolist())
+    assert second[1] / n == pytest.approx(0.6, abs=0.02)
+    assert second[2] / n == pytest.approx(0.3, abs=0.02)
+    assert second[EXIT] / n == pytest.approx(0.1, abs=0.02)
+    from_blog = states[:, 2][states[:, 1] == 1]
+    assert (from_blog == 0).mean() == pytest.approx(0.5, abs=0.03)
+    assert set(from_blog.tolist()) == {0, 1}
+    # Contact has no transitions: the session always ends there
+    assert (states[:, 2][states[:, 1] == 2] == EXIT).all()
+
+
+def test_sampled_urls_and_dwell():
+    scenario = Scenario.compile(SPEC)
+    states, url_index, dwell = scenario.sample(5000, np.random.default_rng(8))
+    blog = states == 1
+    assert set(url_index[blog].tolist()) == {0, 1}
+    assert (url_index[states == 0] == 0).all()
+    assert (dwell[states == 0] == 2).all()
+    assert dwell[blog].min() >= 1 and dwell[blog].max() <= 3
+    assert (dwell[states == 2] == 0).all()  # No dwell given: constant 0
+    assert (dwell[states == EXIT] == 0).all()
+
+
+def test_journeys_are_bounded_and_well_formed():
+    scenario = Scenario.compile(SPEC)
+    journeys = scenario.journeys(np.random.default_rng(9), batch_size=64)
+    for _ in range(500):
+        steps = next(journeys)
+        assert 1 <= len(steps) <= scenario.max_steps
+        assert steps[0].state == 'home' and steps[0].url == 'https://site.test/'
+        for step in steps:
+            assert step.url in scenario.urls[scenario.states.index(step.state)]
+        assert all(step.category == 'articles' for step in steps if step.state == 'blog')
+
+
+def test_compile_rejects_unknown_states():
+    with pytest.raises(ValueError):
+        Scenario.compile({**SPEC, 'start': 'missing'})
+    with pytest.raises(ValueError):
+        Scenario.compile({**SPEC, 'transitions': {'home': {'missing': 1.0}}})
+
+
+def test_bundled_scenario_loads():
+    scenario = Scenario.load('scenarios/exponentiel.toml')
+    assert next(scenario.journeys(np.random.default_rng(10)))
@@ -0,0 +1,85 @@
+# test_scheduler.py
+
+import asyncio
+import random
+import pytest
+from scheduler import ArrivalScheduler, ConstantRate, PoissonRate, PiecewiseRate
+from virtual_clock import VirtualClock
+
+
+def test_poisson_intervals_have_mean_one_over_rate():
+    rng = random.Random(3)
+    profile = PoissonRate(4.0)
+    gaps = [profile.next_interval(0.0, rng) for _ in range(20000)]
+    assert sum(gaps) / len(gaps) == pytest.approx(0.25, rel=0.03)
+    assert min(gaps) >= 0
+
+
+def test_piecewise_rate_follows_segments():
+    profile = PiecewiseRate([(10, 1.0), (10, 5.0)], poisson=False)
+    assert profile.rate_at(0) == 1.0
+    assert profile.rate_at(15) == 5.0
+    assert profile.rate_at(1000) == 5.0  # Last segment repeats forever
+    assert profile.next_interval(0, random.Random()) == 1.0
+    assert profile.next_interval(12, random.Random()) == 0.2
+
+
+def test_piecewise_rate_skips_idle_segments():
+    profile = PiecewiseRate([(10, 0.0), (10, 2.0)], poisson=False)
+    assert profile.next_interval(3, random.Random()) == pytest.approx(7.5)
+    with pytest.raises(ValueError):
+        PiecewiseRate([(10, 1.0), (10, 0.0)]).next_interval(15, random.Random())
+
+
+def test_piecewise_poisson_arrival_counts_per_segment():
+    profile = PiecewiseRate([(100, 2.0), (100, 10.0)])
+    rng = random.Random(4)
+    t, counts = 0.0, [0, 0]
+    while t < 200:
+        counts[int(t // 100)] += 1
+        t += profile.next_interval(t, rng)
+    assert counts[0] == pytest.approx(200, rel=0.15)
+    assert counts[1] == pytest.approx(1000, rel=0.1)
+
+
+def run_scheduler(scheduler, session_time=0.0):
+    started, active, peak = [], [0], [0]
+
+    async def spawn(user_number):
+        started.append(user_number)
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(session_time)
+        active[0] -= 1
+
+    asyncio.run(scheduler.run(spawn))
+    return started, peak[0]
+
+
+def test_scheduler_timeline_on_zero_dwell_clock():
+    # Arrivals are at virtual 0, 0.25, 0.5 and 0.75 s; scale 0 starts them all at once
+    scheduler = ArrivalScheduler(ConstantRate(4.0), duration=1.0, clock=VirtualClock(0))
+    started, _ = run_scheduler(scheduler)
+    assert started == [1, 2, 3, 4]
+    assert scheduler.last_scheduled == scheduler.start_time
+    assert scheduler.requested_rate() is None
+    assert 'requested n/a' in scheduler.report()
+
+
+def test_scheduler_total_users_and_concurrency_cap():
+    scheduler = ArrivalScheduler(PoissonRate(1000.0), total_users=12, max_concurrency=3, seed=5,
+                                 clock=VirtualClock(0))
+    started, peak = run_scheduler(scheduler, session_time=0.01)
+    assert started == list(range(1, 13))
+    assert peak == 3
+    assert scheduler.stats()['arrivals'] == 12
+    assert scheduler.stats()['max_slot_wait'] > 0
+
+
+def test_scheduler_scales_the_timeline():
+    # 5 arrivals 1 virtual second apart, run 100x compressed: 40 ms of wall time
+    clock = VirtualClock(0.01)
+    scheduler = ArrivalScheduler(ConstantRate(1.0), total_users=5, clock=clock)
+    run_scheduler(scheduler)
+    assert scheduler.last_scheduled - scheduler.start_time == pytest.approx(0.04)
+    assert scheduler.requested_rate() == pytest.approx(100.0)
@@ -0,0 +1,19 @@
+# test_sharding.py
+
+from sharding import split_evenly
+
+
+def test_split_evenly_gives_extras_to_first_shards():
+    assert split_evenly(10, 3) == [4, 3, 3]
+    assert split_evenly(9, 3) == [3, 3, 3]
+    assert split_evenly(2, 4) == [1, 1, 0, 0]
+    assert split_evenly(0, 2) == [0, 0]
+
+
+def test_split_evenly_preserves_total():
+    for total in range(50):
+        for shards in range(1, 9):
+            shares = split_evenly(total, shards)
+            assert len(shares) == shards
+            assert sum(shares) == total
+            assert max(shares) - min(shares) <= 1
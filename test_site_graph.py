@@ -0,0 +1,76 @@
+# test_site_graph.py
+
+import asyncio
+import numpy as np
+from aiohttp import web
+import site_graph
+from site_graph import SiteGraph, crawl, normalize, write_graph
+
+PAGES = {
+    'https://site.test/': ['https://site.test/a', 'https://site.test/b', 'https://elsewhere.test/'],
+    'https://site.test/a': ['https://site.test/', 'https://site.test/a', 'https://site.test/é'],
+    'https://site.test/b': [],
+    'https://site.test/é': ['https://site.test/a', 'https://site.test/a'],
+}
+
+
+def test_write_read_round_trip(tmp_path):
+    path = str(tmp_path / 'site.graph')
+    nodes, edges = write_graph(PAGES, path)
+    graph = SiteGraph(path)
+    assert (graph.nodes, graph.edges) == (nodes, edges) == (4, 5)
+    assert [graph.url(node) for node in range(graph.nodes)] == sorted(PAGES)
+    for url, links in PAGES.items():
+        node = graph.index(url)
+        expected = {link for link in links if link in PAGES and link != url}  # Uncrawled and self links dropped
+        assert {graph.url(target) for target in graph.links(node)} == expected
+    assert graph.index('https://site.test/missing') is None
+    assert graph.next_url('https://site.test/b', np.random.default_rng(1)) is None
+    walk = graph.walk('https://site.test/', 5, np.random.default_rng(2))
+    assert walk[0] == 'https://site.test/' and all(url in PAGES for url in walk)
+    assert isinstance(graph.indices, np.memmap)
+
+
+def test_empty_graph_round_trip(tmp_path):
+    path = str(tmp_path / 'empty.graph')
+    write_graph({}, path)
+    graph = SiteGraph(path)
+    assert (graph.nodes, graph.edges) == (0, 0)
+    assert graph.index('https://site.test/') is None
+
+
+def test_normalize_skips_malformed_and_other_schemes():
+    assert normalize('https://site.test/a/', '../b#top') == 'https://site.test/b'
+    assert normalize('https://site.test/', 'mailto:someone@site.test') is None
+    assert normalize('https://site.test/', 'http://[::1') is None
+
+
+def test_crawl_survives_unexpected_errors(monkeypatch):
+    async def page(request):
+        links = {'/': ['/b', '/a', '/c', 'http://[::1'], '/a': ['/'], '/b': [], '/c': []}[request.path]
+        body = ''.join(f'<a href="{link}">x</a>' for link in links) + ('boom' if request.path == '/b' else '')
+        return web.Response(text=body, content_type='text/html')
+
+    feed = site_graph.LinkParser.feed
+
+    def failing_feed(self, html):
+        if 'boom' in html:
+            raise RuntimeError("parser bug")
+        feed(self, html)
+    monkeypatch.setattr(site_graph.LinkParser, 'feed', failing_feed)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{path:.*}', page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        server = web.TCPSite(runner, '127.0.0.1', 0)
+        await server.start()
+        port = runner.addresses[0][1]
+        try:
+            return await asyncio.wait_for(crawl([f'http://127.0.0.1:{port}/'], concurrency=1), timeout=10)
+        finally:
+            await runner.cleanup()
+
+    pages = asyncio.run(run())  # One worker, so the pages queued after /b prove it survived
+    assert sorted(url.rsplit('/', 1)[1] for url in pages) == ['', 'a', 'c']
@@ -0,0 +1,32 @@
+# test_worker_pool.py
+
+import asyncio
+from worker_pool import WorkerPool
+
+
+def test_pool_runs_every_job_and_reports_busy_slots_over_time():
+    pool = WorkerPool(3, sample_interval=0.02)
+    running, peak = [0], [0]
+
+    async def handler(job):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.03)
+        running[0] -= 1
+        if job == 4:
+            raise RuntimeError("bad job")
+
+    asyncio.run(pool.run(range(9), handler))
+    assert (pool.completed, pool.failed, peak[0]) == (8, 1, 3)
+    assert 0.8 < pool.utilization() <= 1.0
+    timeline = pool.timeline()
+    assert timeline[0][0] < 0.01 and all(0 <= busy <= 3 for _, busy in timeline)
+    assert 'Busy slots over time: 0s:' in pool.report()
+
+
+def test_timeline_is_thinned():
+    pool = WorkerPool(2)
+    pool.samples.extend((second, 1) for second in range(100))
+    timeline = pool.timeline(points=10)
+    assert len(timeline) == 10
+    assert timeline[:2] == [(0, 1), (10, 1)]
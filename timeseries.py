@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+from collections import deque
+import numpy as np
+from metrics import LatencyHistogram
+
+# (seconds per point, points kept): 1 s points for 10 minutes, 10 s for 2 hours, 1 min for a day.
+# Every tier is a fixed-size ring, so memory stays flat however long the run lasts.
+DEFAULT_TIERS = [(1, 600), (10, 720), (60, 1440)]
+
+# Latency is kept at a quarter of LatencyHistogram's resolution (buckets ~22% wide): plenty for a
+# dashboard, and one point of one category is a single small int32 array
+BUCKET_GROUP = 4
+FINE_STARTS = np.arange(0, LatencyHistogram.BUCKETS, BUCKET_GROUP)
+BUCKET_VALUES = np.array([LatencyHistogram.MIN_VALUE * LatencyHistogram.GROWTH ** (start + BUCKET_GROUP / 2 - 0.5)
+                          for start in FINE_STARTS])
+REQUESTS, ERRORS, COUNTS = 0, 1, 2  # Layout of a category row: [requests, errors, latency buckets...]
+
+
+def category_row(metrics):
+    # Cumulative row of one CategoryMetrics
+    row = np.zeros(COUNTS + len(FINE_STARTS), dtype=np.int64)
+    row[REQUESTS] = metrics.requests
+    row[ERRORS] = metrics.errors
+    row[COUNTS:] = np.add.reduceat(np.asarray(metrics.total_time.counts, dtype=np.int64), FINE_STARTS)
+    return row
+
+
+def percentile(counts, p):
+    total = counts.sum()
+    if not total:
+        return 0.0
+    index = np.searchsorted(np.cumsum(counts), max(1, np.ceil(total * p / 100)))
+    return float(BUCKET_VALUES[min(index, len(BUCKET_VALUES) - 1)])
+
+
+# One time bucket: mean active sessions plus per-category request, error and latency counts
+class Point:
+    __slots__ = ('start', 'duration', 'active', 'categories')
+
+    def __init__(self, start, duration, active, categories):
+        self.start = start
+        self.duration = duration
+        self.active = active
+        self.categories = categories  # {category: row}
+
+    @classmethod
+    def merged(cls, points):
+        duration = sum(point.duration for point in points)
+        active = sum(point.active * point.duration for point in points) / duration if duration else 0.0
+        categories = {}
+        for point in points:
+            for name, row in point.categories.items():
+                if name in categories:
+                    categories[name] = categories[name] + row
+                else:
+                    categories[name] = row
+        return cls(points[0].start, duration, active, categories)
+
+    def total(self):
+        rows = list(self.categories.values())
+        return np.sum(rows, axis=0) if rows else np.zeros(COUNTS + len(FINE_STARTS), dtype=np.int32)
+
+
+def describe(row, duration):
+    requests = int(row[REQUESTS])
+    return {'requests_per_s': requests / duration if duration else 0.0,
+            'error_rate': int(row[ERRORS]) / requests if requests else 0.0,
+            'p50': percentile(row[COUNTS:], 50), 'p99': percentile(row[COUNTS:], 99)}
+
+
+# Rolling in-process metrics store. track() samples a PageMetrics every `resolution` seconds and
+# keeps the difference as a point; once a tier's new points span one step of the next, coarser
+# tier they are merged into a point there. Written by the simulation thread, read by the dashboard.
+class TimeSeriesStore:
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = tiers
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.points = [deque(maxlen=size) for _, size in self.tiers]
+            self.pending = [[] for _ in self.tiers]
+            self.start_time = time.monotonic()
+            self._previous = {}
+            self._last_sample = self.start_time
+
+    def sample(self, metrics, active):
+        now = time.monotonic()
+        categories = {}
+        current = {}
+        for name, category in list(metrics.categories.items()):
+            row = category_row(category)
+            current[name] = row
+            previous = self._previous.get(name)
+            delta = row - previous if previous is not None else row
+            if delta[REQUESTS]:
+                categories[name] = delta.astype(np.int32)  # Per-point counts are small: half the memory
+        point = Point(self._last_sample - self.start_time, now - self._last_sample, active, categories)
+        with self.lock:
+            self._previous = current
+            self._last_sample = now
+            self._append(0, point)
+
+    def _append(self, tier, point):
+        self.points[tier].append(point)
+        if tier + 1 == len(self.tiers):
+            return
+        pending = self.pending[tier]
+        pending.append(point)
+        if len(pending) * self.tiers[tier][0] >= self.tiers[tier + 1][0]:
+            self.pending[tier] = []
+            self._append(tier + 1, Point.merged(pending))
+
+    async def track(self, metrics, active, resolution=None):
+        """Background task: sample metrics (and active(), the running sessions) until cancelled."""
+        resolution = resolution or self.tiers[0][0]
+        while True:
+            await asyncio.sleep(resolution)
+            self.sample(metrics, active())
+
+    def window(self, seconds):
+        """Points of the last `seconds`, from the finest tier that reaches back that far."""
+        with self.lock:
+            cutoff = self._last_sample - self.start_time - seconds
+            for points in self.points:
+                # A tier that never wrapped still holds the whole run
+                if len(points) < points.maxlen or points[0].start <= cutoff or points is self.points[-1]:
+                    return [point for point in points if point.start >= cutoff]
+
+    def series(self, seconds):
+        """Rows of time, active, requests_per_s, error_rate, p50 and p99 (all categories)."""
+        return [{'time': point.start, 'active': point.active, **describe(point.total(), point.duration)}
+                for point in self.window(seconds)]
+
+    def latency_series(self, seconds, p=99):
+        """Rows of time plus the p-th percentile latency of each category active in that point."""
+        return [{'time': point.start, **{name: percentile(row[COUNTS:], p) for name, row in point.categories.items()}}
+                for point in self.window(seconds)]
+
+    def summary(self, seconds):
+        """Totals and per-category figures merged over the last `seconds`."""
+        points = self.window(seconds)
+        if not points:
+            return {'active': 0, 'requests_per_s': 0.0, 'error_rate': 0.0, 'p50': 0.0, 'p99': 0.0, 'categories': {}}
+        merged = Point.merged(points)
+        return {'active': points[-1].active, **describe(merged.total(), merged.duration),
+                'categories': {name: describe(row, merged.duration) for name, row in sorted(merged.categories.items())}}
+
+    def memory_bytes(self):
+        with self.lock:
+            return sum(row.nbytes for points in self.points for point in points for row in point.categories.values())
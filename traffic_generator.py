@@ -7,6 +7,11 @@ import socket
 import random
 import time
 import requests
+from worker_pool import WorkerPool
+from links import LinkCache, link_selector
+
+# Links found on each page, shared by all users for 5 minutes
+link_cache = LinkCache(ttl=300)
 
 async def get_ip():
     try:
@@ -39,57 +44,61 @@ def set_tor_proxy():
     except Exception as e:
         print(f"Error setting up Tor proxy: {e}")
 
-async def simulate_user(urls, user_number, semaphore):
-    async with semaphore:
-        print(f"\n--- Starting simulation for User {user_number} ---")
-        await renew_tor_ip()
-        set_tor_proxy()
-        print("Waiting for IP change to take effect...")
-        await asyncio.sleep(5)
+async def simulate_user(urls, user_number):
+    print(f"\n--- Starting simulation for User {user_number} ---")
+    await renew_tor_ip()
+    set_tor_proxy()
+    print("Waiting for IP change to take effect...")
+    await asyncio.sleep(5)
 
-        ip = await get_ip()
-        print(f"User {user_number} - Current IP: {ip}")
+    ip = await get_ip()
+    print(f"User {user_number} - Current IP: {ip}")
 
-        try:
-            async with async_playwright() as p:
-                browser = await p.firefox.launch(proxy={'server': 'socks5://127.0.0.1:9050'})
-                page = await browser.new_page()
-                
-                for url in urls:
-                    try:
-                        print(f"User {user_number} - Visiting: {url}")
-                        await page.goto(url, timeout=60000)  # Increased timeout to 60 seconds
-                        print(f"User {user_number} - Successfully loaded: {url}")
-                        
-                        # Simulate scrolling
-                        scroll_count = random.randint(1, 5)
-                        print(f"User {user_number} - Simulating {scroll_count} scrolls")
-                        for _ in range(scroll_count):
-                            await page.mouse.wheel(0, random.randint(100, 500))
-                            await asyncio.sleep(random.uniform(1, 3))
-                        
-                        # Simulate reading time
-                        read_time = random.uniform(5, 15)
-                        print(f"User {user_number} - Simulating reading for {read_time:.2f} seconds")
-                        await asyncio.sleep(read_time)
-                        
-                        # Optionally click on links
-                        links = await page.query_selector_all('a')
-                        if links:
-                            link = random.choice(links)
-                            print(f"User {user_number} - Clicking a random link on {url}")
-                            await link.click()
-                            await asyncio.sleep(random.uniform(5, 10))
-                    except Exception as e:
-                        print(f"User {user_number} - Error visiting {url}: {e}")
-                
-                await browser.close()
-        except PlaywrightError as e:
-            print(f"User {user_number} - Playwright error: {e}")
-        except Exception as e:
-            print(f"User {user_number} - Error in user simulation: {e}")
+    try:
+        async with async_playwright() as p:
+            browser = await p.firefox.launch(proxy={'server': 'socks5://127.0.0.1:9050'})
+            page = await browser.new_page()
+            
+            for url in urls:
+                try:
+                    print(f"User {user_number} - Visiting: {url}")
+                    await page.goto(url, timeout=60000)  # Increased timeout to 60 seconds
+                    print(f"User {user_number} - Successfully loaded: {url}")
+                    
+                    # Simulate scrolling
+                    scroll_count = random.randint(1, 5)
+                    print(f"User {user_number} - Simulating {scroll_count} scrolls")
+                    for _ in range(scroll_count):
+                        await page.mouse.wheel(0, random.randint(100, 500))
+                        await asyncio.sleep(random.uniform(1, 3))
+                    
+                    # Simulate reading time
+                    read_time = random.uniform(5, 15)
+                    print(f"User {user_number} - Simulating reading for {read_time:.2f} seconds")
+                    await asyncio.sleep(read_time)
+                    
+                    # Optionally click on links
+                    page_url = page.url  # A failed click may already have navigated away
+                    links = await link_cache.links(page)
+                    if links:
+                        href, _ = random.choice(links)
+                        print(f"User {user_number} - Clicking a random link on {url}")
+                        try:
+                            await page.locator(link_selector(href)).first.click()
+                        except PlaywrightError:
+                            link_cache.invalidate(page_url)  # Stale cached link
+                            raise
+                        await asyncio.sleep(random.uniform(5, 10))
+                except Exception as e:
+                    print(f"User {user_number} - Error visiting {url}: {e}")
+            
+            await browser.close()
+    except PlaywrightError as e:
+        print(f"User {user_number} - Playwright error: {e}")
+    except Exception as e:
+        print(f"User {user_number} - Error in user simulation: {e}")
 
-        print(f"--- Finished simulation for User {user_number} ---\n")
+    print(f"--- Finished simulation for User {user_number} ---\n")
 
 async def main():
     print("Starting main simulation...")
@@ -103,24 +112,17 @@ async def main():
     ]
     total_users = 10  # Reduced for testing
     concurrent_users = 2  # Reduced concurrent users
-    batches = total_users // concurrent_users
-    semaphore = asyncio.Semaphore(concurrent_users)
 
-    print(f"Simulating {total_users} users in batches of {concurrent_users}")
+    print(f"Simulating {total_users} users with {concurrent_users} concurrent workers")
 
-    for batch in range(batches):
-        tasks = []
-        for i in range(concurrent_users):
-            user_number = batch * concurrent_users + i + 1
-            selected_urls = random.sample(urls, k=random.randint(1, len(urls)))
-            task = asyncio.create_task(simulate_user(selected_urls, user_number, semaphore))
-            tasks.append(task)
-        
-        await asyncio.gather(*tasks)
-        print(f"Completed batch {batch + 1} of {batches}")
-        
-        # Add a delay between batches
-        await asyncio.sleep(10)
+    # Each worker starts the next user as soon as its current one finishes
+    pool = WorkerPool(concurrent_users)
+    await pool.run(
+        range(1, total_users + 1),
+        lambda user_number: simulate_user(random.sample(urls, k=random.randint(1, len(urls))), user_number)
+    )
+    print(pool.report())
+    print(link_cache.report())
 
     print("Simulation completed.")
 
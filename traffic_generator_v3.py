@@ -1,14 +1,21 @@
 import asyncio
-from playwright.async_api import async_playwright, Error as PlaywrightError
+from playwright.async_api import Error as PlaywrightError
 import random
 import time
 import logging
-from datetime import datetime, timedelta
 import requests
 import socket
 import sys
 from stem import Signal
 from stem.control import Controller
+from browser_pool import BrowserPool, user_context
+from metrics import SessionStats, PageMetrics, LoopLagMonitor, record_navigation
+from log_pipeline import configure_logging, log_pipeline_report
+from scheduler import ArrivalScheduler, make_rate_profile
+from virtual_clock import VirtualClock
+from scenario import Scenario
+from fidelity import ResourceStats, apply_fidelity, wait_until
+from links import LinkCache, link_selector
 
 async def check_ip(page):
     await page.goto("https://check.torproject.org/")
@@ -19,10 +26,8 @@ async def check_ip(page):
         logging.warning("Tor is NOT working")
 
 
-# Configure logging
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[logging.StreamHandler(sys.stdout), logging.FileHandler('simulation.log')])
+# Configure logging (bounded queue + background writer thread, off the event loop)
+log_handler = configure_logging('simulation.log', console_stream=sys.stdout)
 
 # User agents
 USER_AGENTS = [
@@ -31,29 +36,45 @@ USER_AGENTS = [
     "Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1"
 ]
 
-# Pages to visit
-INSIGHT_PAGES = [
-    "https://www.exponentiel.ai/insights/what-is-generative-ai-everything-you-need-to-know",
-    "https://www.exponentiel.ai/insights/openai-01-model-a-leap-into-the-future-of-ai-reasoning",
-    "https://www.exponentiel.ai/insights/how-does-generative-ai-works"
-]
+# Pages, visit order and reading times come from the scenario file, compiled once at startup
+SCENARIO_FILE = 'scenarios/exponentiel.toml'
+scenario = Scenario.load(SCENARIO_FILE)
 
-SERVICE_PAGES = [
-    "https://www.exponentiel.ai/service/generative-ai-consulting",
-    "https://www.exponentiel.ai/service/autonomous-ai-agents",
-    "https://www.exponentiel.ai/service/ai-software-development"
-]
+# Browsers go through Tor; set PROXY_SERVER = None and CHECK_TOR_IP = False to hit a target directly
+PROXY_SERVER = 'socks5://localhost:9050'
+CHECK_TOR_IP = True
 
-LINKEDIN_REFERRERS = [
-    "https://www.linkedin.com/",
-    "https://www.linkedin.com/feed/",
-    "https://www.linkedin.com/in/",
-    "https://www.linkedin.com/company/exponentiel-ai/"
-]
+# Browser pool: browsers launched once per run and shared by all users (False = one browser per user)
+USE_BROWSER_POOL = True
+BROWSER_POOL_SIZE = 2
+
+# Navigation timings for the whole run, keyed by page category
+page_metrics = PageMetrics()
+
+# Resource loading: 'full', 'no-media', 'document-plus-scripts' or 'document-only'
+FIDELITY = 'full'
+resource_stats = ResourceStats(FIDELITY)
+
+# Links found on each page, reused by every user revisiting it within LINK_CACHE_TTL seconds
+LINK_CACHE_TTL = 300
+link_cache = LinkCache(ttl=LINK_CACHE_TTL)
+
+# Time scale for think/dwell/scroll/mouse and inter-arrival delays:
+# 1.0 = real time, 0.01 = 100x compressed, 0 = zero-dwell throughput mode
+TIME_SCALE = 1.0
+clock = VirtualClock(TIME_SCALE)
+
+# User arrivals: 'constant', 'poisson' or 'piecewise' (list of (seconds, users/second) segments)
+ARRIVAL_PROCESS = 'poisson'
+ARRIVAL_RATE = 1 / 20  # users per second (one every 20 s on average)
+ARRIVAL_SEGMENTS = [(6 * 3600, 1 / 60), (12 * 3600, 1 / 20), (6 * 3600, 1 / 60)]
 
 def log_and_print(message):
     logging.info(message)
 
+def launch_options():
+    return {'proxy': {'server': PROXY_SERVER}} if PROXY_SERVER else {}
+
 def get_residential_proxy():
     # Dummy proxy function, not in use since we're using Tor
     return f"http://{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}:8080"
@@ -74,10 +95,12 @@ async def get_tor_ip(page):
         return 'Unknown'
 
 
-def get_dns():
+# Resolved through the loop's resolver (executor-backed), so other sessions keep running meanwhile
+async def get_dns():
     try:
-        return socket.gethostbyname('resolver1.opendns.com')
-    except:
+        addresses = await asyncio.get_running_loop().getaddrinfo('resolver1.opendns.com', None, family=socket.AF_INET)
+        return addresses[0][4][0]
+    except (OSError, IndexError):
         return 'Unknown'
 
 async def simulate_mouse_movement(page):
@@ -85,12 +108,19 @@ async def simulate_mouse_movement(page):
     log_and_print(f"Simulating {movements} mouse movements")
     for _ in range(movements):
         await page.mouse.move(random.randint(100, 800), random.randint(100, 800))
-        await asyncio.sleep(random.uniform(0.5, 2.0))
+        await clock.sleep(random.uniform(0.5, 2.0))
 
-async def visit_page(page, url, user_number, is_insight=False):
+async def visit_page(page, url, user_number, read_time, category='other', metrics=None):
+    metrics = metrics or page_metrics
     log_and_print(f"User {user_number} - Visiting: {url}")
     try:
-        await page.goto(url, wait_until="networkidle", timeout=120000)
+        start = time.perf_counter()
+        try:
+            response = await page.goto(url, wait_until=wait_until(FIDELITY), timeout=120000)
+        except PlaywrightError:
+            metrics.record_error(category)
+            raise
+        await record_navigation(metrics, page, category, response, time.perf_counter() - start)
         log_and_print(f"User {user_number} - Successfully loaded: {url}")
         
         await simulate_mouse_movement(page)
@@ -99,16 +129,10 @@ async def visit_page(page, url, user_number, is_insight=False):
         log_and_print(f"User {user_number} - Scrolling {scroll_count} times")
         for _ in range(scroll_count):
             await page.evaluate("window.scrollBy(0, {})".format(random.randint(100, 500)))
-            await asyncio.sleep(random.uniform(2, 5))
-
-        # Set read_time between 5 and 10 minutes for insight pages, else a shorter duration for non-insight pages
-        if is_insight:
-            read_time = random.uniform(5 * 60, 10 * 60)  # 5 to 10 minutes in seconds
-        else:
-            read_time = random.uniform(15, 30)  # For non-insight pages
+            await clock.sleep(random.uniform(2, 5))
 
         log_and_print(f"User {user_number} - Reading for {read_time / 60:.2f} minutes")
-        await asyncio.sleep(read_time)  # Simulate reading time
+        await clock.sleep(read_time)  # Simulate reading time
 
     except PlaywrightError as e:
         log_and_print(f"User {user_number} - Error loading page: {e}")
@@ -116,16 +140,17 @@ async def visit_page(page, url, user_number, is_insight=False):
 
     # If 70% chance to click a link
     if random.random() < 0.7:
-        links = await page.query_selector_all('a')
-        if links:
-            link = random.choice(links)
-            href = await link.get_attribute('href')
-            log_and_print(f"User {user_number} - Clicking link: {href}")
-            try:
-                await link.click(timeout=30000)
-                await asyncio.sleep(random.uniform(5, 10))
-            except PlaywrightError as e:
-                log_and_print(f"User {user_number} - Error clicking link: {e}")
+        page_url = page.url
+        try:
+            links = await link_cache.links(page)
+            if links:
+                href, _ = random.choice(links)
+                log_and_print(f"User {user_number} - Clicking link: {href}")
+                await page.locator(link_selector(href)).first.click(timeout=30000)
+                await clock.sleep(random.uniform(5, 10))
+        except PlaywrightError as e:
+            link_cache.invalidate(page_url)  # The cached link may no longer be on the page
+            log_and_print(f"User {user_number} - Error clicking link: {e}")
 
 
 def change_tor_circuit():
@@ -137,76 +162,88 @@ def change_tor_circuit():
     except Exception as e:
         log_and_print(f"Error renewing Tor circuit: {e}")
 
-async def simulate_user(user_number, semaphore):
-    async with semaphore:
-        log_and_print(f"\n--- User {user_number} Session Started ---")
-        user_agent = random.choice(USER_AGENTS)
-        linkedin_referrer = random.choice(LINKEDIN_REFERRERS)
+async def simulate_user(user_number, journey, pool=None, stats=None, metrics=None, category_suffix=''):
+    log_and_print(f"\n--- User {user_number} Session Started ---")
+    if stats:
+        stats.session_started()
+    user_agent = random.choice(USER_AGENTS)
+    ok = True
 
-        try:
-            async with async_playwright() as p:
-                # Close previous browser instance and open a new one
-                browser = await p.firefox.launch(proxy={'server': 'socks5://localhost:9050'})
-                context = await browser.new_context(
-                    user_agent=user_agent,
-                    viewport={'width': random.randint(1024, 1920), 'height': random.randint(768, 1080)}
-                )
-                page = await context.new_page()
-
-                # Get Tor IP
+    try:
+        # Isolated context from the shared browser pool (or a dedicated browser when pool is None)
+        async with user_context(
+            pool,
+            launch_options=launch_options(),
+            user_agent=user_agent,
+            viewport={'width': random.randint(1024, 1920), 'height': random.randint(768, 1080)}
+        ) as context:
+            await apply_fidelity(context, FIDELITY, resource_stats)
+            page = await context.new_page()
+
+            # Get Tor IP
+            if CHECK_TOR_IP:
                 tor_ip = await get_tor_ip(page)
                 log_and_print(f"User {user_number} - IP: {tor_ip}")
 
-                await page.set_extra_http_headers({"Referer": linkedin_referrer})
-                
+            if journey and journey[0].category == 'referrer':
+                await page.set_extra_http_headers({"Referer": journey[0].url})
                 log_and_print(f"User {user_number} - Simulating LinkedIn browsing")
-                await visit_page(page, linkedin_referrer, user_number)
-                
-                pages_to_visit = random.randint(2, 3)
-                visited_insights = random.sample(INSIGHT_PAGES, k=min(pages_to_visit-1, len(INSIGHT_PAGES)))
-                
-                for url in visited_insights:
-                    await visit_page(page, url, user_number, is_insight=True)
-                
-                service_page = random.choice(SERVICE_PAGES)
-                await visit_page(page, service_page, user_number)
-
-                await browser.close()
-                
-        except PlaywrightError as e:
-            log_and_print(f"User {user_number} - Playwright error: {e}")
-        except Exception as e:
-            log_and_print(f"User {user_number} - Simulation error: {e}")
 
-        log_and_print(f"--- User {user_number} Session Finished ---\n")
+            # Follow the pre-sampled journey from the scenario
+            for step in journey:
+                await visit_page(page, step.url, user_number, step.dwell, category=step.category + category_suffix,
+                                 metrics=metrics)
+            
+    except PlaywrightError as e:
+        ok = False
+        log_and_print(f"User {user_number} - Playwright error: {e}")
+    except Exception as e:
+        ok = False
+        log_and_print(f"User {user_number} - Simulation error: {e}")
+
+    if stats:
+        stats.session_finished(ok)
+    log_and_print(f"--- User {user_number} Session Finished ---\n")
 
 
 async def main():
     log_and_print("Starting main simulation...")
     total_users = 1000
     concurrent_users = 3
-    semaphore = asyncio.Semaphore(concurrent_users)
 
     log_and_print(f"Simulating {total_users} users with max concurrency of {concurrent_users}")
 
-    start_time = datetime.now()
-    end_time = start_time + timedelta(hours=24)  # Simulate for 24 hours
-
-    tasks = []
-    for user_number in range(1, total_users + 1):
-        task = asyncio.create_task(simulate_user(user_number, semaphore))
-        tasks.append(task)
+    pool = None
+    if USE_BROWSER_POOL:
+        pool = await BrowserPool(BROWSER_POOL_SIZE, 'firefox', **launch_options()).start()
+    stats = SessionStats('browser pool' if pool else 'browser per user')
+    memory_task = asyncio.create_task(stats.track_memory())
+    lag_monitor = LoopLagMonitor().start()
 
-        delay = random.uniform(10, 30)
-        log_and_print(f"Waiting {delay:.2f} seconds before starting next session")
-        await asyncio.sleep(delay)
+    # Sessions are created lazily at each arrival; the run stops after 24 hours of arrivals
+    profile = make_rate_profile(ARRIVAL_PROCESS, ARRIVAL_RATE, ARRIVAL_SEGMENTS)
+    scheduler = ArrivalScheduler(profile, total_users=total_users, duration=24 * 3600,
+                                 max_concurrency=concurrent_users, clock=clock)
 
-        if datetime.now() >= end_time:
-            log_and_print("Reached end of simulation period")
-            break
-
-    await asyncio.gather(*tasks)
+    try:
+        journeys = scenario.journeys()  # Sampled for the population in batches
+        await scheduler.run(lambda user_number: simulate_user(user_number, next(journeys), pool, stats))
+    finally:
+        memory_task.cancel()
+        lag_monitor.stop()
+        if pool:
+            await pool.close()
+        stats.stop()
+        log_and_print(scheduler.report())
+        log_and_print(stats.report())
+        log_and_print(page_metrics.report())
+        if FIDELITY != 'full':
+            log_and_print(resource_stats.report())
+        log_and_print(link_cache.report())
+        log_and_print(clock.report())
+        log_and_print(lag_monitor.report())
     log_and_print("Simulation completed.")
+    log_and_print(log_pipeline_report(log_handler))
 
 if __name__ == "__main__":
     log_and_print("Script started.")
@@ -4,22 +4,30 @@ import time
 import threading
 import logging
 import random
-from datetime import datetime, timedelta
-from playwright.async_api import async_playwright, Error as PlaywrightError
+from playwright.async_api import Error as PlaywrightError
 from stem import Signal
 from stem.control import Controller
+from browser_pool import BrowserPool, user_context
+from metrics import SessionStats, PageMetrics, record_navigation
+from timeseries import TimeSeriesStore
+from log_pipeline import configure_logging, log_pipeline_report
+from log_tail import LogTailer
+from scenario import Scenario
+from virtual_clock import VirtualClock
+from retry import RetryPolicy, CircuitOpenError
+from adaptive import ResizableLimiter
+from control import RunControl, ControlServer, send_command, DEFAULT_SOCKET
 
 # Log file configuration
 log_file_path = 'simulation.log'
 
-# Set up logging configuration
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[logging.StreamHandler(), logging.FileHandler(log_file_path)])
+# Set up logging configuration (bounded queue + background writer thread, off the event loop)
+log_handler = configure_logging(log_file_path)
 
-# Global flag to control the simulation
-is_running = False
-semaphore = None  # Will be initialized later for limiting concurrent users
+# The run listens on this Unix socket; the buttons below (and `python control.py ...`) send it
+# pause / resume / drain / stop / concurrency N / rate FACTOR
+CONTROL_SOCKET = DEFAULT_SOCKET
+semaphore = None  # Will be initialized later for limiting concurrent users (resizable from the control socket)
 
 # User agents
 USER_AGENTS = [
@@ -28,101 +36,137 @@ USER_AGENTS = [
     "Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1"
 ]
 
-# Pages to visit
-INSIGHT_PAGES = [
-    "https://www.exponentiel.ai/insights/what-is-generative-ai-everything-you-need-to-know",
-    "https://www.exponentiel.ai/insights/openai-01-model-a-leap-into-the-future-of-ai-reasoning",
-    "https://www.exponentiel.ai/insights/how-does-generative-ai-works"
-]
+# Pages, visit order and dwell times come from the scenario file, compiled once at startup
+SCENARIO_FILE = 'scenarios/exponentiel.toml'
+scenario = Scenario.load(SCENARIO_FILE)
 
-SERVICE_PAGES = [
-    "https://www.exponentiel.ai/service/generative-ai-consulting",
-    "https://www.exponentiel.ai/service/autonomous-ai-agents",
-    "https://www.exponentiel.ai/service/ai-software-development"
-]
+# Time scale for dwell times and the delay between users: 1.0 = real time, 0.01 = 100x compressed, 0 = no delay
+TIME_SCALE = 1.0
+clock = VirtualClock(TIME_SCALE)
 
-LINKEDIN_REFERRERS = [
-    "https://www.linkedin.com/",
-    "https://www.linkedin.com/feed/",
-    "https://www.linkedin.com/in/",
-    "https://www.linkedin.com/company/exponentiel-ai/"
-]
+# Browser pool: browsers launched once per run and shared by all users (False = one browser per user)
+USE_BROWSER_POOL = True
+BROWSER_POOL_SIZE = 2
 
 def log_and_print(message):
     logging.info(message)
 
 # Function to simulate a user visiting pages using Playwright
-async def simulate_user(user_number, semaphore):
+async def simulate_user(user_number, semaphore, journey, retry_policy, pool=None, stats=None, metrics=None):
     async with semaphore:
         log_and_print(f"\n--- User {user_number} Session Started ---")
+        if stats:
+            stats.session_started()
         user_agent = random.choice(USER_AGENTS)
-        linkedin_referrer = random.choice(LINKEDIN_REFERRERS)
+        ok = True
 
         try:
-            async with async_playwright() as p:
-                browser = await p.firefox.launch(proxy={'server': 'socks5://localhost:9050'})
-                context = await browser.new_context(
-                    user_agent=user_agent,
-                    viewport={'width': random.randint(1024, 1920), 'height': random.randint(768, 1080)}
-                )
+            # Isolated context from the shared browser pool (or a dedicated browser when pool is None)
+            async with user_context(
+                pool,
+                launch_options={'proxy': {'server': 'socks5://localhost:9050'}},
+                user_agent=user_agent,
+                viewport={'width': random.randint(1024, 1920), 'height': random.randint(768, 1080)}
+            ) as context:
                 page = await context.new_page()
 
-                await page.goto(linkedin_referrer, timeout=60000)
-                log_and_print(f"User {user_number} - Visiting LinkedIn: {linkedin_referrer}")
-                await asyncio.sleep(random.uniform(2, 5))  # Simulate time spent on page
-
-                for _ in range(random.randint(2, 3)):
-                    service_page = random.choice(SERVICE_PAGES)
-                    log_and_print(f"User {user_number} - Visiting service page: {service_page}")
-
-                    retry_count = 0
-                    max_retries = 3
-
-                    while retry_count < max_retries:
-                        try:
-                            await page.goto(service_page, timeout=60000)
-                            log_and_print(f"User {user_number} - Successfully visited: {service_page}")
-                            break  # Exit the retry loop on success
-                        except PlaywrightError as e:
-                            retry_count += 1
-                            log_and_print(f"User {user_number} - Error visiting {service_page}: {e} (Retry {retry_count}/{max_retries})")
-                            await asyncio.sleep(2)  # Backoff before retrying
-                            if retry_count == max_retries:
-                                log_and_print(f"User {user_number} - Failed to visit {service_page} after {max_retries} retries")
-
-                    await asyncio.sleep(random.uniform(2, 5))  # Simulate time spent on page
-
-                await browser.close()
+                # Follow the pre-sampled journey from the scenario
+                for step in journey:
+                    log_and_print(f"User {user_number} - Visiting {step.state} page: {step.url}")
+
+                    try:
+                        started = time.monotonic()
+                        response = await retry_policy.call(step.url, lambda: page.goto(step.url, timeout=60000),
+                                                           label=f"User {user_number}")
+                        if metrics:
+                            await record_navigation(metrics, page, step.category, response, time.monotonic() - started)
+                        log_and_print(f"User {user_number} - Successfully visited: {step.url}")
+                    except CircuitOpenError as e:
+                        log_and_print(f"User {user_number} - Skipped {step.url}: {e}")
+                    except PlaywrightError as e:
+                        if metrics:
+                            metrics.record_error(step.category)
+                        log_and_print(f"User {user_number} - Failed to visit {step.url}: {e}")
+
+                    await clock.sleep(step.dwell)  # Simulate time spent on page
 
         except PlaywrightError as e:
+            ok = False
             log_and_print(f"User {user_number} - Playwright error: {e}")
 
+        if stats:
+            stats.session_finished(ok)
         log_and_print(f"--- User {user_number} Session Finished ---\n")
 
 
 # Main async function to simulate multiple users
-async def main_simulation(total_users=10, concurrent_users=3):
+async def main_simulation(total_users=10, concurrent_users=3, store=None):
     global semaphore
-    semaphore = asyncio.Semaphore(concurrent_users)
-    tasks = []
+    semaphore = ResizableLimiter(concurrent_users)
+    tasks = set()
+
+    pool = None
+    if USE_BROWSER_POOL:
+        pool = await BrowserPool(BROWSER_POOL_SIZE, 'firefox', proxy={'server': 'socks5://localhost:9050'}).start()
+    stats = SessionStats('browser pool' if pool else 'browser per user')
+    retry_policy = RetryPolicy()  # Backoff, retry budget and per-host breaker shared by all users
+    memory_task = asyncio.create_task(stats.track_memory())
+    metrics = PageMetrics()
+    store_task = None
+    if store:
+        # Feeds the dashboard: one point per second from the navigation metrics
+        store.reset()
+        store_task = asyncio.create_task(store.track(metrics, lambda: semaphore.active))
+    control = RunControl(status=lambda: {'started': stats.started, 'completed': stats.completed, 'failed': stats.failed})
+    control.attach(None, semaphore, tasks)
+    control_server = await ControlServer(control, CONTROL_SOCKET).start()
+
+    journeys = scenario.journeys()  # Sampled for the population in batches
+    try:
+        for user_number in range(1, total_users + 1):
+            if not await control.wait_running():
+                break  # Drained or stopped from the control socket
+            task = asyncio.create_task(simulate_user(user_number, semaphore, next(journeys), retry_policy, pool, stats,
+                                                     metrics))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            # Random delay between starting users, on the virtual clock like the dwell times
+            await control.sleep(clock.scale(random.uniform(1, 3)) / control.rate_factor)
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await control_server.close()
+        memory_task.cancel()
+        if store_task:
+            store_task.cancel()
+        if pool:
+            await pool.close()
+        stats.stop()
+        if control.draining:
+            log_and_print(f"Simulation {control.state()} before all users started, "
+                          f"{control.cancelled} sessions cancelled")
+        log_and_print(stats.report())
+        log_and_print(retry_policy.report())
+        log_and_print(metrics.report())
+        log_and_print(log_pipeline_report(log_handler))
 
-    for user_number in range(1, total_users + 1):
-        task = asyncio.create_task(simulate_user(user_number, semaphore))
-        tasks.append(task)
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between starting users
+# Function to start the simulation in a background thread
+def start_simulation(total_users, concurrent_users, store=None):
+    asyncio.run(main_simulation(total_users, concurrent_users, store))
+    st.success("Simulation completed.")
 
-    await asyncio.gather(*tasks)
+# Function to send a command to the running simulation (None when no simulation is listening)
+def send_to_simulation(command):
+    try:
+        return send_command(CONTROL_SOCKET, command)
+    except OSError:
+        return None
 
-# Function to start the simulation in a background thread
-def start_simulation(total_users, concurrent_users):
-    global is_running
-    if not is_running:
-        is_running = True
-        asyncio.run(main_simulation(total_users, concurrent_users))
-        is_running = False
-        st.success("Simulation completed.")
-    else:
-        st.warning("Simulation is already running!")
+
+# Metrics store shared by the simulation thread and every rerun of the page
+@st.cache_resource
+def get_metrics_store():
+    return TimeSeriesStore()
 
 
 # Streamlit UI
@@ -134,35 +178,76 @@ total_users = st.number_input("Total users", min_value=1, max_value=1000, value=
 concurrent_users = st.number_input("Concurrent users", min_value=1, max_value=100, value=3)
 
 # Create start/stop buttons for simulation control
-start_button = st.button("Start Simulation")
-stop_button = st.button("Stop Simulation")
-
-# Handle button clicks
+start_column, pause_column, resume_column, drain_column, stop_column = st.columns(5)
+start_button = start_column.button("Start Simulation")
+pause_button = pause_column.button("Pause")
+resume_button = resume_column.button("Resume")
+drain_button = drain_column.button("Drain", help="Start no new users and let the running sessions finish")
+stop_button = stop_column.button("Stop Simulation", help="Cancel the running sessions and write the reports")
+
+# Handle button clicks (the simulation thread is reached through its control socket, not through globals,
+# which Streamlit re-creates on every rerun)
 if start_button:
-    threading.Thread(target=start_simulation, args=(total_users, concurrent_users), daemon=True).start()
-
-if stop_button:
-    is_running = False
-    st.warning("Stopping simulation...")
+    if send_to_simulation('status'):
+        st.warning("Simulation is already running!")
+    else:
+        threading.Thread(target=start_simulation, args=(total_users, concurrent_users, get_metrics_store()),
+                         daemon=True).start()
+
+for button, command, message in ((pause_button, 'pause', "Simulation paused"),
+                                 (resume_button, 'resume', "Simulation resumed"),
+                                 (drain_button, 'drain', "Draining: no new users will start"),
+                                 (stop_button, 'stop', "Stopping simulation...")):
+    if button:
+        reply = send_to_simulation(command)
+        if reply is None:
+            st.warning("No simulation is running")
+        else:
+            st.warning(f"{message} ({reply['active']} sessions active)")
+
+# Tail reader kept across Streamlit reruns, so each refresh only reads newly appended bytes
+@st.cache_resource
+def get_log_tailer():
+    return LogTailer(log_file_path, max_lines=100)
 
 # Function to read logs from the log file
 def read_logs():
-    """Read the last 100 lines from the log file."""
-    try:
-        with open(log_file_path, 'r') as f:
-            logs = f.readlines()
-        return ''.join(logs[-100:])  # Limit to last 100 lines for display
-    except FileNotFoundError:
+    """Return the last 100 lines of the log file."""
+    tailer = get_log_tailer()
+    tailer.poll()
+    if tailer.inode is None:
         return "Log file not found."
-
-# Display logs with periodic refresh
+    return tailer.text()
+
+# Dashboard: fragments rerun on their own timer and redraw only their own elements,
+# instead of the whole page (and a new widget) every few seconds
+DASHBOARD_WINDOW = 600  # seconds of history on the charts
+
+@st.fragment(run_every=2)
+def show_dashboard():
+    store = get_metrics_store()
+    latest = store.summary(10)
+    active_column, rate_column, error_column, latency_column = st.columns(4)
+    active_column.metric("Active sessions", f"{latest['active']:.0f}")
+    rate_column.metric("Requests/s", f"{latest['requests_per_s']:.2f}")
+    error_column.metric("Error rate", f"{latest['error_rate']:.1%}")
+    latency_column.metric("p50 / p99", f"{latest['p50']:.2f} / {latest['p99']:.2f} s")
+
+    series = store.series(DASHBOARD_WINDOW)
+    if not series:
+        st.info("No metrics yet: start a simulation.")
+        return
+    st.line_chart(series, x='time', y=['requests_per_s', 'active'], height=200)
+    st.line_chart(series, x='time', y=['p50', 'p99'], height=200)
+    st.line_chart(store.latency_series(DASHBOARD_WINDOW, 99), x='time', height=200)
+    categories = store.summary(60)['categories']
+    st.dataframe([{'category': name, **figures} for name, figures in categories.items()], hide_index=True)
+
+@st.fragment(run_every=3)
+def show_logs():
+    st.text_area("Log Output", read_logs(), height=300)
+
+st.write("### Metrics:")
+show_dashboard()
 st.write("### Logs:")
-log_placeholder = st.empty()
-
-# Periodically update the logs in the main thread (every 3 seconds)
-log_key = 0
-while True:
-    logs = read_logs()  # Read logs from the file
-    log_placeholder.text_area("Log Output", logs, height=300, key=f"log_area_{log_key}")  # Unique key for each update
-    log_key += 1  # Increment the key for the next iteration
-    time.sleep(3)  # Sleep for 3 seconds before updating again
+show_logs()
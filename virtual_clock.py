@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+
+# Compressed-time mode: every think/dwell/scroll/mouse/inter-arrival delay is multiplied by
+# time_scale before sleeping. 1.0 is real time, 0.01 runs dwell 100x faster with the same
+# relative distribution, and 0 skips dwell entirely (pure throughput).
+class VirtualClock:
+    def __init__(self, time_scale=1.0):
+        if time_scale < 0:
+            raise ValueError("time_scale must be >= 0")
+        self.time_scale = time_scale
+        self.reset()
+
+    def reset(self):
+        self.virtual_slept = 0.0  # Dwell the journeys asked for
+        self.wall_slept = 0.0     # Dwell actually slept
+        self.start_time = time.monotonic()
+
+    def scale(self, seconds):
+        return seconds * self.time_scale
+
+    async def sleep(self, seconds):
+        self.virtual_slept += seconds
+        wall = self.scale(seconds)
+        self.wall_slept += wall
+        await asyncio.sleep(wall)  # sleep(0) still yields to other sessions
+
+    def now(self):
+        # Monotonic time on the virtual timeline (wall time in zero-dwell mode), e.g. for cache freshness
+        if self.time_scale == 0:
+            return time.monotonic()
+        return time.monotonic() / self.time_scale
+
+    def wall_elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def virtual_elapsed(self):
+        # Equivalent real-time duration; exact when dwell dominates, as it does in these journeys
+        if self.time_scale == 0:
+            return None
+        return self.wall_elapsed() / self.time_scale
+
+    def report(self):
+        wall = self.wall_elapsed()
+        virtual = self.virtual_elapsed()
+        virtual_text = 'n/a (zero-dwell mode)' if virtual is None else f"{virtual:.1f}s"
+        return (f"Clock (time scale {self.time_scale:g}): wall {wall:.1f}s, virtual {virtual_text}, "
+                f"dwell requested {self.virtual_slept:.1f}s, dwell slept {self.wall_slept:.1f}s")
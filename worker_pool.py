@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+
+
+# Work-conserving pool: a fixed number of workers pull the next job as soon as they are free,
+# so one slow session never leaves the other slots idle.
+class WorkerPool:
+    def __init__(self, concurrency, sample_interval=5.0, max_samples=1000):
+        self.concurrency = concurrency
+        self.sample_interval = sample_interval
+        self.samples = deque(maxlen=max_samples)  # (elapsed seconds, busy slots)
+        self.busy = 0
+        self.completed = 0
+        self.failed = 0
+        self._busy_area = 0.0  # Integral of busy slots over time
+        self._last_change = None
+        self.start_time = None
+        self.end_time = None
+
+    def _set_busy(self, delta):
+        now = time.monotonic()
+        self._busy_area += self.busy * (now - self._last_change)
+        self._last_change = now
+        self.busy += delta
+
+    async def run(self, jobs, handler):
+        """Run handler(job) for every job with at most `concurrency` in flight."""
+        jobs = iter(jobs)
+        self.start_time = self._last_change = time.monotonic()
+
+        async def worker():
+            for job in jobs:  # Shared iterator: each job is taken by exactly one worker
+                self._set_busy(+1)
+                try:
+                    await handler(job)
+                    self.completed += 1
+                except Exception as e:
+                    self.failed += 1
+                    logging.error(f"Job {job} failed: {e}")
+                finally:
+                    self._set_busy(-1)
+
+        sampler = asyncio.create_task(self._sample())
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            sampler.cancel()
+            self._set_busy(0)
+            self.end_time = time.monotonic()
+
+    async def _sample(self):
+        while True:
+            self.samples.append((time.monotonic() - self.start_time, self.busy))
+            await asyncio.sleep(self.sample_interval)
+
+    def utilization(self):
+        """Average fraction of slots that were busy over the run."""
+        end = self.end_time or time.monotonic()
+        area = self._busy_area + self.busy * (end - self._last_change)
+        elapsed = end - self.start_time
+        if elapsed <= 0:
+            return 0.0
+        return area / (self.concurrency * elapsed)
+
+    def timeline(self, points=20):
+        """Busy slots over time: (elapsed seconds, busy slots) samples, thinned to at most `points`."""
+        samples = list(self.samples)
+        return samples[::max(1, math.ceil(len(samples) / points))]
+
+    def report(self):
+        utilization = self.utilization()
+        timeline = ' '.join(f"{elapsed:.0f}s:{busy}" for elapsed, busy in self.timeline())
+        return (f"Worker pool: {self.completed} completed, {self.failed} failed, "
+                f"utilization {utilization:.1%} ({utilization * self.concurrency:.2f} of "
+                f"{self.concurrency} slots busy on average)\n"
+                f"Busy slots over time: {timeline or 'no samples'}")